@@ -0,0 +1,91 @@
+"""
+Benchmark kích thước block dưới giới hạn bandwidth: proposer đóng 1 block `--txs` tx,
+mọi node khác phải xin lại tx qua GET_TXS / TXS (tx gossip tắt, mempool chỉ có ở proposer).
+Với mỗi số tx/block và mỗi mức uplink (Mbit/s), in thời gian simulated tới khi mọi node
+finalize block, throughput (tx/s simulated), số byte proposer gửi và hàng đợi uplink lớn nhất.
+
+    python benchmarks/bench_bandwidth.py --nodes 8 --txs 10 100 1000 --uplink-mbps 1 10 100
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from core.crypto_layer import KeyPair
+from core.types_tx import SignedTx, TxBody
+from network.logging_utils import JsonLinesLogger
+from network.network import Network
+from node_sim.node import Node
+
+
+def make_txs(count: int, value_size: int):
+    client = KeyPair(seed=b"b" * 32)
+    return [
+        SignedTx.create(TxBody(sender_pubkey_hex=client.pubkey(), key=f"k{i}", value="x" * value_size), client)
+        for i in range(count)
+    ]
+
+
+def run(num_nodes: int, txs, uplink_mbps, seed: int) -> dict:
+    keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(num_nodes)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(
+        logger=JsonLinesLogger(io.StringIO()),
+        rng=random.Random(seed),
+        min_delay=0.02,
+        max_delay=0.05,
+        uplink_bps=None if uplink_mbps is None else uplink_mbps * 1e6,
+    )
+    nodes = [Node(v, net, kp, validators, tx_gossip="off") for v, kp in zip(validators, keypairs)]
+    # validators[0] là proposer của (h=0, r=0)
+    for tx in txs:
+        nodes[0].add_tx(tx)
+
+    start = time.perf_counter()
+    # Node in log finalize ra stdout -> bỏ đi để bảng kết quả dễ đọc
+    with contextlib.redirect_stdout(io.StringIO()):
+        nodes[0].propose_block(0.0)
+        finalized_at = None
+        while net.has_pending_events():
+            t = net.deliver_next()
+            if all(node.blockchain for node in nodes):
+                finalized_at = t
+                break
+    elapsed = time.perf_counter() - start
+
+    proposer = net.link_stats[nodes[0].node_id]
+    return {
+        "finality": finalized_at,
+        "throughput": len(txs) / finalized_at,
+        "proposer_kb": proposer.bytes_sent / 1024,
+        "max_queue": max(stats.max_uplink_queue for stats in net.link_stats.values()),
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--txs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--value-size", type=int, default=200)
+    parser.add_argument("--uplink-mbps", type=float, nargs="+", default=[1.0, 10.0, 100.0])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'txs/block':>9} {'uplink Mbps':>12} {'finality (s)':>13} {'tx/s':>9} "
+          f"{'proposer KB':>12} {'max queue':>10} {'wall (s)':>9}")
+    for count in args.txs:
+        txs = make_txs(count, args.value_size)
+        for mbps in args.uplink_mbps:
+            r = run(args.nodes, txs, mbps, args.seed)
+            print(f"{count:>9d} {mbps:>12.1f} {r['finality']:>13.3f} {r['throughput']:>9.0f} "
+                  f"{r['proposer_kb']:>12.1f} {r['max_queue']:>10d} {r['seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
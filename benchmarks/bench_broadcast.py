@@ -0,0 +1,98 @@
+"""
+Benchmark broadcast vote: N-1 lần Network.send (clone Message cho từng người nhận)
+so với Network.broadcast (1 Message dùng chung, rút RNG theo lô, 1 dòng log).
+
+Mỗi node broadcast `--rounds` vote tới toàn bộ node còn lại rồi deliver hết queue;
+in số byte log, bộ nhớ của các vote đang nằm trong queue (tracemalloc, đo sau khi
+gửi xong, trước khi deliver) và thời gian trên mỗi vote.
+
+    python benchmarks/bench_broadcast.py --nodes 200 --rounds 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from network.logging_utils import JsonLinesLogger
+from network.messages import Message, MessageType
+from network.network import Network
+
+
+class _CountingFile:
+    """File giả chỉ đếm số byte log (không giữ lại nội dung -> không lẫn vào số đo bộ nhớ)."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text: str) -> None:
+        self.bytes += len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class _SinkNode:
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+
+    def receive(self, message: Message, sim_time: float) -> None:
+        pass
+
+
+def run(mode: str, num_nodes: int, rounds: int, seed: int) -> dict:
+    log = _CountingFile()
+    net = Network(logger=JsonLinesLogger(log), rng=random.Random(seed),
+                  min_delay=0.01, max_delay=0.1, drop_prob=0.01)
+    ids = [f"node-{i:04d}" for i in range(num_nodes)]
+    for node_id in ids:
+        net.add_node(_SinkNode(node_id))
+
+    queued_bytes = 0
+    elapsed = 0.0
+    for r in range(rounds):
+        tracemalloc.start()
+        start = time.perf_counter()
+        for sender in ids:
+            vote = Message(msg_id=0, from_id=sender, to_id="BROADCAST",
+                           msg_type=MessageType.VOTE, payload=("vote", sender, r), height=r)
+            recipients = [node_id for node_id in ids if node_id != sender]
+            if mode == "broadcast":
+                net.broadcast(vote, recipients, float(r))
+            else:
+                for receiver in recipients:
+                    net.send(Message(msg_id=vote.msg_id, from_id=sender, to_id=receiver,
+                                     msg_type=vote.msg_type, payload=vote.payload, height=vote.height), float(r))
+        queued_bytes += tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        while net.has_pending_events():
+            net.deliver_next()
+        elapsed += time.perf_counter() - start
+
+    votes = rounds * num_nodes
+    return {
+        "mode": mode,
+        "log_bytes_per_vote": log.bytes / votes,
+        "queued_kb_per_vote": queued_bytes / votes / 1024,
+        "us_per_vote": elapsed / votes * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'log B/vote':>12} {'queued KB/vote':>15} {'us/vote':>10}")
+    for mode in ("send", "broadcast"):
+        r = run(mode, args.nodes, args.rounds, args.seed)
+        print(f"{r['mode']:<10} {r['log_bytes_per_vote']:>12.0f} {r['queued_kb_per_vote']:>15.1f} {r['us_per_vote']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark coalescing theo link: mỗi node broadcast `--burst` vote nhỏ liền nhau (cùng simulated time)
+tới toàn bộ node còn lại. Không coalescing: mỗi vote 1 event + 1 lần gọi receive cho từng người nhận;
+coalescing: vote cùng link (src, dst) trong cửa sổ gộp thành 1 event + 1 lần gọi receive_batch.
+In số event đã xử lý, số lần gọi vào node, số message mỗi batch và thời gian.
+
+    python benchmarks/bench_coalesce.py --nodes 200 --burst 4 --window 0.005
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from network.messages import Message, MessageType
+from network.network import Network
+
+
+class _NullLogger:
+    """Logger bỏ qua mọi event (chỉ đo network)."""
+
+    def log_event(self, **kwargs) -> None:
+        pass
+
+
+class _SinkNode:
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+        self.calls = 0
+        self.messages = 0
+
+    def receive(self, message: Message, sim_time: float) -> None:
+        self.calls += 1
+        self.messages += 1
+
+    def receive_batch(self, messages, sim_time: float) -> None:
+        self.calls += 1
+        self.messages += len(messages)
+
+
+def run(num_nodes: int, burst: int, window: float, seed: int) -> dict:
+    net = Network(logger=_NullLogger(), rng=random.Random(seed),
+                  min_delay=0.01, max_delay=0.1, coalesce_window=window)
+    ids = [f"node-{i:04d}" for i in range(num_nodes)]
+    nodes = [_SinkNode(node_id) for node_id in ids]
+    for node in nodes:
+        net.add_node(node)
+
+    start = time.perf_counter()
+    for k in range(burst):
+        # vote thứ k của mọi node rời đi cách nhau 1ms (vẫn trong cửa sổ)
+        now = k * 0.001
+        for sender in ids:
+            vote = Message(msg_id=0, from_id=sender, to_id="BROADCAST",
+                           msg_type=MessageType.VOTE, payload=("vote", sender, k), height=0)
+            net.broadcast(vote, [node_id for node_id in ids if node_id != sender], now)
+    events = 0
+    while net.has_pending_events():
+        net.deliver_next()
+        events += 1
+    elapsed = time.perf_counter() - start
+
+    calls = sum(node.calls for node in nodes)
+    messages = sum(node.messages for node in nodes)
+    return {"events": events, "calls": calls, "per_batch": messages / calls, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--window", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'window (s)':>10} {'events':>10} {'node calls':>11} {'msgs/call':>10} {'time (s)':>9}")
+    for window in (0.0, args.window):
+        r = run(args.nodes, args.burst, window, args.seed)
+        print(f"{window:>10.3f} {r['events']:>10d} {r['calls']:>11d} {r['per_batch']:>10.2f} {r['seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
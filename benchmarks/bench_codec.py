@@ -0,0 +1,85 @@
+"""
+Benchmark wire codec (network/codec.py) so với canonical JSON dùng khi ký (core.encoding.canonical_json
+của asdict(payload)). Với mỗi loại payload (vote, tx, header, compact body, certificate,
+block `--txs` tx, BLOCKS `--blocks` block): in kích thước JSON / binary và thời gian encode / decode.
+Decode JSON chỉ ra dict (json.loads), decode binary dựng lại đúng dataclass payload.
+
+    python benchmarks/bench_codec.py --txs 100 --blocks 4 --repeat 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from blocklayer.block import build_block
+from consensus.certificate import build_certificate
+from consensus.validator_set import ValidatorSet
+from consensus.vote import PHASE_PRECOMMIT, build_vote
+from core.crypto_layer import KeyPair
+from core.encoding import canonical_json
+from core.state import State
+from core.types_tx import SignedTx, TxBody
+from network.codec import decode_payload, encode_payload
+from network.messages import BlocksResponse
+
+
+def make_payloads(num_txs: int, num_blocks: int):
+    keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(4)]
+    client = KeyPair(seed=b"c" * 32)
+    txs = [SignedTx.create(TxBody(client.pubkey(), f"k{i}", f"value-{i}"), client) for i in range(num_txs)]
+    blocks = []
+    state = State()
+    parent = None
+    for _ in range(num_blocks):
+        parent = build_block(parent, state, txs, keypairs[0])
+        blocks.append(parent)
+    block = blocks[0]
+    votes = [build_vote(0, 0, block.block_hash(), PHASE_PRECOMMIT, kp) for kp in keypairs]
+    certificate = build_certificate(votes, ValidatorSet([kp.pubkey() for kp in keypairs]))
+    return [
+        ("vote", votes[0]),
+        ("tx", txs[0]),
+        ("signed header", block.signed_header()),
+        ("compact body", block.compact_body()),
+        ("certificate", certificate),
+        (f"block ({num_txs} tx)", block),
+        (f"BLOCKS ({num_blocks} block)", BlocksResponse(0, blocks, [certificate] * num_blocks)),
+    ]
+
+
+def per_call_us(fn, arg, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--txs", type=int, default=100)
+    parser.add_argument("--blocks", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'payload':<20} {'json B':>8} {'wire B':>8} {'ratio':>6} "
+          f"{'json enc us':>12} {'wire enc us':>12} {'json dec us':>12} {'wire dec us':>12}")
+    for name, payload in make_payloads(args.txs, args.blocks):
+        json_bytes = canonical_json(asdict(payload))
+        wire_bytes = encode_payload(payload)
+        assert decode_payload(wire_bytes) == payload
+        # Payload lớn lặp ít hơn để mỗi dòng chạy cỡ nhau
+        repeat = max(10, args.repeat * 1000 // max(1000, len(json_bytes)))
+        json_enc = per_call_us(lambda p: canonical_json(asdict(p)), payload, repeat)
+        wire_enc = per_call_us(encode_payload, payload, repeat)
+        json_dec = per_call_us(json.loads, json_bytes, repeat)
+        wire_dec = per_call_us(decode_payload, wire_bytes, repeat)
+        print(f"{name:<20} {len(json_bytes):>8d} {len(wire_bytes):>8d} {len(wire_bytes) / len(json_bytes):>6.2f} "
+              f"{json_enc:>12.1f} {wire_enc:>12.1f} {json_dec:>12.1f} {wire_dec:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
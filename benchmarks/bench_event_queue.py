@@ -0,0 +1,100 @@
+"""
+Benchmark event queue của Network: heapq các dataclass `order=True` (cách cũ, so sánh qua
+sort_key của từng event) so với EventQueue (heapq tuple (time, seq, ...)).
+
+Mô hình "hold": queue giữ sẵn `--pending` event; mỗi bước pop event sớm nhất rồi xếp lịch
+1 event mới sau đó một delay ngẫu nhiên. Tổng `--ops` thao tác (1 push hoặc 1 pop = 1 thao tác).
+Kiểm tra 2 queue trả event theo cùng thứ tự (time, seq).
+
+    python benchmarks/bench_event_queue.py --ops 10000000 --pending 10000
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from network.event_queue import EventQueue, NetworkEventType
+from network.messages import Message, MessageType
+
+
+@dataclass(order=True)
+class LegacyScheduledDelivery:
+    """Bản sao ScheduledDelivery cũ của network.py (chỉ để so sánh)."""
+    sort_key: Tuple[float, int] = field(init=False, repr=False)
+
+    deliver_time: float
+    seq: int
+    message: Optional[Message]
+    event_type: NetworkEventType = NetworkEventType.DELIVER
+    node_id: Optional[str] = None
+    timer: Any = None
+
+    def __post_init__(self):
+        self.sort_key = (self.deliver_time, self.seq)
+
+
+def run_legacy(delays, pending: int, msg: Message):
+    queue = []
+    seq = 0
+    for delay in delays[:pending]:
+        heapq.heappush(queue, LegacyScheduledDelivery(deliver_time=delay, seq=seq, message=msg, node_id="n"))
+        seq += 1
+    order = []
+    start = time.perf_counter()
+    for delay in delays[pending:]:
+        sd = heapq.heappop(queue)
+        order.append(sd.seq)
+        heapq.heappush(queue, LegacyScheduledDelivery(
+            deliver_time=sd.deliver_time + delay, seq=seq, message=msg, node_id="n"
+        ))
+        seq += 1
+    return time.perf_counter() - start, order
+
+
+def run_event_queue(delays, pending: int, msg: Message):
+    queue = EventQueue()
+    deliver = NetworkEventType.DELIVER
+    for delay in delays[:pending]:
+        queue.push(delay, deliver, msg, "n")
+    order = []
+    push, pop = queue.push, queue.pop
+    start = time.perf_counter()
+    for delay in delays[pending:]:
+        t, seq, _, message, node_id, _ = pop()
+        order.append(seq)
+        push(t + delay, deliver, message, node_id)
+    return time.perf_counter() - start, order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=10_000_000)
+    parser.add_argument("--pending", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    steps = args.ops // 2
+    # Delay lượng tử hóa (ms) để có nhiều event trùng thời điểm -> thứ tự phải dựa vào seq
+    delays = [rng.randint(1, 100) / 1000 for _ in range(args.pending + steps)]
+    msg = Message(msg_id=0, from_id="a", to_id="BROADCAST", msg_type=MessageType.VOTE, payload=None)
+
+    legacy_s, legacy_order = run_legacy(delays, args.pending, msg)
+    queue_s, queue_order = run_event_queue(delays, args.pending, msg)
+    assert legacy_order == queue_order, "event order differs"
+
+    ops = steps * 2
+    print(f"{'queue':<22} {'total (s)':>10} {'ns/op':>8}")
+    print(f"{'dataclass heap':<22} {legacy_s:>10.2f} {legacy_s / ops * 1e9:>8.0f}")
+    print(f"{'EventQueue (tuples)':<22} {queue_s:>10.2f} {queue_s / ops * 1e9:>8.0f}")
+    print(f"speedup: {legacy_s / queue_s:.2f}x, same (time, seq) order over {steps} pops")
+
+
+if __name__ == "__main__":
+    main()
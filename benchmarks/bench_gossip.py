@@ -0,0 +1,87 @@
+"""
+Benchmark gossip overlay: full mesh (broadcast thẳng tới mọi validator) so với
+gossip relay trên topology (random regular / small-world / ring of clusters).
+
+`--votes` node ngẫu nhiên mỗi node broadcast 1 vote; chạy network tới khi hết event,
+in số message một node gửi cho một vote (tối đa / trung bình) và tỉ lệ node nhận được vote.
+
+    python benchmarks/bench_gossip.py --nodes 1000 --degree 8 --votes 5
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from consensus.vote import build_vote, PHASE_PREVOTE
+from core.crypto_layer import KeyPair
+from network.logging_utils import JsonLinesLogger
+from network.network import Network
+from network.topology import build_topology
+from node_sim.node import Node
+
+
+def run(topology_cfg, num_nodes: int, num_votes: int, fanout, seed: int) -> dict:
+    rng = random.Random(seed)
+    keypairs = [KeyPair(seed=rng.randbytes(32)) for _ in range(num_nodes)]
+    validators = [kp.pubkey() for kp in keypairs]
+    topology = build_topology(topology_cfg, validators, rng) if topology_cfg else None
+    log = io.StringIO()
+    net = Network(logger=JsonLinesLogger(log), rng=rng, min_delay=0.01, max_delay=0.1)
+    nodes = [
+        Node(v, net, kp, validators, tx_gossip="off",
+             neighbors=topology[v] if topology else None, gossip_fanout=fanout)
+        for v, kp in zip(validators, keypairs)
+    ]
+    # Prevote của height kế tiếp: node chỉ buffer (không kích hoạt consensus hay block sync)
+    voters = rng.sample(range(num_nodes), num_votes)
+    start = time.perf_counter()
+    for i in voters:
+        nodes[i].broadcast_vote(build_vote(1, 0, "ab" * 32, PHASE_PREVOTE, keypairs[i]), 0.0)
+    while net.has_pending_events():
+        net.deliver_next()
+    elapsed = time.perf_counter() - start
+
+    # Mỗi dòng BROADCAST = 1 node gửi/relay 1 vote (mỗi node relay mỗi vote tối đa 1 lần)
+    sent = []
+    for line in log.getvalue().splitlines():
+        record = json.loads(line)
+        if record["event"] == "BROADCAST":
+            sent.append(record["recipients"])
+    received = sum(len(node.consensus.future_vote_buffer.get((1, 0), [])) for node in nodes)
+    return {
+        "mode": topology_cfg["kind"] if topology_cfg else "full_mesh",
+        "max_sends": max(sent),
+        "avg_sends": sum(sent) / num_nodes / num_votes,
+        "coverage": received / (num_votes * num_nodes),
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--degree", type=int, default=8)
+    parser.add_argument("--fanout", type=int, default=None)
+    parser.add_argument("--votes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configs = [
+        None,
+        {"kind": "random_regular", "degree": args.degree},
+        {"kind": "small_world", "k": args.degree, "beta": 0.2},
+        {"kind": "ring_of_clusters", "cluster_size": args.degree, "bridges": 2},
+    ]
+    print(f"{'mode':<18} {'max sends/node/vote':>20} {'avg sends/node/vote':>20} {'coverage':>9} {'time (s)':>9}")
+    for cfg in configs:
+        r = run(cfg, args.nodes, args.votes, args.fanout, args.seed)
+        print(f"{r['mode']:<18} {r['max_sends']:>20d} {r['avg_sends']:>20.2f} {r['coverage']:>9.3f} {r['seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
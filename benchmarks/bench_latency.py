@@ -0,0 +1,54 @@
+"""
+Benchmark rút delay cho một broadcast: mỗi người nhận 1 lần `random.uniform` (Python)
+so với LatencyModel.sample (region + jitter, 1 lần gọi NumPy cho cả lô).
+
+    python benchmarks/bench_latency.py --recipients 1000 --broadcasts 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from network.latency import LatencyModel
+
+CONFIG = {
+    "regions": ["us", "eu", "asia"],
+    "rtt_ms": [[10, 80, 200], [80, 10, 150], [200, 150, 10]],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--broadcasts", type=int, default=2000)
+    args = parser.parse_args()
+
+    ids = [f"node-{i:05d}" for i in range(args.recipients + 1)]
+    sender, recipients = ids[0], ids[1:]
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(args.broadcasts):
+        [rng.uniform(0.01, 0.1) for _ in recipients]
+    uniform_s = time.perf_counter() - start
+
+    print(f"{'sampler':<28} {'us/broadcast':>13} {'ns/recipient':>13}")
+    print(f"{'python uniform':<28} {uniform_s / args.broadcasts * 1e6:>13.1f} "
+          f"{uniform_s / args.broadcasts / args.recipients * 1e9:>13.1f}")
+    for jitter in ({"kind": "none"}, {"kind": "lognormal", "median_ms": 5, "sigma": 0.5},
+                   {"kind": "pareto", "scale_ms": 5, "shape": 2.0}):
+        model = LatencyModel.from_config(dict(CONFIG, jitter=jitter), ids, seed=0)
+        start = time.perf_counter()
+        for _ in range(args.broadcasts):
+            model.sample(sender, recipients)
+        elapsed = time.perf_counter() - start
+        name = f"model ({jitter['kind']})"
+        print(f"{name:<28} {elapsed / args.broadcasts * 1e6:>13.1f} "
+              f"{elapsed / args.broadcasts / args.recipients * 1e9:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
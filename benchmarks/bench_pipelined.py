@@ -0,0 +1,70 @@
+"""
+Benchmark consensus pipelined (QC prevote của H+1 chốt H) so với engine 2 phase hiện tại.
+
+Chạy Simulator với cùng seed/config cho cả hai chế độ tới `--blocks` block,
+in số block finalized trên mỗi giây simulated time.
+
+    python benchmarks/bench_pipelined.py --nodes 4 --blocks 30 --drop 0.05
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import yaml
+
+from node_sim.simulator import Simulator
+
+
+def run(pipelined: bool, num_nodes: int, num_blocks: int, drop_prob: float, seed: int) -> dict:
+    config = {
+        "simulation": {
+            "num_nodes": num_nodes,
+            "max_blocks": num_blocks,
+            "min_delay": 0.01,
+            "max_delay": 0.1,
+            "drop_prob": drop_prob,
+            "pipelined": pipelined,
+        },
+        "timeouts": {"propose": 1.0, "prevote": 1.0, "precommit": 1.0},
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+        yaml.safe_dump(config, f)
+        config_path = f.name
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = Simulator(config_path=config_path, output_file=io.StringIO(), seed=seed)
+            sim.run()
+    finally:
+        os.remove(config_path)
+
+    blocks = min(len(node.blockchain) for node in sim.nodes)
+    sim_time = max(node._now for node in sim.nodes)
+    return {
+        "mode": "pipelined" if pipelined else "2-phase",
+        "blocks": blocks,
+        "sim_time": sim_time,
+        "blocks_per_sec": blocks / sim_time if sim_time > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--blocks", type=int, default=30)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'blocks':>8} {'sim time (s)':>14} {'blocks/s':>10}")
+    for pipelined in (False, True):
+        r = run(pipelined, args.nodes, args.blocks, args.drop, args.seed)
+        print(f"{r['mode']:<10} {r['blocks']:>8} {r['sim_time']:>14.2f} {r['blocks_per_sec']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark consensus trên TcpTransport: `--nodes` validator (Node không đổi) chạy trong 1 event loop,
+message đi qua socket TCP localhost thật, thời gian là thời gian thực. Client gửi tx (TX qua transport,
+tx gossip inventory) với tốc độ `--tx-rate` tx/s tới node ngẫu nhiên cho tới khi mọi node finalize
+`--blocks` block. In block/s, tx/s đã finalize, latency consensus theo phase (ms),
+số frame / lần write (write batching) và MB đã gửi.
+
+    python benchmarks/bench_tcp.py --nodes 4 --blocks 50 --tx-rate 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from consensus.metrics import ConsensusMetrics, summarize
+from consensus.timeouts import TimeoutConfig
+from core.crypto_layer import KeyPair
+from core.types_tx import SignedTx, TxBody
+from network.messages import Message, MessageType
+from network.tcp_transport import TcpTransport
+from node_sim.node import Node
+
+
+async def submit_txs(transport: TcpTransport, nodes, txs, rate: float, rng: random.Random) -> None:
+    """Gửi tx theo lô mỗi 10ms (giữ tốc độ `rate` tx/s theo thời gian thực)."""
+    sent = 0
+    start = transport.now()
+    while sent < len(txs):
+        due = min(len(txs), int((transport.now() - start) * rate) + 1)
+        for tx in txs[sent:due]:
+            target = nodes[rng.randrange(len(nodes))].node_id
+            transport.send(Message(msg_id=0, from_id="CLIENT", to_id=target,
+                                   msg_type=MessageType.TX, payload=tx), transport.now())
+        sent = due
+        await asyncio.sleep(0.01)
+
+
+async def run(num_nodes: int, blocks: int, tx_rate: float, timeout: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(num_nodes)]
+    validators = [kp.pubkey() for kp in keypairs]
+    transport = TcpTransport()
+    nodes = [Node(v, transport, kp, validators, timeouts=TimeoutConfig(), auto_propose=True)
+             for v, kp in zip(validators, keypairs)]
+
+    # Ký trước đủ tx cho cả lần chạy (ký không tính vào thời gian đo)
+    client = KeyPair(seed=b"c" * 32)
+    txs = [SignedTx.create(TxBody(client.pubkey(), f"k{i}", f"v{i}"), client)
+           for i in range(int(tx_rate * timeout))]
+
+    await transport.start()
+    start = time.perf_counter()
+    submitter = asyncio.ensure_future(submit_txs(transport, nodes, txs, tx_rate, rng)) if txs else None
+    # Node in log finalize ra stdout -> bỏ đi để bảng kết quả dễ đọc
+    with contextlib.redirect_stdout(io.StringIO()):
+        done = await transport.run_until(lambda: min(len(node.blockchain) for node in nodes) >= blocks, timeout)
+    elapsed = time.perf_counter() - start
+    if submitter is not None:
+        submitter.cancel()
+    await transport.close()
+
+    chain = nodes[0].blockchain[:blocks]
+    latency = summarize(ConsensusMetrics.merge(node.consensus.metrics for node in nodes))
+    return {
+        "done": done,
+        "seconds": elapsed,
+        "blocks": len(chain),
+        "txs": sum(len(block.txs) for block in chain),
+        "latency": latency,
+        "frames": transport.frames_sent,
+        "writes": transport.writes,
+        "mb_sent": sum(stats.bytes_sent for stats in transport.link_stats.values()) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--blocks", type=int, default=50)
+    parser.add_argument("--tx-rate", type=float, default=200.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    r = asyncio.run(run(args.nodes, args.blocks, args.tx_rate, args.timeout, args.seed))
+    if not r["done"]:
+        print(f"timeout after {r['seconds']:.1f}s ({r['blocks']} blocks finalized)")
+    print(f"{args.nodes} nodes, {r['blocks']} blocks in {r['seconds']:.2f}s: "
+          f"{r['blocks'] / r['seconds']:.1f} blocks/s, {r['txs'] / r['seconds']:.0f} tx/s finalized")
+    print(f"frames {r['frames']}, writes {r['writes']} ({r['frames'] / max(1, r['writes']):.2f} frames/write), "
+          f"{r['mb_sent']:.2f} MB sent")
+    print(f"\n{'phase':<18} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for phase, stats in r["latency"].items():
+        print(f"{phase:<18} {stats['count']:>6} {stats['p50'] * 1e3:>8.1f} "
+              f"{stats['p95'] * 1e3:>8.1f} {stats['p99'] * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
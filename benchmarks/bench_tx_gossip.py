@@ -0,0 +1,74 @@
+"""
+Benchmark lan truyền tx: inventory gossip (TX_INV/GET_TXS/TXS) so với flood.
+
+Bơm `--txs` giao dịch vào các node ngẫu nhiên rồi chạy network tới khi hết event,
+in số message và bytes (ước lượng) trung bình trên mỗi tx.
+
+    python benchmarks/bench_tx_gossip.py --nodes 16 --txs 200
+"""
+import argparse
+import io
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from core.crypto_layer import KeyPair
+from core.types_tx import SignedTx, TxBody
+from network.logging_utils import JsonLinesLogger
+from network.messages import Message, MessageType
+from network.network import Network
+from node_sim.node import Node
+
+
+def run(mode: str, num_nodes: int, num_txs: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    keypairs = [KeyPair(seed=rng.randbytes(32)) for _ in range(num_nodes)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(
+        logger=JsonLinesLogger(io.StringIO()),
+        rng=rng,
+        min_delay=0.01,
+        max_delay=0.1,
+        collect_stats=True,
+    )
+    nodes = [Node(v, net, kp, validators, tx_gossip=mode) for v, kp in zip(validators, keypairs)]
+
+    clients = [KeyPair(seed=rng.randbytes(32)) for _ in range(8)]
+    for i in range(num_txs):
+        client = clients[i % len(clients)]
+        tx = SignedTx.create(TxBody(client.pubkey(), f"key{i}", f"value-{i}"), client)
+        target = nodes[rng.randrange(num_nodes)]
+        net.send(Message(msg_id=0, from_id="CLIENT", to_id=target.node_id,
+                         msg_type=MessageType.TX, payload=tx), now=i * 0.01)
+
+    while net.has_pending_events():
+        net.deliver_next()
+
+    complete = sum(1 for node in nodes if len(node.mempool) == num_txs)
+    totals = net.total_stats()
+    return {
+        "mode": mode,
+        "msgs_per_tx": totals["messages"] / num_txs,
+        "bytes_per_tx": totals["bytes"] / num_txs,
+        "complete_nodes": complete,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=16)
+    parser.add_argument("--txs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'msgs/tx':>10} {'bytes/tx':>12} {'nodes with all txs':>20}")
+    for mode in ("inventory", "flood"):
+        r = run(mode, args.nodes, args.txs, args.seed)
+        print(f"{r['mode']:<10} {r['msgs_per_tx']:>10.1f} {r['bytes_per_tx']:>12.1f} "
+              f"{r['complete_nodes']:>14}/{args.nodes}")
+
+
+if __name__ == "__main__":
+    main()
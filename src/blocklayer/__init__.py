@@ -1,14 +1,32 @@
 """
-Blocklayer module - Block, BlockHeader, Validation, and Ledger
+Blocklayer module - Block, BlockHeader, Validation, Merkle proofs, and Ledger
 """
 
-from .block import BlockHeader, Block, build_block, validate_block
+from .block import (
+    BlockHeader,
+    Block,
+    SignedHeader,
+    CompactBody,
+    build_block,
+    validate_block,
+    verify_block_range,
+    compute_tx_root,
+)
+from .merkle import MerkleProof, merkle_root, merkle_proof, verify_merkle_proof
 from .ledger import Ledger
 
 __all__ = [
     "BlockHeader",
     "Block",
+    "SignedHeader",
+    "CompactBody",
     "build_block",
     "validate_block",
+    "verify_block_range",
+    "compute_tx_root",
+    "MerkleProof",
+    "merkle_root",
+    "merkle_proof",
+    "verify_merkle_proof",
     "Ledger",
 ]
@@ -3,13 +3,28 @@ Module Block - BlockHeader, Block, tạo block và validation
 """
 
 from dataclasses import dataclass, asdict
-from typing import List, Optional
+from typing import Collection, List, Optional
 import binascii
 
 from core.types_tx import SignedTx
 from core.state import State
 from core.crypto_layer import KeyPair, sign_struct, verify_struct, blake2b_hash
 from core.encoding import canonical_json
+from blocklayer.merkle import EMPTY_ROOT, MerkleProof, merkle_root, merkle_proof
+from network.codec import (
+    T_BLOCK,
+    T_BLOCK_HEADER,
+    T_COMPACT_BODY,
+    T_SIGNED_HEADER,
+    Reader,
+    put_fields,
+    put_hex,
+    put_hex_list,
+    put_str,
+    put_svarint,
+    put_uvarint,
+    register_payload,
+)
 
 
 @dataclass
@@ -19,11 +34,34 @@ class BlockHeader:
     parent_hash: str
     state_hash: str
     proposer_pubkey_hex: str
+    tx_root: str = EMPTY_ROOT  # Merkle root của tx id trong block
 
     def to_dict(self) -> dict:
         return asdict(self)
 
 
+def compute_tx_root(txs: List[SignedTx]) -> str:
+    """Merkle root của danh sách tx id theo thứ tự trong block"""
+    return merkle_root([tx.tx_id() for tx in txs])
+
+
+def _header_hash(header: BlockHeader) -> str:
+    """Block hash = blake2b(canonical_json(header)) dạng hex"""
+    header_bytes = canonical_json(header.to_dict())
+    hash_bytes = blake2b_hash(header_bytes)
+    return binascii.hexlify(hash_bytes).decode()
+
+
+def _verify_header_signature(header: BlockHeader, signature: str, pubkey: str, context: str) -> bool:
+    signed_header_dict = header.to_dict()
+    signed_header_dict.update({
+        "signature": signature,
+        "pubkey": pubkey,
+        "context": context
+    })
+    return verify_struct("HEADER:", signed_header_dict)
+
+
 @dataclass
 class Block:
     """Block chứa header, transactions, và chữ ký header"""
@@ -35,19 +73,74 @@ class Block:
 
     def block_hash(self) -> str:
         """Tính block hash từ header"""
-        header_bytes = canonical_json(self.header.to_dict())
-        hash_bytes = blake2b_hash(header_bytes)
-        return binascii.hexlify(hash_bytes).decode()
+        return _header_hash(self.header)
 
     def verify_signature(self) -> bool:
         """Kiểm tra chữ ký header"""
-        signed_header_dict = self.header.to_dict()
-        signed_header_dict.update({
-            "signature": self.header_signature,
-            "pubkey": self.pubkey,
-            "context": self.context
-        })
-        return verify_struct("HEADER:", signed_header_dict)
+        return _verify_header_signature(self.header, self.header_signature, self.pubkey, self.context)
+
+    def tx_proof(self, index: int) -> MerkleProof:
+        """Inclusion proof cho tx thứ `index` so với header.tx_root"""
+        return merkle_proof([tx.tx_id() for tx in self.txs], index)
+
+    def has_valid_tx_root(self) -> bool:
+        """Kiểm tra body (txs) khớp với tx_root trong header, không cần execute"""
+        return compute_tx_root(self.txs) == self.header.tx_root
+
+    def signed_header(self) -> "SignedHeader":
+        """Tách phần header đã ký (gửi trước trong header-first propagation)"""
+        return SignedHeader(
+            header=self.header,
+            header_signature=self.header_signature,
+            pubkey=self.pubkey,
+            context=self.context
+        )
+
+    def compact_body(self) -> "CompactBody":
+        """Tách phần body dạng compact (chỉ gồm tx id)"""
+        return CompactBody(
+            block_hash=self.block_hash(),
+            tx_ids=[tx.tx_id() for tx in self.txs]
+        )
+
+
+@dataclass
+class SignedHeader:
+    """Header kèm chữ ký proposer, gửi riêng với body"""
+    header: BlockHeader
+    header_signature: str
+    pubkey: str
+    context: str
+
+    def block_hash(self) -> str:
+        return _header_hash(self.header)
+
+    def verify_signature(self) -> bool:
+        return _verify_header_signature(self.header, self.header_signature, self.pubkey, self.context)
+
+    def to_block(self, txs: List[SignedTx]) -> Block:
+        """Ghép header với danh sách tx đã dựng lại thành Block đầy đủ"""
+        return Block(
+            header=self.header,
+            txs=txs,
+            header_signature=self.header_signature,
+            pubkey=self.pubkey,
+            context=self.context
+        )
+
+
+@dataclass
+class CompactBody:
+    """
+    Body dạng compact (compact-block): chỉ chứa tx id theo thứ tự trong block.
+    Receiver dựng lại txs từ mempool, tx nào thiếu thì xin lại (GET_TXS).
+    """
+    block_hash: str
+    tx_ids: List[str]
+
+    def matches(self, header: BlockHeader) -> bool:
+        """Kiểm tra danh sách tx id khớp với tx_root của header"""
+        return merkle_root(self.tx_ids) == header.tx_root
 
 def build_block(
     parent_block: Optional[Block],
@@ -89,7 +182,8 @@ def build_block(
         height=height,
         parent_hash=parent_hash,
         state_hash=state_hash,
-        proposer_pubkey_hex=keypair.pubkey()
+        proposer_pubkey_hex=keypair.pubkey(),
+        tx_root=compute_tx_root(txs)
     )
     
     # Ký header
@@ -108,59 +202,49 @@ def build_block(
     return block
 
 
-def validate_block(
+def execute_block(
     block: Block,
     parent_block: Optional[Block],
-    parent_state: State
-) -> bool:
+    parent_state: State,
+    check_signature: bool = True
+) -> Optional[State]:
     """
-    Validate block bằng cách kiểm tra:
-    1. Chữ ký header hợp lệ
-    2. Height đúng (parent_height + 1)
-    3. Parent hash khớp
-    4. State hash khớp sau khi re-execute transactions
-    
-    Args:
-        block: Block cần validate
-        parent_block: Block trước đó (None nếu là genesis)
-        parent_state: State sau khi áp dụng parent block
+    Validate block (giống validate_block) và trả về state sau block.
+    State mới được fork (copy-on-write) từ parent_state, parent_state không đổi.
     
     Returns:
-        True nếu block hợp lệ, False nếu không
+        State sau khi áp dụng block nếu hợp lệ, None nếu không
     """
     # Xác thực chữ ký header
-    signed_header_dict = block.header.to_dict()
-    signed_header_dict.update({
-        "signature": block.header_signature,
-        "pubkey": block.pubkey,
-        "context": block.context
-    })
-    
-    if not verify_struct("HEADER:", signed_header_dict):
-        return False
+    if check_signature and not block.verify_signature():
+        return None
     
     # Xác thực proposer pubkey khớp với header
     if block.header.proposer_pubkey_hex != block.pubkey:
-        return False
+        return None
     
     # Validate height và parent hash
     if parent_block is None:
         # Validation cho genesis block
         if block.header.height != 0:
-            return False
+            return None
         if block.header.parent_hash != "0" * 64:
-            return False
+            return None
     else:
         # Validation cho block thường
         if block.header.height != parent_block.header.height + 1:
-            return False
+            return None
         
         expected_parent_hash = parent_block.block_hash()
         if block.header.parent_hash != expected_parent_hash:
-            return False
+            return None
+    
+    # Body phải khớp tx_root trước khi chạy state transition
+    if not block.has_valid_tx_root():
+        return None
     
     # Re-execute transactions và xác thực state hash
-    new_state = parent_state.copy()
+    new_state = parent_state.fork()
     for tx in block.txs:
         # Áp dụng transaction (sẽ return False nếu invalid, nhưng vẫn include nó)
         new_state.apply_tx(tx)
@@ -169,6 +253,137 @@ def validate_block(
     expected_state_hash = binascii.hexlify(state_commitment).decode()
     
     if block.header.state_hash != expected_state_hash:
-        return False
+        return None
+    
+    return new_state
+
+
+def validate_block(
+    block: Block,
+    parent_block: Optional[Block],
+    parent_state: State,
+    check_signature: bool = True
+) -> bool:
+    """
+    Validate block bằng cách kiểm tra:
+    1. Chữ ký header hợp lệ
+    2. Height đúng (parent_height + 1)
+    3. Parent hash khớp
+    4. Tx root khớp với txs (trước khi execute)
+    5. State hash khớp sau khi re-execute transactions
     
+    Args:
+        block: Block cần validate
+        parent_block: Block trước đó (None nếu là genesis)
+        parent_state: State sau khi áp dụng parent block
+        check_signature: False nếu chữ ký header đã được kiểm tra trước
+            (ví dụ bằng verify_block_range khi sync)
+    
+    Returns:
+        True nếu block hợp lệ, False nếu không
+    """
+    return execute_block(block, parent_block, parent_state, check_signature) is not None
+
+
+def verify_block_range(blocks: List[Block], validators: Optional[Collection[str]] = None) -> bool:
+    """
+    Kiểm tra một dãy block liên tiếp nhận được khi sync:
+    1. Chữ ký header của tất cả block hợp lệ (verify lần lượt từng header, ed25519 không batch)
+    2. Proposer pubkey khớp với header (và thuộc `validators` nếu truyền vào)
+    3. Height tăng liên tục và parent hash nối đúng thành chuỗi
+    4. Body (txs) của từng block khớp tx_root
+
+    Liên kết giữa block đầu tiên và chain cục bộ được kiểm tra sau đó bởi
+    validate_block. Toàn bộ dãy bị từ chối nếu có một block sai.
+
+    Args:
+        blocks: Các block theo thứ tự height tăng dần
+        validators: Tập pubkey validator; None -> không kiểm tra proposer thuộc tập
+
+    Returns:
+        True nếu cả dãy hợp lệ, False nếu không
+    """
+    prev_block = None
+    for block in blocks:
+        if prev_block is not None:
+            if block.header.height != prev_block.header.height + 1:
+                return False
+            if block.header.parent_hash != prev_block.block_hash():
+                return False
+        if block.header.proposer_pubkey_hex != block.pubkey:
+            return False
+        if validators is not None and block.pubkey not in validators:
+            return False
+        if not block.verify_signature():
+            return False
+        if not block.has_valid_tx_root():
+            return False
+        prev_block = block
+
     return True
+
+
+# Wire codec (network.codec): header / block / compact body tự đăng ký, network không import blocklayer
+def _put_block_header(out: bytearray, header: BlockHeader) -> None:
+    put_svarint(out, header.height)
+    put_hex(out, header.parent_hash)
+    put_hex(out, header.state_hash)
+    put_hex(out, header.proposer_pubkey_hex)
+    put_hex(out, header.tx_root)
+
+
+def _get_block_header(r: Reader, depth: int) -> BlockHeader:
+    return BlockHeader(
+        height=r.svarint(),
+        parent_hash=r.hex(),
+        state_hash=r.hex(),
+        proposer_pubkey_hex=r.hex(),
+        tx_root=r.hex(),
+    )
+
+
+def _put_signed_header(out: bytearray, signed: SignedHeader) -> None:
+    _put_block_header(out, signed.header)
+    put_hex(out, signed.header_signature)
+    put_hex(out, signed.pubkey)
+    put_str(out, signed.context)
+
+
+def _get_signed_header(r: Reader, depth: int) -> SignedHeader:
+    return SignedHeader(
+        header=_get_block_header(r, depth),
+        header_signature=r.hex(),
+        pubkey=r.hex(),
+        context=r.text(),
+    )
+
+
+def _put_block(out: bytearray, block: Block) -> None:
+    _put_block_header(out, block.header)
+    put_uvarint(out, len(block.txs))
+    for tx in block.txs:
+        put_fields(out, tx)
+    put_hex(out, block.header_signature)
+    put_hex(out, block.pubkey)
+    put_str(out, block.context)
+
+
+def _get_block(r: Reader, depth: int) -> Block:
+    header = _get_block_header(r, depth)
+    txs = [r.fields(SignedTx, depth) for _ in range(r.uvarint())]
+    return Block(header=header, txs=txs, header_signature=r.hex(), pubkey=r.hex(), context=r.text())
+
+
+def _put_compact_body(out: bytearray, body: CompactBody) -> None:
+    put_hex(out, body.block_hash)
+    put_hex_list(out, body.tx_ids)
+
+
+def _get_compact_body(r: Reader, depth: int) -> CompactBody:
+    return CompactBody(block_hash=r.hex(), tx_ids=r.hex_list())
+
+
+register_payload(BlockHeader, T_BLOCK_HEADER, _put_block_header, _get_block_header)
+register_payload(SignedHeader, T_SIGNED_HEADER, _put_signed_header, _get_signed_header)
+register_payload(Block, T_BLOCK, _put_block, _get_block)
+register_payload(CompactBody, T_COMPACT_BODY, _put_compact_body, _get_compact_body)
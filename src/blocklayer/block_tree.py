@@ -0,0 +1,113 @@
+"""
+Module BlockTree - Cây block theo hash, cache state sau mỗi block
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from blocklayer.block import Block, execute_block
+from core.state import State
+
+GENESIS_PARENT_HASH = "0" * 64
+
+
+@dataclass
+class TreeNode:
+    """Một block trong cây kèm state sau block (post-state)"""
+    block_hash: str
+    height: int
+    block: Optional[Block]  # None với root giả (cha của genesis)
+    post_state: State
+    children: Set[str] = field(default_factory=set)
+
+
+class BlockTree:
+    """
+    Cây block chưa finalize, gốc là block finalized mới nhất.
+    - Mỗi node giữ post-state (overlay copy-on-write trên state của cha), nên block
+      mới xây trên bất kỳ tổ tiên nào đã biết chỉ cần execute chính nó.
+    - Kết quả validate được cache: block hợp lệ nằm trong cây, block sai nằm
+      trong `invalid` (hash -> height) để không execute lại.
+    - finalize(hash) dời gốc lên block đó, cắt các nhánh thua và gộp post-state
+      của gốc mới thành state phẳng (các block con vẫn đọc xuyên qua nó).
+    """
+
+    def __init__(self, root_state: Optional[State] = None, root_block: Optional[Block] = None):
+        root_state = root_state if root_state is not None else State()
+        root_state.flatten()
+        if root_block is None:
+            root = TreeNode(GENESIS_PARENT_HASH, -1, None, root_state)
+        else:
+            root = TreeNode(root_block.block_hash(), root_block.header.height, root_block, root_state)
+        self.root_hash = root.block_hash
+        self.nodes: Dict[str, TreeNode] = {root.block_hash: root}
+        self.invalid: Dict[str, int] = {}
+
+    def __contains__(self, block_hash: str) -> bool:
+        return block_hash in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def get(self, block_hash: str) -> Optional[TreeNode]:
+        return self.nodes.get(block_hash)
+
+    @property
+    def root(self) -> TreeNode:
+        return self.nodes[self.root_hash]
+
+    def add_block(self, block: Block, check_signature: bool = True) -> Optional[TreeNode]:
+        """
+        Validate block với post-state của cha (phải có trong cây) và thêm vào cây.
+
+        Returns:
+            TreeNode của block (đã có sẵn hoặc mới thêm), None nếu không hợp lệ
+            hoặc không biết block cha
+        """
+        block_hash = block.block_hash()
+        existing = self.nodes.get(block_hash)
+        if existing is not None:
+            return existing
+        if block_hash in self.invalid:
+            return None
+
+        parent = self.nodes.get(block.header.parent_hash)
+        if parent is None:
+            return None
+
+        post_state = execute_block(block, parent.block, parent.post_state, check_signature)
+        if post_state is None:
+            self.invalid[block_hash] = block.header.height
+            return None
+
+        node = TreeNode(block_hash, block.header.height, block, post_state)
+        self.nodes[block_hash] = node
+        parent.children.add(block_hash)
+        return node
+
+    def finalize(self, block_hash: str) -> Optional[TreeNode]:
+        """
+        Dời gốc lên block đã finalize và cắt mọi nhánh không đi qua block đó.
+
+        Returns:
+            TreeNode gốc mới, None nếu block không có trong cây
+        """
+        new_root = self.nodes.get(block_hash)
+        if new_root is None:
+            return None
+
+        kept: Dict[str, TreeNode] = {}
+        stack: List[str] = [block_hash]
+        while stack:
+            h = stack.pop()
+            node = self.nodes[h]
+            kept[h] = node
+            stack.extend(node.children)
+
+        self.nodes = kept
+        self.root_hash = block_hash
+        new_root.post_state.flatten()
+        # Block sai ở height đã finalize không còn cần nhớ; block sai ở height cao hơn
+        # (vd. proposal tương lai) vẫn giữ để không execute lại
+        self.invalid = {h: height for h, height in self.invalid.items() if height > new_root.height}
+        return new_root
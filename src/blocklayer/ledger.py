@@ -2,7 +2,7 @@
 Module Ledger - Quản lý blocks và states theo height
 """
 
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 from blocklayer.block import Block
 from core.state import State
 
@@ -11,24 +11,46 @@ class Ledger:
     """
     Ledger lưu trữ blocks và states theo index là height.
     Cung cấp các phương thức để thêm blocks, lấy blocks/states, và lấy block finalized mới nhất.
+    Certificate chốt block (do tầng consensus tạo) được lưu nguyên dạng, ledger không đọc nội dung.
     """
     
     def __init__(self):
         """Khởi tạo ledger rỗng"""
         self.blocks: dict[int, Block] = {}
         self.states: dict[int, State] = {}
+        self.certificates: dict[int, Any] = {}
     
-    def add_block(self, block: Block, state_after: State) -> None:
+    def add_block(
+        self,
+        block: Block,
+        state_after: State,
+        certificate: Optional[Any] = None
+    ) -> None:
         """
         Thêm block và state kết quả vào ledger.
         
         Args:
             block: Block cần thêm
             state_after: State sau khi áp dụng tất cả transactions trong block
+            certificate: Certificate đã chốt block (nếu có), vd. consensus.certificate.CommitCertificate
         """
         height = block.header.height
         self.blocks[height] = block
         self.states[height] = state_after
+        if certificate is not None:
+            self.certificates[height] = certificate
+    
+    def get_certificate(self, height: int) -> Optional[Any]:
+        """
+        Lấy certificate đã lưu cùng block tại height được chỉ định.
+        
+        Args:
+            height: Chiều cao của block
+        
+        Returns:
+            Certificate hoặc None nếu không có
+        """
+        return self.certificates.get(height)
     
     def get_block(self, height: int) -> Optional[Block]:
         """
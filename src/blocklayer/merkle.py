@@ -0,0 +1,127 @@
+"""
+Module Merkle - Merkle root và inclusion proof cho danh sách tx id
+"""
+
+from dataclasses import dataclass, field
+from typing import List
+import binascii
+
+from core.crypto_layer import blake2b_hash
+
+# Prefix domain separation để leaf không thể bị hiểu nhầm thành node trong
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# Root của danh sách rỗng
+EMPTY_ROOT = binascii.hexlify(blake2b_hash(b"")).decode()
+
+
+@dataclass
+class MerkleProof:
+    """
+    Inclusion proof cho leaf thứ `index` trong cây có `leaf_count` leaf.
+    `siblings` là các hash anh em (hex) từ dưới lên, bỏ qua các tầng mà
+    node được đẩy thẳng lên (node lẻ cuối tầng).
+    """
+    index: int
+    leaf_count: int
+    siblings: List[str] = field(default_factory=list)
+
+
+def _leaf_hash(leaf_hex: str) -> bytes:
+    return blake2b_hash(LEAF_PREFIX + binascii.unhexlify(leaf_hex))
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return blake2b_hash(NODE_PREFIX + left + right)
+
+
+def _next_level(level: List[bytes]) -> List[bytes]:
+    """Ghép từng cặp; node lẻ cuối tầng được đẩy thẳng lên (không nhân đôi)."""
+    parents = [_node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2 == 1:
+        parents.append(level[-1])
+    return parents
+
+
+def merkle_root(leaves: List[str]) -> str:
+    """
+    Tính Merkle root (hex) của danh sách leaf dạng hex (ví dụ tx id).
+
+    Args:
+        leaves: Các leaf theo đúng thứ tự trong block
+
+    Returns:
+        Root dạng hex, EMPTY_ROOT nếu danh sách rỗng
+    """
+    if not leaves:
+        return EMPTY_ROOT
+
+    level = [_leaf_hash(leaf) for leaf in leaves]
+    while len(level) > 1:
+        level = _next_level(level)
+    return binascii.hexlify(level[0]).decode()
+
+
+def merkle_proof(leaves: List[str], index: int) -> MerkleProof:
+    """
+    Tạo inclusion proof cho leaf tại `index`.
+
+    Args:
+        leaves: Các leaf theo đúng thứ tự trong block
+        index: Vị trí leaf cần chứng minh
+
+    Returns:
+        MerkleProof dùng cho verify_merkle_proof
+    """
+    if not 0 <= index < len(leaves):
+        raise IndexError(f"Leaf index {index} out of range")
+
+    siblings = []
+    level = [_leaf_hash(leaf) for leaf in leaves]
+    idx = index
+    while len(level) > 1:
+        sibling_idx = idx ^ 1
+        if sibling_idx < len(level):
+            siblings.append(binascii.hexlify(level[sibling_idx]).decode())
+        level = _next_level(level)
+        idx //= 2
+
+    return MerkleProof(index=index, leaf_count=len(leaves), siblings=siblings)
+
+
+def verify_merkle_proof(leaf: str, proof: MerkleProof, root: str) -> bool:
+    """
+    Kiểm tra `leaf` nằm ở vị trí `proof.index` trong cây có root `root`.
+
+    Returns:
+        True nếu proof hợp lệ, False nếu không
+    """
+    if not 0 <= proof.index < proof.leaf_count:
+        return False
+
+    try:
+        current = _leaf_hash(leaf)
+        siblings = [binascii.unhexlify(s) for s in proof.siblings]
+    except (binascii.Error, ValueError):
+        return False
+
+    idx = proof.index
+    size = proof.leaf_count
+    used = 0
+    while size > 1:
+        if idx % 2 == 1:
+            if used >= len(siblings):
+                return False
+            current = _node_hash(siblings[used], current)
+            used += 1
+        elif idx + 1 < size:
+            if used >= len(siblings):
+                return False
+            current = _node_hash(current, siblings[used])
+            used += 1
+        # else: node lẻ cuối tầng -> đẩy thẳng lên
+        idx //= 2
+        size = (size + 1) // 2
+
+    return used == len(siblings) and binascii.hexlify(current).decode() == root
@@ -0,0 +1,148 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consensus.validator_set import ValidatorSet
+from consensus.vote import Vote, PHASE_PREVOTE, PHASE_PRECOMMIT, verify_vote
+from core.crypto_layer import _domain_context
+from network.codec import T_CERTIFICATE, Reader, put_hex, put_hex_list, put_str, put_svarint, put_uvarint, register_payload
+
+
+@dataclass
+class CommitCertificate:
+    """
+    Commit certificate: gom 2/3+ precommit đã chốt một block thành một object.
+    - `signers`: bitmap (Python int) theo index trong ValidatorSet, bit i = validator i đã ký.
+    - `signatures`: chữ ký precommit theo thứ tự index tăng dần của các bit trong `signers`.
+    Node bị tụt lại chỉ cần 1 certificate cho mỗi height thay vì N vote riêng lẻ.
+    `phase` là PRECOMMIT ở chế độ thường; ở chế độ pipelined certificate gom
+    2/3+ prevote (QC) của block.
+    """
+    height: int
+    round: int
+    block_hash: str
+    signers: int
+    signatures: List[str] = field(default_factory=list)
+    phase: str = PHASE_PRECOMMIT
+
+    def signer_indices(self) -> List[int]:
+        """Danh sách index validator đã ký (tăng dần)."""
+        indices = []
+        bits = self.signers
+        while bits:
+            low = bits & -bits
+            indices.append(low.bit_length() - 1)
+            bits ^= low
+        return indices
+
+    def signer_count(self) -> int:
+        return self.signers.bit_count()
+
+    def to_votes(self, validator_set: ValidatorSet) -> Optional[List[Vote]]:
+        """Dựng lại các precommit từ certificate. None nếu bitmap không khớp validator set."""
+        indices = self.signer_indices()
+        if len(indices) != len(self.signatures):
+            return None
+        if indices and indices[-1] >= len(validator_set.pubkeys):
+            return None
+
+        context = _domain_context("VOTE:")
+        votes = []
+        for index, signature in zip(indices, self.signatures):
+            pubkey = validator_set.pubkey_at(index)
+            votes.append(Vote(
+                height=self.height,
+                round=self.round,
+                block_hash=self.block_hash,
+                phase=self.phase,
+                validator_pubkey_hex=pubkey,
+                signature=signature,
+                pubkey=pubkey,
+                context=context,
+            ))
+        return votes
+
+
+def build_certificate(
+    votes: List[Vote],
+    validator_set: ValidatorSet
+) -> Optional[CommitCertificate]:
+    """
+    Gom các vote (cùng height, round, block_hash, phase) thành CommitCertificate.
+    Vote của validator không thuộc tập bị bỏ qua. None nếu danh sách rỗng.
+    """
+    if not votes:
+        return None
+
+    first = votes[0]
+    by_index = {}
+    for vote in votes:
+        if (vote.height, vote.round, vote.block_hash, vote.phase) != (
+            first.height, first.round, first.block_hash, first.phase
+        ):
+            continue
+        index = validator_set.index_of(vote.validator_pubkey_hex)
+        if index is not None:
+            by_index[index] = vote.signature
+
+    signers = 0
+    for index in by_index:
+        signers |= 1 << index
+
+    return CommitCertificate(
+        height=first.height,
+        round=first.round,
+        block_hash=first.block_hash,
+        signers=signers,
+        signatures=[by_index[i] for i in sorted(by_index)],
+        phase=first.phase,
+    )
+
+
+def verify_certificate(
+    cert: CommitCertificate,
+    validator_set: ValidatorSet,
+    phase: str = PHASE_PRECOMMIT
+) -> bool:
+    """
+    Kiểm tra certificate: đúng `phase`, đủ 2/3+ signer theo popcount rồi verify lần lượt
+    từng chữ ký vote dựng lại từ bitmap (ed25519 không batch: chi phí bằng verify N vote,
+    chỉ tiết kiệm số message).
+    Mặc định chỉ nhận PRECOMMIT (certificate chốt block); QC prevote chỉ dùng ở
+    đường certify của chế độ pipelined, khi đó truyền `phase=PHASE_PREVOTE`.
+    """
+    if cert.block_hash == "NIL" or cert.phase != phase:
+        return False
+    if not validator_set.has_quorum(cert.signers):
+        return False
+
+    votes = cert.to_votes(validator_set)
+    if votes is None:
+        return False
+    return all(verify_vote(vote) for vote in votes)
+
+
+# Wire codec (network.codec): CommitCertificate tự đăng ký, network không import consensus
+def _put_certificate(out: bytearray, cert: CommitCertificate) -> None:
+    put_svarint(out, cert.height)
+    put_svarint(out, cert.round)
+    put_hex(out, cert.block_hash)
+    put_uvarint(out, cert.signers)
+    put_hex_list(out, cert.signatures)
+    put_str(out, cert.phase)
+
+
+def _get_certificate(r: Reader, depth: int) -> CommitCertificate:
+    return CommitCertificate(
+        height=r.svarint(),
+        round=r.svarint(),
+        block_hash=r.hex(),
+        signers=r.uvarint(),
+        signatures=r.hex_list(),
+        phase=r.text(),
+    )
+
+
+register_payload(CommitCertificate, T_CERTIFICATE, _put_certificate, _get_certificate)
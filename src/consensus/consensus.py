@@ -1,27 +1,108 @@
 from typing import Dict, List, Set, Callable, Optional
-from collections import defaultdict
+from collections import defaultdict, deque
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from consensus.vote import Vote, PHASE_PREVOTE, PHASE_PRECOMMIT, verify_vote, build_vote
+from consensus.certificate import CommitCertificate, build_certificate, verify_certificate
+from consensus.metrics import (
+    ConsensusMetrics, POINT_HEIGHT_START, POINT_PROPOSAL, POINT_PREVOTE,
+    POINT_PREVOTE_QUORUM, POINT_PRECOMMIT_QUORUM
+)
+from consensus.timeouts import TimeoutConfig, TimeoutSchedule, STEP_PROPOSE, STEP_PREVOTE, STEP_PRECOMMIT
+from consensus.validator_set import ValidatorSet
+from consensus.vote import Vote, EquivocationEvidence, PHASE_PREVOTE, PHASE_PRECOMMIT, verify_vote, build_vote
 from blocklayer.block import validate_block
 from core.state import State
 
 
+class VoteTally:
+    """
+    Tally vote của một phase bằng bitset (Python int) theo index validator.
+    - `voted`: bitset các validator đã vote (check trùng lặp bằng 1 phép AND).
+    - `by_hash`: block_hash -> bitset các validator vote cho hash đó.
+    - `voted_power` / `power_by_hash`: tổng voting power cộng dồn khi thêm vote,
+      quorum so sánh trực tiếp với ngưỡng của ValidatorSet (không cộng lại mỗi vote).
+    """
+    def __init__(self):
+        self.voted = 0
+        self.by_hash: Dict[str, int] = {}
+        self.voted_power = 0
+        self.power_by_hash: Dict[str, int] = {}
+
+    def has_voted(self, index: int) -> bool:
+        return (self.voted >> index) & 1 == 1
+
+    def add(self, index: int, block_hash: str, power: int = 1) -> int:
+        """Ghi vote của validator `index`. Trả về tổng power hiện có cho block_hash."""
+        bit = 1 << index
+        self.voted |= bit
+        self.by_hash[block_hash] = self.by_hash.get(block_hash, 0) | bit
+        self.voted_power += power
+        total = self.power_by_hash.get(block_hash, 0) + power
+        self.power_by_hash[block_hash] = total
+        return total
+
+    def count(self, block_hash: str) -> int:
+        """Số validator đã vote cho block_hash (popcount)."""
+        return self.by_hash.get(block_hash, 0).bit_count()
+
+    def power(self, block_hash: str) -> int:
+        """Tổng voting power đã vote cho block_hash."""
+        return self.power_by_hash.get(block_hash, 0)
+
+
 class VotePool:
     """
     Quản lý các phiếu bầu cho một (height, round) cụ thể.
     Theo dõi riêng biệt prevote và precommit.
+    - Validator được map sang index liên tục qua ValidatorSet; tally mỗi phase là
+      bitset theo block_hash, check trùng lặp và quorum đều bằng phép bit.
+    - Leader đạt 2/3+ được cache ngay khi xuất hiện.
+    - Vote thứ 2 mâu thuẫn của cùng validator được ghi lại làm bằng chứng equivocation.
     """
-    def __init__(self, height: int, round: int, total_validators: int):
+    def __init__(
+        self,
+        height: int,
+        round: int,
+        total_validators: int,
+        on_equivocation: Optional[Callable[[EquivocationEvidence], None]] = None,
+        validator_set: Optional[ValidatorSet] = None,
+        metrics: Optional[ConsensusMetrics] = None
+    ):
         self.height = height
         self.round = round
         self.total_validators = total_validators
+        self.on_equivocation = on_equivocation
+        self.metrics = metrics  # đếm số chữ ký vote đã verify (None -> không đếm)
+        # Không truyền validator_set -> tập mở, cấp index khi gặp validator mới
+        self.validator_set = validator_set if validator_set is not None else ValidatorSet(
+            total_validators=total_validators
+        )
+        self.threshold = self.validator_set.quorum_threshold  # cần > threshold (voting power)
+        
+        # Tally theo phase: bitset validator đã vote + bitset theo block_hash
+        self.prevotes = VoteTally()
+        self.precommits = VoteTally()
+        self._tallies: Dict[str, VoteTally] = {
+            PHASE_PREVOTE: self.prevotes,
+            PHASE_PRECOMMIT: self.precommits,
+        }
         
-        # Lưu vote theo phase -> block_hash -> set(validator_pubkey)
-        self.prevotes: Dict[str, Set[str]] = defaultdict(set)
-        self.precommits: Dict[str, Set[str]] = defaultdict(set)
+        # Index: phase -> validator index -> vote đầu tiên đã nhận (dùng làm bằng chứng)
+        self._votes_by_validator: Dict[str, Dict[int, Vote]] = {
+            PHASE_PREVOTE: {},
+            PHASE_PRECOMMIT: {},
+        }
+        # Leader (block_hash đạt 2/3+) của mỗi phase, None nếu chưa có
+        self._leaders: Dict[str, Optional[str]] = {
+            PHASE_PREVOTE: None,
+            PHASE_PRECOMMIT: None,
+        }
+        
+        # Bằng chứng equivocation (tối đa 1 cho mỗi validator mỗi phase)
+        self.equivocations: List[EquivocationEvidence] = []
+        self._equivocators: Set[tuple] = set()
         
         # Lưu lại toàn bộ object vote để debug nếu cần
         self.all_votes: List[Vote] = []
@@ -35,71 +116,92 @@ class VotePool:
         if vote.height != self.height or vote.round != self.round:
             return False
         
+        tally = self._tallies.get(vote.phase)
+        if tally is None:
+            return False  # Phase không hợp lệ
+        
+        # Validator không thuộc tập -> bỏ qua
+        index = self.validator_set.index_of(vote.validator_pubkey_hex)
+        if index is None:
+            return False
+        
+        # Check trùng lặp (một validator chỉ được vote 1 lần cho mỗi phase)
+        by_validator = self._votes_by_validator[vote.phase]
+        if tally.has_voted(index):
+            existing = by_validator[index]
+            if existing.block_hash != vote.block_hash:
+                self._record_equivocation(existing, vote)
+            return False
+        
         # Check chữ ký
+        if self.metrics is not None:
+            self.metrics.votes_verified += 1
         if not verify_vote(vote):
             return False
         
-        # Check trùng lặp (một validator chỉ được vote 1 lần cho mỗi phase)
-        validator = vote.validator_pubkey_hex
-        block_hash = vote.block_hash
-        
-        if vote.phase == PHASE_PREVOTE:
-            # Check xem đã prevote chưa
-            for existing_votes in self.prevotes.values():
-                if validator in existing_votes:
-                    return False
-            self.prevotes[block_hash].add(validator)
-        
-        elif vote.phase == PHASE_PRECOMMIT:
-            # Check xem đã precommit chưa
-            for existing_votes in self.precommits.values():
-                if validator in existing_votes:
-                    return False
-            self.precommits[block_hash].add(validator)
-        
-        else:
-            return False  # Phase không hợp lệ
+        by_validator[index] = vote
+        power = tally.add(index, vote.block_hash, self.validator_set.power_of(index))
+        
+        if self._leaders[vote.phase] is None and power > self.threshold:
+            self._leaders[vote.phase] = vote.block_hash
         
         self.all_votes.append(vote)
         return True
     
+    def _record_equivocation(self, first: Vote, second: Vote) -> None:
+        key = (first.validator_pubkey_hex, first.phase)
+        if key in self._equivocators:
+            return
+        if not verify_vote(second):
+            return
+        self._equivocators.add(key)
+        evidence = EquivocationEvidence(first=first, second=second)
+        self.equivocations.append(evidence)
+        if self.on_equivocation:
+            self.on_equivocation(evidence)
+    
+    def has_quorum_any(self, phase: str) -> bool:
+        """2/3+ validator đã vote ở phase này (cho bất kỳ block_hash nào)."""
+        return self._tallies[phase].voted_power > self.threshold
+    
+    def votes_for(self, phase: str, block_hash: str) -> List[Vote]:
+        """Các vote hợp lệ của phase cho block_hash (theo thứ tự index validator)."""
+        by_validator = self._votes_by_validator[phase]
+        return [by_validator[i] for i in sorted(by_validator) if by_validator[i].block_hash == block_hash]
+    
+    def precommits_for(self, block_hash: str) -> List[Vote]:
+        """Các precommit hợp lệ cho block_hash (theo thứ tự index validator)."""
+        return self.votes_for(PHASE_PRECOMMIT, block_hash)
+    
     def get_prevote_count(self, block_hash: str) -> int:
-        """Đếm số lượng prevote cho một block hash."""
-        return len(self.prevotes.get(block_hash, set()))
+        """Đếm số lượng prevote cho một block hash (popcount)."""
+        return self.prevotes.count(block_hash)
     
     def get_precommit_count(self, block_hash: str) -> int:
-        """Đếm số lượng precommit cho một block hash."""
-        return len(self.precommits.get(block_hash, set()))
+        """Đếm số lượng precommit cho một block hash (popcount)."""
+        return self.precommits.count(block_hash)
     
     def has_supermajority_prevotes(self, block_hash: str) -> bool:
-        """Kiểm tra xem block có đạt 2/3+ prevote không."""
-        count = self.get_prevote_count(block_hash)
-        return count > (2 * self.total_validators // 3)
+        """Kiểm tra xem block có đạt 2/3+ prevote (theo voting power) không."""
+        return self.prevotes.power(block_hash) > self.threshold
     
     def has_supermajority_precommits(self, block_hash: str) -> bool:
-        """Kiểm tra xem block có đạt 2/3+ precommit không."""
-        count = self.get_precommit_count(block_hash)
-        return count > (2 * self.total_validators // 3)
+        """Kiểm tra xem block có đạt 2/3+ precommit (theo voting power) không."""
+        return self.precommits.power(block_hash) > self.threshold
     
     def get_prevote_leader(self) -> Optional[str]:
         """
-        Trả về block_hash có nhiều prevote nhất nếu đạt supermajority.
+        Trả về block_hash đạt supermajority prevote (cache, O(1)).
         Nếu không ai đạt thì trả về None.
         """
-        for block_hash, voters in self.prevotes.items():
-            if self.has_supermajority_prevotes(block_hash):
-                return block_hash
-        return None
+        return self._leaders[PHASE_PREVOTE]
     
     def get_precommit_leader(self) -> Optional[str]:
         """
-        Trả về block_hash có nhiều precommit nhất nếu đạt supermajority.
+        Trả về block_hash đạt supermajority precommit (cache, O(1)).
         Nếu không ai đạt thì trả về None.
         """
-        for block_hash, voters in self.precommits.items():
-            if self.has_supermajority_precommits(block_hash):
-                return block_hash
-        return None
+        return self._leaders[PHASE_PRECOMMIT]
 
 
 class ConsensusEngine:
@@ -110,6 +212,21 @@ class ConsensusEngine:
     - Block Buffering: Xử lý block proposal đến sớm.
     - Fast Forward: Tự động catch-up nếu thấy tương lai đã chốt 1 block cao hơn.
     - Block Fetching: Yêu cầu block nếu bị thiếu.
+    - Bounded memory: vote pool, proposal và buffer dưới height đã finalize được
+      dọn mỗi khi chốt block; vote/block tương lai chỉ được buffer trong một cửa sổ
+      height/round giới hạn và tối đa `max_buffered_votes_per_sender` vote mỗi validator.
+    - Round timeout: nếu có `on_schedule_timeout`, engine xin đặt timer cho từng bước
+      (propose/prevote/precommit) theo simulated time; hết giờ thì vote NIL hoặc
+      sang round mới. Engine không tự giữ đồng hồ, thời gian lấy qua `clock`.
+    - Pipelined (`pipelined=True`, kiểu chained HotStuff 2-chain): chỉ còn 1 phase vote.
+      2/3+ prevote cho block B ở height H là QC "certify" B -> chuyển ngay sang H+1
+      (proposal H+1 xây trên B). QC của con trực tiếp C (height H+1, parent B) chốt B,
+      nên finalize trễ 1 height nhưng mỗi height chỉ tốn 1 vòng vote.
+    - Propose theo sự kiện: mỗi khi vào (height, round) mới mà validator này là proposer,
+      engine gọi `on_become_proposer(height, round)` để node propose ngay, không cần poll.
+    - Committee (`committee_size=C`): mỗi height chỉ C validator (chọn từ `committee_seed`
+      và height) propose/prevote/precommit, quorum và certificate tính trên committee.
+      Node ngoài committee không vote, chỉ finalize theo CommitCertificate.
     """
     def __init__(
         self, 
@@ -118,7 +235,20 @@ class ConsensusEngine:
         validator_index: Optional[int] = None,
         on_finalize_callback: Optional[Callable] = None,
         on_ask_for_block: Optional[Callable] = None,
-        block_validator: Optional[Callable] = None
+        block_validator: Optional[Callable] = None,
+        validators: Optional[List[str]] = None,
+        max_future_heights: int = 8,
+        max_future_rounds: int = 8,
+        max_buffered_votes_per_sender: int = 64,
+        finalized_history: int = 128,
+        timeouts: Optional[TimeoutConfig] = None,
+        on_schedule_timeout: Optional[Callable[[int, int, str, float], None]] = None,
+        clock: Optional[Callable[[], float]] = None,
+        pipelined: bool = False,
+        on_become_proposer: Optional[Callable[[int, int], None]] = None,
+        validator_powers: Optional[List[int]] = None,
+        committee_size: Optional[int] = None,
+        committee_seed: int = 0
     ):
         self.validator_keypair = validator_keypair
         self.total_validators = total_validators
@@ -126,6 +256,34 @@ class ConsensusEngine:
         self.on_finalize_callback = on_finalize_callback
         self.on_ask_for_block = on_ask_for_block
         self.block_validator = block_validator
+        self.on_become_proposer = on_become_proposer
+        # Index pubkey -> int, voting power và lịch proposer tính một lần cho mọi VotePool; None -> tập mở
+        self.validator_set = ValidatorSet(validators, total_validators=total_validators, powers=validator_powers)
+        
+        # Committee theo height (chỉ với tập đóng và C < N); cache, dọn cùng các height đã finalize
+        self.committee_size = committee_size
+        self.committee_seed = committee_seed
+        self._committees: Dict[int, ValidatorSet] = {}
+        
+        # Giới hạn buffer (chống node gửi vote/block quá xa tương lai làm đầy bộ nhớ)
+        self.max_future_heights = max_future_heights
+        self.max_future_rounds = max_future_rounds
+        self.max_buffered_votes_per_sender = max_buffered_votes_per_sender
+        
+        # Round timeout (tắt nếu không có on_schedule_timeout)
+        self.timeouts = TimeoutSchedule(timeouts)
+        self.on_schedule_timeout = on_schedule_timeout
+        self.clock = clock
+        self._scheduled_timeouts: Set[str] = set()  # các bước đã đặt timer trong round hiện tại
+        self._step_started: Dict[str, float] = {}  # bước -> thời điểm bắt đầu (cho adaptive)
+        
+        # Mốc thời gian từng (height, round) theo `clock` + số vote đã xử lý/verify
+        self.metrics = ConsensusMetrics(clock=self._now)
+        
+        # Pipelined: block đã có QC prevote (chưa finalize) ở height trước
+        self.pipelined = pipelined
+        self.certified_block = None
+        self.certified_qc: Optional[CommitCertificate] = None
         
         #State
         self.current_height = 0
@@ -133,12 +291,22 @@ class ConsensusEngine:
         
         #Storage
         self.vote_pools: Dict[tuple, VotePool] = {}
+        self.evidence: List[EquivocationEvidence] = []  # bằng chứng equivocation đã phát hiện
         self.proposed_blocks: Dict[str, dict] = {}  # block_hash -> block
-        self.finalized_blocks: List[dict] = []
+        self.proposals: Dict[tuple, List[str]] = defaultdict(list)  # (height, round) -> block_hash
+        # Chỉ giữ `finalized_history` block final gần nhất; chain đầy đủ nằm ở Node/Ledger
+        self.finalized_blocks: deque = deque(maxlen=finalized_history)
+        self.finalized_count = 0
+        # Commit certificate của height đang chốt (chờ block) và của block vừa finalize
+        self.pending_certificate: Optional[CommitCertificate] = None
+        self.last_certificate: Optional[CommitCertificate] = None
         
         #Buffer
         self.future_vote_buffer: Dict[tuple, List[Vote]] = defaultdict(list)
+        self._buffered_votes_per_sender: Dict[str, int] = defaultdict(int)
         self.future_block_buffer: Dict[int, dict] = {}
+        # Tally precommit bitset của các (height, round) tương lai, dùng cho fast forward
+        self.future_precommits: Dict[tuple, VoteTally] = {}
         self.waiting_for_block_to_finalize: Optional[tuple] = None # (height, block_hash)
         
         #Locking (Safety guarantee)
@@ -153,6 +321,8 @@ class ConsensusEngine:
         
         #Parent tracking for validation
         self.parent_state: Optional[State] = None
+        
+        self.metrics.mark(0, 0, POINT_HEIGHT_START)
 
 
     def on_receive_block(self, block) -> Optional[Vote]:
@@ -160,9 +330,10 @@ class ConsensusEngine:
         block_hash = self._get_block_hash(block)
         height = self._get_block_height(block)
         
-        #1. Block tương lai -> Thêm vào buffer
+        #1. Block tương lai -> Thêm vào buffer (trong cửa sổ height cho phép)
         if height > self.current_height:
-            self.future_block_buffer[height] = block
+            if height <= self.current_height + self.max_future_heights:
+                self.future_block_buffer[height] = block
             return None
             
         #2. Block quá khứ -> Bỏ qua
@@ -170,38 +341,58 @@ class ConsensusEngine:
             return None
         
         #3. Lưu block
-        self.proposed_blocks[block_hash] = block
+        self._store_proposal(block_hash, block)
+        self.metrics.mark(height, self.current_round, POINT_PROPOSAL)
         
         #4. Check xem có đang chờ block này để finalize không
         waiting_vote = self._check_waiting_block(height, block_hash)
         if waiting_vote is not None:
             return waiting_vote
 
-        #5. Nếu chưa prevote -> Validate và tạo Prevote
-        if self.my_prevote is None:
-            # Get parent block for validation
-            parent_block = self.get_latest_finalized()
-            # Use empty state if no parent (genesis case)
-            parent_state = self.parent_state if self.parent_state else State()
+        #5. Nếu chưa prevote -> Validate và tạo Prevote (chỉ thành viên committee của height)
+        if self.my_prevote is None and self.is_committee_member(height):
+            if self.block_validator is not None:
+                # Node tự validate (ví dụ theo block tree)
+                is_valid = self.block_validator(block)
+            else:
+                # Get parent block for validation
+                parent_block = self.get_latest_finalized()
+                # Use empty state if no parent (genesis case)
+                parent_state = self.parent_state if self.parent_state else State()
+                certified = self.certified_block
+                if certified is not None and block.header.parent_hash == self._get_block_hash(certified):
+                    # Pipelined: cha là block đã certify nhưng chưa finalize
+                    parent_block, parent_state = certified, parent_state.copy()
+                    for tx in certified.txs:
+                        parent_state.apply_tx(tx)
+                is_valid = validate_block(block, parent_block, parent_state)
             
-            if validate_block(block, parent_block, parent_state):
+            if is_valid:
                 # Prevote logic with locking consideration
                 vote_for = None
                 
-                if self.locked_block is None:
+                if self.pipelined:
+                    # Chỉ vote block nối tiếp block đã certify/finalize gần nhất của mình
+                    expected = self._expected_parent_hash()
+                    parent_hash = getattr(block.header, "parent_hash", None)
+                    vote_for = block_hash if expected is None or parent_hash == expected else "NIL"
+                elif self.locked_block is None:
                     # Not locked -> prevote this block
                     vote_for = block_hash
                 elif self.locked_block == block_hash:
                     # Locked to this block -> prevote it
                     vote_for = block_hash
-                elif self.valid_round >= self.locked_round:
-                    # Valid block from higher round -> can unlock and prevote
+                elif self.valid_block == block_hash and self.valid_round > self.locked_round:
+                    # Block có 2/3+ prevote (POL) ở round sau round đã lock -> được unlock
                     vote_for = block_hash
                 else:
                     # Locked to different block -> prevote nil
                     vote_for = "NIL"
                 
                 self.my_prevote = vote_for
+                self.metrics.mark(self.current_height, self.current_round, POINT_PREVOTE)
+                self._observe_step(STEP_PROPOSE)
+                self._schedule_timeout(STEP_PREVOTE)
                 return build_vote(
                     height=self.current_height,
                     round=self.current_round,
@@ -214,17 +405,28 @@ class ConsensusEngine:
     
     def on_receive_vote(self, vote: Vote) -> Optional[Vote]:
         """Xử lý khi nhận được vote. Trả về Vote nếu cần gửi."""
+        self.metrics.votes_processed += 1
+        
         #1. Vote tương lai -> Buffer & Check Fast Forward
         if vote.height > self.current_height:
+            if not self._can_buffer_vote(vote):
+                return None
+            self._buffered_votes_per_sender[vote.validator_pubkey_hex] += 1
             self.future_vote_buffer[(vote.height, vote.round)].append(vote)
-            if vote.height == self.current_height + 1:
-                self._check_fast_forward(vote.height, vote.round)
+            # Pipelined chỉ có prevote -> fast forward theo QC prevote
+            decisive_phase = PHASE_PREVOTE if self.pipelined else PHASE_PRECOMMIT
+            if vote.height == self.current_height + 1 and vote.phase == decisive_phase:
+                self._check_fast_forward(vote)
             return None
             
         #2. Vote quá khứ -> Bỏ qua
         if vote.height < self.current_height:
             return None
 
+        # Round quá xa -> bỏ qua (không tạo vote pool cho round tùy ý)
+        if vote.round > self.current_round + self.max_future_rounds:
+            return None
+
         #3. Vote hiện tại -> Xử lý
         return self._process_vote_internal(vote)
 
@@ -236,19 +438,39 @@ class ConsensusEngine:
             return None
          
         if vote.phase == PHASE_PREVOTE: #Nếu vote là prevote
+            # 2/3+ prevote (cho bất kỳ giá trị nào) ở round hiện tại -> bắt đầu prevote timeout
+            if vote.round == self.current_round and pool.has_quorum_any(PHASE_PREVOTE):
+                self._schedule_timeout(STEP_PREVOTE)
+            
             # Đủ 2/3 Prevote -> Update valid block & Lock & Gửi Precommit
+            # (2/3+ prevote NIL không precommit ngay; precommit NIL khi prevote timeout hết giờ)
             leader = pool.get_prevote_leader()
-            if leader and leader != "NIL" and self.my_precommit is None:
-                # Update valid block
+            if leader and leader != "NIL":
+                self.metrics.mark(vote.height, vote.round, POINT_PREVOTE_QUORUM)
+            if self.pipelined:
+                if leader and leader != "NIL":
+                    # QC prevote = certify block, không cần phase precommit
+                    if vote.round == self.current_round:
+                        self._observe_step(STEP_PREVOTE)
+                    qc = build_certificate(pool.votes_for(PHASE_PREVOTE, leader), pool.validator_set)
+                    votes = self._certify_block(leader, vote.height, qc)
+                    return votes[0] if votes else None
+                return None
+            if leader and leader != "NIL" and vote.round > self.valid_round:
+                # Update valid block (POL của round bất kỳ)
                 self.valid_block = leader
                 self.valid_round = vote.round
-                
+            
+            # Chỉ lock + precommit theo quorum của round hiện tại
+            if leader and leader != "NIL" and vote.round == self.current_round and self.my_precommit is None:
                 # Lock to this block (safety)
                 self.locked_block = leader
                 self.locked_round = vote.round
                 
                 # Send precommit
                 self.my_precommit = leader
+                self._observe_step(STEP_PREVOTE)
+                self._schedule_timeout(STEP_PRECOMMIT)
                 return build_vote(
                     height=self.current_height,
                     round=self.current_round,
@@ -258,19 +480,38 @@ class ConsensusEngine:
                 )
         
         elif vote.phase == PHASE_PRECOMMIT: #Nếu vote là precommit
+            # 2/3+ precommit (bất kỳ giá trị nào) ở round hiện tại -> bắt đầu precommit timeout
+            if vote.round == self.current_round and pool.has_quorum_any(PHASE_PRECOMMIT):
+                self._schedule_timeout(STEP_PRECOMMIT)
+            
             # Đủ 2/3 Precommit -> Finalize
             leader = pool.get_precommit_leader()
             if leader and leader != "NIL":
-                votes = self._finalize_block(leader, vote.height)
+                self.metrics.mark(vote.height, vote.round, POINT_PRECOMMIT_QUORUM)
+                if vote.round == self.current_round:
+                    self._observe_step(STEP_PRECOMMIT)
+                certificate = build_certificate(pool.precommits_for(leader), pool.validator_set)
+                votes = self._finalize_block(leader, vote.height, certificate)
                 # Return first vote if any (node_sim should handle list properly)
                 return votes[0] if votes else None
         
         return None
 
-    def _finalize_block(self, block_hash: str, height: int) -> List[Vote]:
+    def _finalize_block(
+        self,
+        block_hash: str,
+        height: int,
+        certificate: Optional[CommitCertificate] = None
+    ) -> List[Vote]:
         """Chốt block và chuyển sang height mới. Trả về votes cần broadcast."""
         block = self.proposed_blocks.get(block_hash)
         
+        # Giữ certificate lại nếu phải chờ block data
+        if certificate is not None:
+            self.pending_certificate = certificate
+        elif self.pending_certificate is not None and self.pending_certificate.block_hash == block_hash:
+            certificate = self.pending_certificate
+        
         # Case: Thiếu block data -> Yêu cầu network gửi
         if not block:
             print(f"[WARN] Missing block {block_hash} for finalization! Requesting...")
@@ -280,23 +521,154 @@ class ConsensusEngine:
             return []
 
         # Case: Đủ data -> Finalize
+        self._commit_block(block, certificate)
+        
+        # Reset state cho height mới và thu thập votes từ buffered blocks/votes
+        return self._advance_to_next_height(height + 1)
+
+    def _commit_block(self, block, certificate: Optional[CommitCertificate]) -> None:
+        """Ghi nhận block đã finalize: lưu, gọi callback, cập nhật parent_state."""
         self.finalized_blocks.append(block)
-        print(f"- Block finalized at height {height}: {block_hash}")
+        self.finalized_count += 1
+        self.last_certificate = certificate
+        self.metrics.mark_finalize(
+            self._get_block_height(block), certificate.round if certificate is not None else self.current_round
+        )
+        print(f"- Block finalized at height {self._get_block_height(block)}: {self._get_block_hash(block)}")
         
         if self.on_finalize_callback:
-            self.on_finalize_callback(block)
+            self.on_finalize_callback(block, certificate)
         
         # Update parent_state: apply block transactions to current state
         if self.parent_state is None:
             self.parent_state = State()
         for tx in block.txs:
             self.parent_state.apply_tx(tx)
+
+    def _certify_block(
+        self,
+        block_hash: str,
+        height: int,
+        qc: Optional[CommitCertificate] = None
+    ) -> List[Vote]:
+        """
+        Pipelined: block có QC prevote ở height hiện tại -> certify và sang height mới.
+        Nếu block nối trực tiếp lên block đã certify trước đó (2-chain) thì finalize block đó.
+        Trả về votes cần broadcast.
+        """
+        block = self.proposed_blocks.get(block_hash)
+        if block is None:
+            if qc is not None:
+                self.pending_certificate = qc
+            self.waiting_for_block_to_finalize = (height, block_hash)
+            if self.on_ask_for_block:
+                self.on_ask_for_block(block_hash)
+            return []
+        if qc is None and self.pending_certificate is not None and self.pending_certificate.block_hash == block_hash:
+            qc = self.pending_certificate
+
+        previous, previous_qc = self.certified_block, self.certified_qc
+        extends_previous = (
+            previous is not None
+            and block.header.parent_hash == self._get_block_hash(previous)
+            and self._extends_finalized(previous)
+        )
+        if not extends_previous and not self._extends_finalized(block):
+            # Block không nối vào chain cục bộ -> chờ block sync bổ sung các height còn thiếu,
+            # tránh certify vượt quá height finalized + 1
+            self.pending_certificate = qc
+            self.waiting_for_block_to_finalize = (height, block_hash)
+            if self.on_ask_for_block:
+                self.on_ask_for_block(block_hash)
+            return []
         
-        # Reset state cho height mới và thu thập votes từ buffered blocks/votes
+        self.certified_block, self.certified_qc = block, qc
+        if extends_previous:
+            self._commit_block(previous, previous_qc)
         return self._advance_to_next_height(height + 1)
+
+    def _extends_finalized(self, block) -> bool:
+        """Block nối trực tiếp lên block finalized mới nhất (hoặc là genesis)."""
+        latest = self.get_latest_finalized()
+        if latest is None:
+            return self._get_block_height(block) == 0
+        return block.header.parent_hash == self._get_block_hash(latest)
+
+    def _decide_block(self, block_hash: str, height: int, certificate: Optional[CommitCertificate] = None) -> List[Vote]:
+        """Block đã đạt quorum ở height hiện tại: certify (pipelined) hoặc finalize."""
+        if self.pipelined:
+            return self._certify_block(block_hash, height, certificate)
+        return self._finalize_block(block_hash, height, certificate)
+
+    def _expected_parent_hash(self) -> Optional[str]:
+        """Pipelined: parent hợp lệ cho proposal ở height hiện tại (None = không ràng buộc)."""
+        if self.certified_block is not None and self._get_block_height(self.certified_block) == self.current_height - 1:
+            return self._get_block_hash(self.certified_block)
+        latest = self.get_latest_finalized()
+        if latest is not None and self._get_block_height(latest) == self.current_height - 1:
+            return self._get_block_hash(latest)
+        return None
         
+    def import_finalized_block(self, block, certificate: Optional[CommitCertificate] = None) -> List[Vote]:
+        """
+        Nhận block đã được mạng finalize (qua block sync) cho height hiện tại.
+        Node phải validate block (và certificate nếu có) trước khi gọi.
+        Trả về votes cần broadcast.
+        """
+        height = self._get_block_height(block)
+        if self.pipelined and height == self.current_height - 1 and self._extends_finalized(block):
+            # Đã certify height này (đang ở height sau) nhưng chưa finalize -> finalize
+            # block mạng đã chốt, không đổi height hiện tại
+            self.certified_block, self.certified_qc = None, None
+            self._commit_block(block, certificate)
+            return []
+        if height != self.current_height:
+            return []
+
+        block_hash = self._get_block_hash(block)
+        # Nếu đã thấy 2/3+ precommit cho một block khác ở height này -> từ chối
+        if self.waiting_for_block_to_finalize:
+            w_h, w_hash = self.waiting_for_block_to_finalize
+            if w_h == height and w_hash != block_hash:
+                return []
+
+        self._store_proposal(block_hash, block)
+        if self.pipelined and self.certified_block is not None:
+            # Block certify ở height trước là cha của block đã finalize -> cũng đã finalize
+            certified, certified_qc = self.certified_block, self.certified_qc
+            self.certified_block, self.certified_qc = None, None
+            if block.header.parent_hash == self._get_block_hash(certified) and self._extends_finalized(certified):
+                self._commit_block(certified, certified_qc)
+        return self._finalize_block(block_hash, height, certificate)
+
+    def on_receive_certificate(self, certificate: CommitCertificate) -> List[Vote]:
+        """
+        Nhận CommitCertificate cho height hiện tại (thay cho N precommit riêng lẻ).
+        Certificate hợp lệ -> finalize ngay nếu đã có block, nếu chưa thì xin block.
+        Ở chế độ pipelined, QC prevote của height hiện tại -> certify block.
+        Trả về votes cần broadcast.
+        """
+        if certificate.height != self.current_height:
+            return []
+        if self.pipelined and certificate.phase == PHASE_PREVOTE:
+            if not verify_certificate(certificate, self.validator_set_for(certificate.height), PHASE_PREVOTE):
+                return []
+            return self._certify_block(certificate.block_hash, certificate.height, certificate)
+        # Ngoài đường certify pipelined, chỉ certificate precommit mới chốt được block
+        if not verify_certificate(certificate, self.validator_set_for(certificate.height), PHASE_PRECOMMIT):
+            return []
+
+        block_hash = certificate.block_hash
+        if block_hash not in self.proposed_blocks:
+            self.pending_certificate = certificate
+            self.waiting_for_block_to_finalize = (certificate.height, block_hash)
+            if self.on_ask_for_block:
+                self.on_ask_for_block(block_hash)
+            return []
+        return self._finalize_block(block_hash, certificate.height, certificate)
+
     def should_propose(self, height: int, round: int = None) -> bool:
-        """Kiểm tra quyền propose theo round-robin."""
+        """Kiểm tra quyền propose theo lịch weighted round-robin của ValidatorSet."""
         if round is None:
             round = self.current_round
         
@@ -304,14 +676,18 @@ class ConsensusEngine:
         if self.validator_index is None:
             return False
         
-        # Round-robin: proposer_index = (height + round) % total_validators
-        proposer_index = (height + round) % self.total_validators
+        validator_set = self.validator_set_for(height)
+        if validator_set is not self.validator_set:
+            # Committee: proposer lấy theo lịch của committee (node ngoài committee không propose)
+            proposer = validator_set.pubkey_at(validator_set.proposer_index(height, round))
+            return proposer == self.validator_keypair.pubkey()
         
-        return self.validator_index == proposer_index
+        # Power bằng nhau: proposer_index = (height + round) % total_validators
+        return self.validator_index == self.validator_set.proposer_index(height, round)
     
     def get_finalized_count(self) -> int:
         """Trả về số lượng block đã final"""
-        return len(self.finalized_blocks)
+        return self.finalized_count
     
     def get_latest_finalized(self):
         """Trả về block đã final gần nhất"""
@@ -325,6 +701,7 @@ class ConsensusEngine:
         self.my_prevote = None
         self.my_precommit = None
         self.waiting_for_block_to_finalize = None
+        self.pending_certificate = None
         
         # Reset locking state for new height
         self.locked_block = None
@@ -332,6 +709,9 @@ class ConsensusEngine:
         self.valid_block = None
         self.valid_round = -1
         
+        self._prune_below(new_height)
+        self._enter_round()
+        
         votes_to_broadcast = []
         
         # 1. Xử lý Block Buffer (nếu có block chờ sẵn)
@@ -355,65 +735,83 @@ class ConsensusEngine:
             if w_h == height and w_hash == block_hash:
                 print(f"Received missing block {block_hash}. Retrying finalization.")
                 self.waiting_for_block_to_finalize = None
-                votes = self._finalize_block(block_hash, height)
+                votes = self._decide_block(block_hash, height)
                 # Return first vote if any
                 return votes[0] if votes else None
         return None
 
-    def _check_fast_forward(self, future_height: int, future_round: int):
+    def _check_fast_forward(self, vote: Vote):
         """
-        Fast Forward: Nếu thấy block tương lai đã đồng thuận (2/3+ Precommit),
-        thì finalize block hiện tại để đuổi theo.
+        Cập nhật tally bitset precommit của (height+1, round) với vote tương lai.
+        Nếu block ở height+1 đã đạt 2/3+ precommit -> mạng đã đi trước,
+        finalize block hiện tại để đuổi theo. Quorum NIL không chốt block nào nên bỏ qua.
         """
+        future_height = vote.height
         if future_height != self.current_height + 1:
             return
 
-        votes = self.future_vote_buffer.get((future_height, future_round), [])
-        
-        # Đếm số lượng precommit unique validators
-        precommit_counts = defaultdict(int)
-        voters = set()
-        
-        for v in votes:
-            if v.phase == PHASE_PRECOMMIT and v.validator_pubkey_hex not in voters:
-                precommit_counts[v.block_hash] += 1
-                voters.add(v.validator_pubkey_hex)
-        
-        threshold = (2 * self.total_validators) // 3
-        
-        # Nếu bất kỳ block nào đạt supermajority
-        for _, count in precommit_counts.items():
-            if count > threshold:
-                print(f"Fast Forward detected! Future height {future_height} has consensus.")
-                
-                # Tìm block hiện tại để finalize (Best effort)
-                current_blk = self._find_proposal_for_height(self.current_height)
-                if current_blk:
-                    h = self._get_block_hash(current_blk)
-                    print(f"Force finalizing current height {self.current_height} block {h}")
-                    self._finalize_block(h, self.current_height)
+        validator_set = self.validator_set_for(future_height)
+        index = validator_set.index_of(vote.validator_pubkey_hex)
+        if index is None:
+            return
+
+        key = (future_height, vote.round)
+        tally = self.future_precommits.get(key)
+        if tally is None:
+            tally = self.future_precommits[key] = VoteTally()
+        if tally.has_voted(index):
+            return
+
+        power = tally.add(index, vote.block_hash, validator_set.power_of(index))
+        if vote.block_hash == "NIL":
+            return
+        if validator_set.has_quorum_power(power):
+            print(f"Fast Forward detected! Future height {future_height} has consensus.")
+            
+            # Block tương lai đã chốt -> parent của nó là block phải finalize ở height hiện tại
+            parent_hash = self._future_parent_hash(future_height, vote.block_hash)
+            if parent_hash is not None:
+                if parent_hash in self.proposed_blocks:
+                    print(f"Force finalizing current height {self.current_height} block {parent_hash}")
+                    self._decide_block(parent_hash, self.current_height)
                 else:
-                    print(f"Cannot Fast Forward: Missing block for current height {self.current_height}")
-                    
-                    future_blk = self.future_block_buffer.get(future_height)
-                    if future_blk:
-                        # Extract parent hash
-                        parent_hash = None
-                        # Check if it has header attribute
-                        if hasattr(future_blk, 'header'):
-                            # Check if header has parent_hash (Real Block)
-                            if hasattr(future_blk.header, 'parent_hash'):
-                                parent_hash = future_blk.header.parent_hash
-                            # Check if MockBlock stores it differently
-                            elif hasattr(future_blk, 'parent_hash'):
-                                parent_hash = future_blk.parent_hash
-                        
-                        if parent_hash:
-                            print(f"Found parent hash {parent_hash} from future block {future_height}. Requesting...")
-                            self.waiting_for_block_to_finalize = (self.current_height, parent_hash)
-                            if self.on_ask_for_block:
-                                self.on_ask_for_block(parent_hash)
+                    print(f"Found parent hash {parent_hash} from future block {future_height}. Requesting...")
+                    self.waiting_for_block_to_finalize = (self.current_height, parent_hash)
+                    if self.on_ask_for_block:
+                        self.on_ask_for_block(parent_hash)
+                return
+            
+            if self.pipelined:
+                return  # chờ nhận block tương lai để biết parent
+            
+            if self.on_ask_for_block:
+                # Chưa biết block nào đã chốt ở height hiện tại -> xin block đã finalize
+                # (proposal duy nhất mình thấy có thể thuộc round không được chốt)
+                self.on_ask_for_block(vote.block_hash)
                 return
+            
+            # Không có cách xin block: best effort chỉ khi height hiện tại có đúng 1 proposal
+            candidates = [
+                block_hash
+                for (h, _), hashes in self.proposals.items() if h == self.current_height
+                for block_hash in hashes
+            ]
+            if len(candidates) == 1:
+                print(f"Force finalizing current height {self.current_height} block {candidates[0]}")
+                self._finalize_block(candidates[0], self.current_height)
+            else:
+                print(f"Cannot Fast Forward: {len(candidates)} candidate blocks for current height {self.current_height}")
+
+    def _future_parent_hash(self, future_height: int, block_hash: str) -> Optional[str]:
+        """parent_hash của block tương lai đã đạt quorum (nếu đã nhận được block đó)."""
+        future_blk = self.future_block_buffer.get(future_height)
+        if future_blk is None or self._get_block_hash(future_blk) != block_hash:
+            return None
+        header = getattr(future_blk, 'header', None)
+        if header is not None and hasattr(header, 'parent_hash'):
+            return header.parent_hash
+        # MockBlock có thể lưu parent_hash trực tiếp
+        return getattr(future_blk, 'parent_hash', None)
 
     def _process_buffered_votes(self, height: int, round: int) -> List[Vote]:
         """Xử lý các vote đã buffer. Trả về danh sách votes cần broadcast."""
@@ -421,6 +819,7 @@ class ConsensusEngine:
         key = (height, round)
         if key in self.future_vote_buffer:
             votes = self.future_vote_buffer.pop(key)
+            self._release_buffered_votes(votes)
             for v in votes:
                 vote_response = self._process_vote_internal(v)
                 if vote_response:
@@ -432,6 +831,7 @@ class ConsensusEngine:
         self.current_round += 1
         self.my_prevote = None
         self.my_precommit = None
+        self._enter_round()
         
         votes_to_broadcast = []
         
@@ -440,15 +840,75 @@ class ConsensusEngine:
         if buffered_votes:
             votes_to_broadcast.extend(buffered_votes)
         
-        # Check if there's a buffered block for this height
-        if self.current_height in self.future_block_buffer:
-            block = self.future_block_buffer[self.current_height]
+        # Xét lại proposal đã nhận của proposer round mới (nếu có)
+        block = self._find_proposal_for_round(self.current_height, self.current_round)
+        if block is not None and self.my_prevote is None:
             vote = self.on_receive_block(block)
             if vote:
                 votes_to_broadcast.append(vote)
         
         return votes_to_broadcast
     
+    def start(self) -> None:
+        """Bắt đầu height/round hiện tại: đặt propose timeout (nếu dùng timer)."""
+        self._enter_round()
+    
+    def on_timeout(self, height: int, round: int, step: str) -> List[Vote]:
+        """
+        Xử lý timer hết giờ. Timer của height/round cũ bị bỏ qua.
+        - propose: chưa prevote -> prevote NIL
+        - prevote: chưa precommit -> precommit NIL
+        - precommit: chưa finalize -> sang round mới
+        Trả về votes cần broadcast.
+        """
+        if height != self.current_height or round != self.current_round:
+            return []
+        
+        if not self.is_committee_member(height):
+            # Ngoài committee: không vote, không đổi round; chờ certificate của height
+            return []
+        
+        if step == STEP_PROPOSE:
+            if self.my_prevote is None:
+                self.my_prevote = "NIL"
+                self._schedule_timeout(STEP_PREVOTE)
+                return [build_vote(
+                    height=self.current_height,
+                    round=self.current_round,
+                    block_hash="NIL",
+                    phase=PHASE_PREVOTE,
+                    keypair=self.validator_keypair
+                )]
+        elif step == STEP_PREVOTE:
+            if self.my_precommit is None:
+                return [self._precommit_nil()]
+        elif step == STEP_PRECOMMIT:
+            return self.advance_round()
+        return []
+    
+    def validator_set_for(self, height: int) -> ValidatorSet:
+        """Tập validator được vote ở `height`: committee nếu bật, ngược lại toàn bộ tập."""
+        if (
+            self.committee_size is None
+            or self.validator_set.is_open
+            or self.committee_size >= len(self.validator_set.pubkeys)
+        ):
+            return self.validator_set
+        committee = self._committees.get(height)
+        if committee is None:
+            committee = self.validator_set.sample_committee(self.committee_size, self.committee_seed, height)
+            self._committees[height] = committee
+        return committee
+
+    def committee_for(self, height: int) -> Optional[List[str]]:
+        """Pubkey các thành viên committee của `height`, None nếu không dùng committee."""
+        validator_set = self.validator_set_for(height)
+        return None if validator_set is self.validator_set else validator_set.pubkeys
+
+    def is_committee_member(self, height: int) -> bool:
+        validator_set = self.validator_set_for(height)
+        return validator_set is self.validator_set or self.validator_keypair.pubkey() in validator_set
+
     def set_validator_index(self, index: int):
         """Thiết lập index của validator (để proposer selection)."""
         self.validator_index = index
@@ -457,7 +917,12 @@ class ConsensusEngine:
         """Lấy pool vote"""
         key = (height, round)
         if key not in self.vote_pools:
-            self.vote_pools[key] = VotePool(height, round, self.total_validators)
+            self.vote_pools[key] = VotePool(
+                height, round, self.total_validators,
+                on_equivocation=self.evidence.append,
+                validator_set=self.validator_set_for(height),
+                metrics=self.metrics
+            )
         return self.vote_pools[key]
     
     def _get_block_hash(self, block) -> str:
@@ -466,9 +931,101 @@ class ConsensusEngine:
     def _get_block_height(self, block) -> int:
         return block.header.height
         
-    def _find_proposal_for_height(self, height: int):
-        """Tìm block proposal cho height"""
-        for blk in self.proposed_blocks.values():
-            if self._get_block_height(blk) == height:
-                return blk
+    def _now(self) -> float:
+        return self.clock() if self.clock is not None else 0.0
+
+    def _enter_round(self) -> None:
+        """Reset timer của round, đặt propose timeout và báo node nếu tới lượt propose."""
+        self._scheduled_timeouts = set()
+        self._step_started = {}
+        if self.current_round == 0:
+            self.metrics.mark(self.current_height, 0, POINT_HEIGHT_START)
+        self._schedule_timeout(STEP_PROPOSE)
+        if self.on_become_proposer and self.should_propose(self.current_height, self.current_round):
+            self.on_become_proposer(self.current_height, self.current_round)
+
+    def _schedule_timeout(self, step: str) -> None:
+        """Xin đặt timer cho bước `step` của round hiện tại (mỗi bước 1 lần)."""
+        if self.on_schedule_timeout is None or step in self._scheduled_timeouts:
+            return
+        self._scheduled_timeouts.add(step)
+        self._step_started[step] = self._now()
+        delay = self.timeouts.timeout(step, self.current_round)
+        self.on_schedule_timeout(self.current_height, self.current_round, step, delay)
+
+    def _observe_step(self, step: str) -> None:
+        """Ghi nhận độ trễ từ lúc bắt đầu bước tới khi đạt quorum (adaptive timeout)."""
+        started = self._step_started.pop(step, None)
+        if started is not None and self.clock is not None:
+            self.timeouts.observe(step, self._now() - started)
+
+    def _precommit_nil(self) -> Vote:
+        self.my_precommit = "NIL"
+        self._schedule_timeout(STEP_PRECOMMIT)
+        return build_vote(
+            height=self.current_height,
+            round=self.current_round,
+            block_hash="NIL",
+            phase=PHASE_PRECOMMIT,
+            keypair=self.validator_keypair
+        )
+
+    def _find_proposal_for_round(self, height: int, round: int):
+        """Proposal đã nhận ở height này của proposer round `round` (chỉ khi biết tập validator)."""
+        if self.validator_set.is_open:
+            return None
+        validator_set = self.validator_set_for(height)
+        proposer = validator_set.pubkey_at(validator_set.proposer_index(height, round))
+        for (h, _), hashes in self.proposals.items():
+            if h != height:
+                continue
+            for block_hash in hashes:
+                blk = self.proposed_blocks.get(block_hash)
+                if blk is not None and getattr(blk.header, "proposer_pubkey_hex", None) == proposer:
+                    return blk
         return None
+
+    def _store_proposal(self, block_hash: str, block) -> None:
+        """Lưu proposal và index theo (height, round nhận được)."""
+        if block_hash in self.proposed_blocks:
+            return
+        self.proposed_blocks[block_hash] = block
+        self.proposals[(self._get_block_height(block), self.current_round)].append(block_hash)
+
+    def _can_buffer_vote(self, vote: Vote) -> bool:
+        """Vote tương lai chỉ được buffer trong cửa sổ height/round và quota mỗi validator."""
+        if vote.height > self.current_height + self.max_future_heights:
+            return False
+        if vote.round > self.max_future_rounds:
+            return False
+        if self.validator_set_for(vote.height).index_of(vote.validator_pubkey_hex) is None:
+            return False
+        return self._buffered_votes_per_sender[vote.validator_pubkey_hex] < self.max_buffered_votes_per_sender
+
+    def _release_buffered_votes(self, votes: List[Vote]) -> None:
+        """Trả lại quota buffer của các vote đã rời future_vote_buffer."""
+        for v in votes:
+            sender = v.validator_pubkey_hex
+            self._buffered_votes_per_sender[sender] -= 1
+            if self._buffered_votes_per_sender[sender] <= 0:
+                del self._buffered_votes_per_sender[sender]
+
+    def _prune_below(self, height: int) -> None:
+        """Dọn vote pool, proposal, buffer và tally của các height < `height`."""
+        for key in [k for k in self.vote_pools if k[0] < height]:
+            del self.vote_pools[key]
+        for key in [k for k in self.proposals if k[0] < height]:
+            for block_hash in self.proposals.pop(key):
+                self.proposed_blocks.pop(block_hash, None)
+        # Block ghi trực tiếp vào proposed_blocks (không qua index)
+        for block_hash in [h for h, b in self.proposed_blocks.items() if self._get_block_height(b) < height]:
+            del self.proposed_blocks[block_hash]
+        for key in [k for k in self.future_vote_buffer if k[0] < height]:
+            self._release_buffered_votes(self.future_vote_buffer.pop(key))
+        for h in [h for h in self.future_block_buffer if h < height]:
+            del self.future_block_buffer[h]
+        for h in [h for h in self._committees if h < height]:
+            del self._committees[h]
+        # Tally fast forward của height đã qua (kể cả height mới) không còn cần
+        for key in [k for k in self.future_precommits if k[0] <= height]:
+            del self.future_precommits[key]
@@ -0,0 +1,106 @@
+import math
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Các mốc thời gian của một (height, round)
+POINT_HEIGHT_START = "height_start"  # vào height (round 0)
+POINT_PROPOSAL = "proposal"  # nhận proposal của round
+POINT_PREVOTE = "prevote"  # gửi prevote của chính mình
+POINT_PREVOTE_QUORUM = "prevote_quorum"  # 2/3+ prevote cho một block
+POINT_PRECOMMIT_QUORUM = "precommit_quorum"  # 2/3+ precommit cho một block
+POINT_FINALIZE = "finalize"  # block được finalize
+
+# Phase latency: (tên, mốc bắt đầu, mốc kết thúc); các mốc lấy ở round chốt block
+PHASES: Tuple[Tuple[str, str, str], ...] = (
+    ("propose", POINT_HEIGHT_START, POINT_PROPOSAL),
+    ("prevote", POINT_PROPOSAL, POINT_PREVOTE),
+    ("prevote_quorum", POINT_PREVOTE, POINT_PREVOTE_QUORUM),
+    ("precommit_quorum", POINT_PREVOTE_QUORUM, POINT_PRECOMMIT_QUORUM),
+    ("finalize", POINT_HEIGHT_START, POINT_FINALIZE),
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile theo nearest-rank trên danh sách đã sort (rỗng -> 0.0)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """phase -> {count, p50, p95, p99} từ danh sách latency của từng phase."""
+    summary = {}
+    for phase, values in latencies.items():
+        ordered = sorted(values)
+        stats = {"count": len(ordered)}
+        for p in PERCENTILES:
+            stats[f"p{p}"] = percentile(ordered, p)
+        summary[phase] = stats
+    return summary
+
+
+class ConsensusMetrics:
+    """
+    Mốc thời gian (simulated time, lấy qua `clock`) của từng (height, round):
+    mỗi mốc chỉ ghi lần đầu. Kèm số vote đã xử lý và số chữ ký vote đã verify.
+    Chỉ giữ `max_heights` height gần nhất để bộ nhớ không tăng theo chiều dài chain.
+    """
+
+    def __init__(self, clock: Optional[Callable[[], float]] = None, max_heights: int = 1024):
+        self.clock = clock
+        self.max_heights = max_heights
+        # height -> round -> point -> time
+        self.points: "OrderedDict[int, Dict[int, Dict[str, float]]]" = OrderedDict()
+        self.finalized_round: Dict[int, int] = {}  # height -> round chốt block
+        self.votes_processed = 0
+        self.votes_verified = 0
+
+    def mark(self, height: int, round: int, point: str) -> None:
+        """Ghi mốc `point` của (height, round) nếu chưa có."""
+        rounds = self.points.get(height)
+        if rounds is None:
+            rounds = self.points[height] = {}
+            while len(self.points) > self.max_heights:
+                old, _ = self.points.popitem(last=False)
+                self.finalized_round.pop(old, None)
+        marks = rounds.setdefault(round, {})
+        if point not in marks:
+            marks[point] = self.clock() if self.clock is not None else 0.0
+
+    def mark_finalize(self, height: int, round: int) -> None:
+        self.mark(height, round, POINT_FINALIZE)
+        self.finalized_round.setdefault(height, round)
+
+    def timeline(self, height: int) -> Dict[str, float]:
+        """Mốc của round chốt block ở `height` (height_start lấy từ round 0). Rỗng nếu chưa finalize."""
+        round = self.finalized_round.get(height)
+        rounds = self.points.get(height)
+        if round is None or rounds is None:
+            return {}
+        timeline = dict(rounds.get(round, {}))
+        start = rounds.get(0, {}).get(POINT_HEIGHT_START)
+        if start is not None:
+            timeline[POINT_HEIGHT_START] = start
+        return timeline
+
+    def phase_latencies(self) -> Dict[str, List[float]]:
+        """phase -> latency của các height đã finalize có đủ hai mốc."""
+        latencies: Dict[str, List[float]] = {name: [] for name, _, _ in PHASES}
+        for height in self.finalized_round:
+            timeline = self.timeline(height)
+            for name, begin, end in PHASES:
+                if begin in timeline and end in timeline:
+                    latencies[name].append(timeline[end] - timeline[begin])
+        return latencies
+
+    @staticmethod
+    def merge(metrics: Iterable["ConsensusMetrics"]) -> Dict[str, List[float]]:
+        """Gộp phase latency của nhiều node (ví dụ toàn bộ node trong simulator)."""
+        merged: Dict[str, List[float]] = {name: [] for name, _, _ in PHASES}
+        for m in metrics:
+            for name, values in m.phase_latencies().items():
+                merged[name].extend(values)
+        return merged
@@ -0,0 +1,66 @@
+from dataclasses import dataclass, fields
+from typing import Dict, Optional
+
+# Các bước có timeout trong một round
+STEP_PROPOSE = "propose"
+STEP_PREVOTE = "prevote"
+STEP_PRECOMMIT = "precommit"
+STEPS = (STEP_PROPOSE, STEP_PREVOTE, STEP_PRECOMMIT)
+
+
+@dataclass
+class TimeoutConfig:
+    """
+    Cấu hình timeout theo bước (đơn vị: giây simulated time).
+    - Timeout của round r = base + r * delta (round càng cao chờ càng lâu).
+    - `adaptive`: base được thay bằng `adaptive_factor` lần EWMA độ trễ quorum
+      đo được, kẹp trong [adaptive_min, giá trị cấu hình] -> mạng nhanh thì
+      timeout ngắn lại, mạng chậm thì không vượt quá cấu hình.
+    """
+    propose: float = 1.0
+    prevote: float = 1.0
+    precommit: float = 1.0
+    propose_delta: float = 0.5
+    prevote_delta: float = 0.5
+    precommit_delta: float = 0.5
+    adaptive: bool = False
+    adaptive_alpha: float = 0.2
+    adaptive_factor: float = 3.0
+    adaptive_min: float = 0.1
+
+    @staticmethod
+    def from_dict(data: Optional[dict]) -> "TimeoutConfig":
+        """Tạo từ section `timeouts` trong YAML, bỏ qua key không biết."""
+        known = {f.name for f in fields(TimeoutConfig)}
+        return TimeoutConfig(**{k: v for k, v in (data or {}).items() if k in known})
+
+
+class TimeoutSchedule:
+    """
+    Tính timeout cho (step, round) từ TimeoutConfig và giữ EWMA độ trễ quorum
+    của từng bước khi bật chế độ adaptive.
+    """
+
+    def __init__(self, config: Optional[TimeoutConfig] = None):
+        self.config = config or TimeoutConfig()
+        self.ewma: Dict[str, Optional[float]] = {step: None for step in STEPS}
+
+    def timeout(self, step: str, round: int) -> float:
+        base = getattr(self.config, step)
+        delta = getattr(self.config, f"{step}_delta")
+        observed = self.ewma[step]
+        if self.config.adaptive and observed is not None:
+            adapted = self.config.adaptive_factor * observed
+            base = min(base, max(self.config.adaptive_min, adapted))
+        return base + round * delta
+
+    def observe(self, step: str, latency: float) -> None:
+        """Ghi nhận độ trễ (giây) từ lúc bắt đầu bước tới khi đạt quorum."""
+        if latency < 0:
+            return
+        previous = self.ewma[step]
+        if previous is None:
+            self.ewma[step] = latency
+        else:
+            alpha = self.config.adaptive_alpha
+            self.ewma[step] = alpha * latency + (1 - alpha) * previous
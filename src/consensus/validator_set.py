@@ -0,0 +1,145 @@
+import heapq
+import random
+from math import gcd
+from typing import Dict, List, Optional
+
+
+class ValidatorSet:
+    """
+    Đánh index cho tập validator một lần: pubkey_hex -> số nguyên liên tục (0..N-1).
+    Vote được tally bằng bitset (Python int) theo index nên chi phí mỗi vote
+    không phụ thuộc độ dài pubkey.
+
+    Mỗi validator có voting power (`powers`, mặc định 1). Tổng power và ngưỡng
+    quorum (> 2/3 tổng power) tính một lần khi tạo tập; tally chỉ cộng power
+    của vote mới. Lịch proposer (weighted round-robin) cũng dựng sẵn một lần,
+    tra proposer của (height, round) là O(1).
+
+    Nếu không truyền `pubkeys` (tập mở, dùng trong test hoặc khi chưa biết
+    danh sách), index được cấp theo thứ tự gặp lần đầu, mọi validator có power 1
+    và `size` lấy từ `total_validators`.
+    """
+
+    # Độ dài tối đa của bảng lịch proposer; tổng power lớn hơn thì power được scale xuống
+    MAX_SCHEDULE_LENGTH = 1 << 16
+
+    def __init__(
+        self,
+        pubkeys: Optional[List[str]] = None,
+        total_validators: Optional[int] = None,
+        powers: Optional[List[int]] = None
+    ):
+        self.is_open = pubkeys is None
+        self.pubkeys: List[str] = list(pubkeys) if pubkeys is not None else []
+        self._index: Dict[str, int] = {pk: i for i, pk in enumerate(self.pubkeys)}
+        if total_validators is None:
+            total_validators = len(self.pubkeys)
+        self.size = total_validators
+
+        if powers is not None:
+            if self.is_open or len(powers) != len(self.pubkeys):
+                raise ValueError("powers must match pubkeys")
+            if any(p <= 0 for p in powers):
+                raise ValueError("voting power must be positive")
+        self.powers: Optional[List[int]] = list(powers) if powers is not None else None
+        # Power đều nhau -> đếm bằng popcount, không cần cộng power
+        self.uniform = self.powers is None or len(set(self.powers)) <= 1
+        self.total_power = sum(self.powers) if self.powers is not None else self.size
+        # Cần > threshold power để đạt 2/3+
+        self.quorum_threshold = 2 * self.total_power // 3
+
+        self._schedule: List[int] = self._build_schedule()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, pubkey: str) -> bool:
+        return pubkey in self._index
+
+    def index_of(self, pubkey: str) -> Optional[int]:
+        """Index của validator, None nếu không thuộc tập (tập đóng)."""
+        idx = self._index.get(pubkey)
+        if idx is None and self.is_open:
+            idx = len(self.pubkeys)
+            self.pubkeys.append(pubkey)
+            self._index[pubkey] = idx
+        return idx
+
+    def pubkey_at(self, index: int) -> str:
+        return self.pubkeys[index]
+
+    def power_of(self, index: int) -> int:
+        return self.powers[index] if self.powers is not None else 1
+
+    def power_of_bitset(self, bitset: int) -> int:
+        """Tổng power của các validator trong bitset; bit ngoài tập (index >= số validator) không được tính."""
+        bitset &= (1 << len(self.pubkeys)) - 1
+        if self.powers is None:
+            return bitset.bit_count()
+        if self.uniform:
+            return bitset.bit_count() * self.powers[0]
+        total = 0
+        while bitset:
+            low = bitset & -bitset
+            total += self.powers[low.bit_length() - 1]
+            bitset ^= low
+        return total
+
+    def has_quorum_power(self, power: int) -> bool:
+        return power > self.quorum_threshold
+
+    def has_quorum(self, bitset: int) -> bool:
+        """
+        Kiểm tra bitset các validator đã vote có đạt 2/3+ power không.
+        Bitset có bit ngoài tập (vd. signers của certificate giả) -> False, trước khi cộng power.
+        """
+        if bitset < 0 or bitset >> len(self.pubkeys):
+            return False
+        return self.power_of_bitset(bitset) > self.quorum_threshold
+
+    def proposer_index(self, height: int, round: int) -> int:
+        """Index proposer của (height, round): tra bảng lịch dựng sẵn, O(1)."""
+        if not self._schedule:
+            return (height + round) % self.size
+        return self._schedule[(height + round) % len(self._schedule)]
+
+    def sample_committee(self, size: int, seed: int, height: int) -> "ValidatorSet":
+        """
+        Committee của `height`: `size` validator chọn ngẫu nhiên (không lặp) từ seed
+        và height -> mọi node tính ra cùng một committee, không cần trao đổi message.
+        Committee giữ thứ tự index và voting power của tập gốc.
+        """
+        rng = random.Random(f"committee:{seed}:{height}")
+        members = sorted(rng.sample(range(len(self.pubkeys)), size))
+        powers = [self.powers[i] for i in members] if self.powers is not None else None
+        return ValidatorSet([self.pubkeys[i] for i in members], powers=powers)
+
+    def _build_schedule(self) -> List[int]:
+        """
+        Dựng một chu kỳ lịch proposer: validator i xuất hiện power_i lần (sau khi
+        chia gcd), các lượt trải đều theo stride scheduling — lượt thứ j của i rơi
+        vào thời điểm (j + 1/2) / power_i, hòa thì index nhỏ trước.
+        Power bằng nhau -> lịch là 0, 1, ..., N-1 (đúng round-robin cũ).
+        """
+        if self.powers is None or self.uniform:
+            return []
+        divisor = 0
+        for p in self.powers:
+            divisor = gcd(divisor, p)
+        weights = [p // divisor for p in self.powers]
+        total = sum(weights)
+        if total > self.MAX_SCHEDULE_LENGTH:
+            # Tổng quá lớn -> scale về độ dài tối đa (mỗi validator vẫn có ít nhất 1 lượt)
+            weights = [max(1, w * self.MAX_SCHEDULE_LENGTH // total) for w in weights]
+            total = sum(weights)
+
+        heap = [(1 / (2 * w), i, 0) for i, w in enumerate(weights)]
+        heapq.heapify(heap)
+        schedule = []
+        for _ in range(total):
+            _, i, j = heapq.heappop(heap)
+            schedule.append(i)
+            j += 1
+            if j < weights[i]:
+                heapq.heappush(heap, ((2 * j + 1) / (2 * weights[i]), i, j))
+        return schedule
@@ -5,6 +5,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.crypto_layer import KeyPair, sign_struct, verify_struct
+from network.codec import T_VOTE, Reader, put_hex, put_str, put_svarint, register_payload
 
 # Các giai đoạn bỏ phiếu (Vote phases)
 PHASE_PREVOTE = "PREVOTE"
@@ -63,6 +64,31 @@ class Vote:
         return Vote(**data)
 
 
+@dataclass
+class EquivocationEvidence:
+    """
+    Bằng chứng equivocation: cùng một validator ký 2 vote khác block_hash
+    cho cùng (height, round, phase). Cả 2 vote đều có chữ ký hợp lệ.
+    """
+    first: Vote
+    second: Vote
+
+    @property
+    def validator_pubkey_hex(self) -> str:
+        return self.first.validator_pubkey_hex
+
+    def is_valid(self) -> bool:
+        """Kiểm tra lại bằng chứng (dùng khi nhận evidence từ node khác)."""
+        a, b = self.first, self.second
+        return (
+            a.validator_pubkey_hex == b.validator_pubkey_hex
+            and (a.height, a.round, a.phase) == (b.height, b.round, b.phase)
+            and a.block_hash != b.block_hash
+            and verify_vote(a)
+            and verify_vote(b)
+        )
+
+
 def build_vote(
     height: int,
     round: int,
@@ -100,3 +126,31 @@ def verify_vote(vote: Vote) -> bool:
         return False
     
     return True
+
+
+# Wire codec (network.codec): Vote tự đăng ký, network không import consensus
+def _put_vote(out: bytearray, vote: Vote) -> None:
+    put_svarint(out, vote.height)
+    put_svarint(out, vote.round)
+    put_hex(out, vote.block_hash)
+    put_str(out, vote.phase)
+    put_hex(out, vote.validator_pubkey_hex)
+    put_hex(out, vote.signature)
+    put_hex(out, vote.pubkey)
+    put_str(out, vote.context)
+
+
+def _get_vote(r: Reader, depth: int) -> Vote:
+    return Vote(
+        height=r.svarint(),
+        round=r.svarint(),
+        block_hash=r.hex(),
+        phase=r.text(),
+        validator_pubkey_hex=r.hex(),
+        signature=r.hex(),
+        pubkey=r.hex(),
+        context=r.text(),
+    )
+
+
+register_payload(Vote, T_VOTE, _put_vote, _get_vote)
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from .crypto_layer import blake2b_hash
 from .types_tx import SignedTx
 from .encoding import canonical_json
@@ -8,13 +8,58 @@ class State:
     - Key must follow the format: "owner_pubkey_hex/key_name"
     - Never create bare keys (e.g., "msg")
     - Only the owner can create or modify their keys
+
+    State có thể là một lớp overlay (tạo bởi fork()): chỉ giữ các key đã ghi ở lớp này,
+    đọc xuyên xuống state cha. flatten() gộp các lớp lại (gọi khi block được finalize).
     """
     def __init__(self, data: Dict[str, Any] = None):
-        self.data: Dict[str, Any] = data or {}
+        self._local: Dict[str, Any] = data or {}
+        self._parent: Optional["State"] = None
+        # key_name -> owner, thay cho việc quét mọi key để kiểm tra quyền sở hữu
+        self._owners: Dict[str, str] = {}
+        for full_key in self._local:
+            owner, _, key = full_key.partition("/")
+            self._owners.setdefault(key, owner)
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """Toàn bộ key -> value. State overlay trả về bản gộp (chỉ để đọc)."""
+        if self._parent is None:
+            return self._local
+        merged: Dict[str, Any] = {}
+        for layer in self._layers():
+            merged.update(layer._local)
+        return merged
+
+    def _layers(self):
+        """Các lớp từ state gốc (phẳng) tới lớp này."""
+        layers = []
+        state = self
+        while state is not None:
+            layers.append(state)
+            state = state._parent
+        return reversed(layers)
 
     def _full_key(self, owner_pubkey: str, key: str) -> str:
         return f"{owner_pubkey}/{key}"
 
+    def _lookup(self, full_key: str) -> Any:
+        state = self
+        while state is not None:
+            if full_key in state._local:
+                return state._local[full_key]
+            state = state._parent
+        return None
+
+    def _owner_of(self, key: str) -> Optional[str]:
+        state = self
+        while state is not None:
+            owner = state._owners.get(key)
+            if owner is not None:
+                return owner
+            state = state._parent
+        return None
+
     def apply_tx(self, tx: SignedTx) -> bool:
         """
         Apply transaction ONLY IF:
@@ -31,16 +76,14 @@ class State:
 
         owner = tx.sender_pubkey_hex
 
-        suffix = f"/{tx.key}"
-        for existing_full in self.data.keys():
-            if existing_full.endswith(suffix):
-                existing_owner = existing_full.split("/", 1)[0]
-                if existing_owner != owner:
-                    return False
-                break
+        existing_owner = self._owner_of(tx.key)
+        if existing_owner is not None and existing_owner != owner:
+            return False
+        if existing_owner is None:
+            self._owners[tx.key] = owner
 
         full_key = self._full_key(owner, tx.key)
-        self.data[full_key] = tx.value
+        self._local[full_key] = tx.value
         return True
 
     def commitment(self) -> bytes:
@@ -49,8 +92,29 @@ class State:
         return blake2b_hash(canonical_json(commit_obj))
 
     def get(self, owner_pubkey: str, key: str) -> Any:
-        return self.data.get(self._full_key(owner_pubkey, key))
+        return self._lookup(self._full_key(owner_pubkey, key))
 
     def copy(self) -> "State":
         import copy
-        return State(copy.deepcopy(self.data))
\ No newline at end of file
+        return State(copy.deepcopy(self.data))
+
+    def fork(self) -> "State":
+        """
+        Copy-on-write: trả về lớp overlay rỗng đọc xuyên xuống state này, O(1).
+        Ghi chỉ vào lớp mới; value được chia sẻ vì apply_tx luôn gán value mới
+        chứ không sửa value cũ tại chỗ. State đã fork thì không được apply_tx tiếp.
+        """
+        child = State()
+        child._parent = self
+        return child
+
+    def flatten(self) -> None:
+        """Gộp các lớp cha vào state này (O(|state|)) và bỏ tham chiếu tới cha; nội dung không đổi."""
+        if self._parent is None:
+            return
+        local: Dict[str, Any] = {}
+        owners: Dict[str, str] = {}
+        for layer in self._layers():
+            local.update(layer._local)
+            owners.update(layer._owners)
+        self._local, self._owners, self._parent = local, owners, None
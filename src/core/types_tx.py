@@ -1,6 +1,9 @@
 from dataclasses import dataclass, asdict
 from typing import Any
-from .crypto_layer import KeyPair, sign_struct, verify_struct
+import binascii
+from .crypto_layer import KeyPair, sign_struct, verify_struct, blake2b_hash
+from .encoding import canonical_json
+from network.codec import T_SIGNED_TX, Reader, put_hex, put_str, put_value, register_payload
 
 @dataclass
 class TxBody:
@@ -26,5 +29,42 @@ class SignedTx:
         signed_dict = sign_struct("TX:", keypair, payload)
         return SignedTx(**signed_dict)
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Sửa field -> bỏ tx id đã cache (cache không phải field nên không vào asdict / so sánh)
+        self.__dict__.pop("_tx_id", None)
+        object.__setattr__(self, name, value)
+
     def verify(self) -> bool:
-        return verify_struct("TX:", asdict(self))
\ No newline at end of file
+        return verify_struct("TX:", asdict(self))
+
+    def tx_id(self) -> str:
+        """Định danh tx = blake2b(canonical_json(signed tx)) dạng hex, tính 1 lần rồi cache."""
+        cached = self.__dict__.get("_tx_id")
+        if cached is None:
+            cached = binascii.hexlify(blake2b_hash(canonical_json(asdict(self)))).decode()
+            self.__dict__["_tx_id"] = cached
+        return cached
+
+
+# Wire codec (network.codec): SignedTx tự đăng ký, network không import core
+def _put_signed_tx(out: bytearray, tx: SignedTx) -> None:
+    put_hex(out, tx.sender_pubkey_hex)
+    put_str(out, tx.key)
+    put_value(out, tx.value)
+    put_hex(out, tx.signature)
+    put_hex(out, tx.pubkey)
+    put_str(out, tx.context)
+
+
+def _get_signed_tx(r: Reader, depth: int) -> SignedTx:
+    return SignedTx(
+        sender_pubkey_hex=r.hex(),
+        key=r.text(),
+        value=r.value(depth + 1),
+        signature=r.hex(),
+        pubkey=r.hex(),
+        context=r.text(),
+    )
+
+
+register_payload(SignedTx, T_SIGNED_TX, _put_signed_tx, _get_signed_tx)
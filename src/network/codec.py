@@ -0,0 +1,453 @@
+# codec.py
+"""
+Wire format nhị phân (version `WIRE_VERSION`) cho Message và mọi loại payload.
+
+Frame:
+    version u8 | msg_type u8 | flags u8 | msg_id uvarint
+    | height svarint (flags & 1) | gossip origin hex + gossip seq uvarint (flags & 2)
+    | from_id hex | to_id hex | payload value
+
+- uvarint: LEB128; svarint: zigzag rồi LEB128
+- str / bytes: uvarint độ dài + dữ liệu (str là UTF-8)
+- hex (key, chữ ký, hash, tx id, node id): uvarint (len << 1 | is_text) + dữ liệu;
+  chuỗi hex thường độ dài chẵn ghi dạng raw bytes (nửa kích thước), chuỗi khác ghi nguyên văn
+- value: 1 byte tag + nội dung; tag cho None / bool / int / float / str / bytes / list / tuple / dict
+  và cho từng dataclass payload (SignedTx, Vote, Block, CommitCertificate, ...)
+- Codec của payload thuộc core / blocklayer / consensus nằm ở module sở hữu kiểu, đăng ký bằng
+  `register_payload` lúc import (dùng `put_*` / `Reader` ở đây) -> network không import các module đó
+
+Decode đọc thẳng trên memoryview của buffer: chuỗi / hex giải mã trực tiếp từ slice của view,
+không tạo bytes trung gian cho từng field. Input sai / thiếu -> ValueError.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Tuple
+import struct
+
+from .messages import (
+    BlocksResponse,
+    GetBlocks,
+    GetTxs,
+    Message,
+    MessageType,
+    TxInventory,
+    TxsResponse,
+)
+
+WIRE_VERSION = 1
+
+_FLAG_HEIGHT = 1
+_FLAG_GOSSIP = 2
+
+# Độ sâu lồng nhau tối đa của list / dict khi decode (chặn input độc hại làm tràn stack)
+MAX_NESTING = 32
+
+# Tag của value
+T_NONE = 0
+T_FALSE = 1
+T_TRUE = 2
+T_INT = 3
+T_FLOAT = 4
+T_STR = 5
+T_BYTES = 6
+T_LIST = 7
+T_TUPLE = 8
+T_DICT = 9
+# Tag của payload do module sở hữu kiểu tự đăng ký (`register_payload`)
+T_SIGNED_TX = 16
+T_BLOCK_HEADER = 17
+T_SIGNED_HEADER = 18
+T_BLOCK = 19
+T_COMPACT_BODY = 20
+T_VOTE = 21
+T_CERTIFICATE = 22
+# Tag của payload thuộc network.messages
+T_GET_BLOCKS = 23
+T_BLOCKS = 24
+T_GET_TXS = 25
+T_TXS = 26
+T_TX_INV = 27
+
+_DOUBLE = struct.Struct("<d")
+
+
+# ---------------------------------------------------------------- encode
+
+def put_uvarint(out: bytearray, n: int) -> None:
+    if n < 0x80:
+        if n < 0:
+            raise ValueError(f"uvarint must be non-negative: {n}")
+        out.append(n)
+        return
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def put_svarint(out: bytearray, n: int) -> None:
+    put_uvarint(out, n << 1 if n >= 0 else ((-n) << 1) - 1)
+
+
+def put_bytes(out: bytearray, data: bytes) -> None:
+    put_uvarint(out, len(data))
+    out += data
+
+
+def put_str(out: bytearray, s: str) -> None:
+    put_bytes(out, s.encode("utf-8"))
+
+
+def put_hex(out: bytearray, s: str) -> None:
+    # fromhex + so sánh ngược (2 lần gọi C) nhanh hơn regex; chấp nhận đúng hex thường độ dài chẵn
+    try:
+        raw = bytes.fromhex(s)
+    except ValueError:
+        raw = None
+    if raw is not None and raw.hex() == s:
+        put_uvarint(out, len(raw) << 1)
+    else:
+        raw = s.encode("utf-8")
+        put_uvarint(out, (len(raw) << 1) | 1)
+    out += raw
+
+
+def put_opt_hex(out: bytearray, s) -> None:
+    if s is None:
+        out.append(0)
+    else:
+        out.append(1)
+        put_hex(out, s)
+
+
+def put_hex_list(out: bytearray, items) -> None:
+    put_uvarint(out, len(items))
+    for s in items:
+        put_hex(out, s)
+
+
+def _put_get_blocks(out: bytearray, request: GetBlocks) -> None:
+    put_svarint(out, request.from_height)
+    put_svarint(out, request.count)
+
+
+def _put_blocks(out: bytearray, response: BlocksResponse) -> None:
+    put_svarint(out, response.from_height)
+    put_value(out, response.blocks)
+    put_value(out, response.certificates)
+
+
+def _put_get_txs(out: bytearray, request: GetTxs) -> None:
+    put_hex_list(out, request.tx_ids)
+    put_opt_hex(out, request.block_hash)
+
+
+def _put_txs(out: bytearray, response: TxsResponse) -> None:
+    put_value(out, response.txs)
+    put_opt_hex(out, response.block_hash)
+
+
+def _put_tx_inv(out: bytearray, inventory: TxInventory) -> None:
+    put_hex_list(out, inventory.tx_ids)
+
+
+# type -> (tag, writer) của các dataclass payload; kiểu ngoài network thêm qua `register_payload`
+_WRITERS: Dict[type, Tuple[int, Callable[[bytearray, Any], None]]] = {
+    GetBlocks: (T_GET_BLOCKS, _put_get_blocks),
+    BlocksResponse: (T_BLOCKS, _put_blocks),
+    GetTxs: (T_GET_TXS, _put_get_txs),
+    TxsResponse: (T_TXS, _put_txs),
+    TxInventory: (T_TX_INV, _put_tx_inv),
+}
+
+
+def put_fields(out: bytearray, value: Any) -> None:
+    """Ghi các field của payload đã đăng ký, không kèm tag (field lồng có kiểu cố định, vd. tx trong Block)."""
+    _WRITERS[type(value)][1](out, value)
+
+
+def put_value(out: bytearray, value: Any) -> None:
+    if value is None:
+        out.append(T_NONE)
+        return
+    kind = type(value)
+    if kind is bool:
+        out.append(T_TRUE if value else T_FALSE)
+    elif kind is int:
+        out.append(T_INT)
+        put_svarint(out, value)
+    elif kind is str:
+        out.append(T_STR)
+        put_str(out, value)
+    elif kind is list or kind is tuple:
+        out.append(T_LIST if kind is list else T_TUPLE)
+        put_uvarint(out, len(value))
+        for item in value:
+            put_value(out, item)
+    elif kind is dict:
+        out.append(T_DICT)
+        put_uvarint(out, len(value))
+        for key, item in value.items():
+            put_value(out, key)
+            put_value(out, item)
+    elif kind is float:
+        out.append(T_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif kind is bytes:
+        out.append(T_BYTES)
+        put_bytes(out, value)
+    else:
+        writer = _WRITERS.get(kind)
+        if writer is None:
+            raise TypeError(f"cannot encode {kind.__name__}")
+        out.append(writer[0])
+        writer[1](out, value)
+
+
+def encode_payload(payload: Any) -> bytes:
+    """Encode riêng 1 payload (value có tag). TypeError nếu có kiểu không hỗ trợ."""
+    out = bytearray()
+    put_value(out, payload)
+    return bytes(out)
+
+
+def encode_message(msg: Message) -> bytes:
+    """Encode Message thành frame nhị phân. TypeError nếu payload có kiểu không hỗ trợ."""
+    out = bytearray()
+    flags = 0
+    if msg.height is not None:
+        flags |= _FLAG_HEIGHT
+    if msg.gossip_id is not None:
+        flags |= _FLAG_GOSSIP
+    out.append(WIRE_VERSION)
+    out.append(msg.msg_type.value)
+    out.append(flags)
+    put_uvarint(out, msg.msg_id)
+    if msg.height is not None:
+        put_svarint(out, msg.height)
+    if msg.gossip_id is not None:
+        put_hex(out, msg.gossip_id[0])
+        put_uvarint(out, msg.gossip_id[1])
+    put_hex(out, msg.from_id)
+    put_hex(out, msg.to_id)
+    put_value(out, msg.payload)
+    return bytes(out)
+
+
+# ---------------------------------------------------------------- decode
+
+class Reader:
+    """Con trỏ đọc trên memoryview của buffer (không copy)."""
+
+    __slots__ = ("view", "pos", "end")
+
+    def __init__(self, data):
+        view = memoryview(data)
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+        self.view = view
+        self.pos = 0
+        self.end = len(view)
+
+    def take(self, n: int) -> memoryview:
+        start = self.pos
+        stop = start + n
+        if stop > self.end:
+            raise ValueError("truncated message")
+        self.pos = stop
+        return self.view[start:stop]
+
+    def byte(self) -> int:
+        pos = self.pos
+        if pos >= self.end:
+            raise ValueError("truncated message")
+        self.pos = pos + 1
+        return self.view[pos]
+
+    def uvarint(self) -> int:
+        view, pos, end = self.view, self.pos, self.end
+        result = 0
+        shift = 0
+        while True:
+            if pos >= end:
+                raise ValueError("truncated varint")
+            b = view[pos]
+            pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return result
+
+    def svarint(self) -> int:
+        n = self.uvarint()
+        return -((n + 1) >> 1) if n & 1 else n >> 1
+
+    def text(self) -> str:
+        return str(self.take(self.uvarint()), "utf-8")
+
+    def hex(self) -> str:
+        pos = self.pos
+        if pos < self.end and self.view[pos] < 0x80:
+            # độ dài 1 byte (key / chữ ký / hash luôn vậy) -> bỏ qua vòng lặp uvarint
+            n = self.view[pos]
+            self.pos = pos + 1
+        else:
+            n = self.uvarint()
+        raw = self.take(n >> 1)
+        return str(raw, "utf-8") if n & 1 else raw.hex()
+
+    def opt_hex(self):
+        return self.hex() if self.byte() else None
+
+    def hex_list(self):
+        return [self.hex() for _ in range(self.uvarint())]
+
+    def fields(self, cls: type, depth: int) -> Any:
+        """Đọc payload kiểu `cls` ghi bằng `put_fields` (không có tag)."""
+        return _READERS[_WRITERS[cls][0]](self, depth)
+
+    def list_value(self, depth: int) -> list:
+        """Value phải là list, dùng cho field list của payload."""
+        value = self.value(depth)
+        if type(value) is not list:
+            raise ValueError(f"expected list, got {type(value).__name__}")
+        return value
+
+    def value(self, depth: int = 0) -> Any:
+        tag = self.byte()
+        if tag == T_NONE:
+            return None
+        if tag == T_FALSE:
+            return False
+        if tag == T_TRUE:
+            return True
+        if tag == T_INT:
+            return self.svarint()
+        if tag == T_STR:
+            return self.text()
+        if tag in (T_LIST, T_TUPLE, T_DICT):
+            if depth >= MAX_NESTING:
+                raise ValueError("value nested too deeply")
+            count = self.uvarint()
+            if tag == T_DICT:
+                result = {}
+                for _ in range(count):
+                    key = self.value(depth + 1)
+                    try:
+                        result[key] = self.value(depth + 1)
+                    except TypeError:
+                        raise ValueError("unhashable dict key") from None
+                return result
+            items = [self.value(depth + 1) for _ in range(count)]
+            return items if tag == T_LIST else tuple(items)
+        if tag == T_FLOAT:
+            return _DOUBLE.unpack(self.take(8))[0]
+        if tag == T_BYTES:
+            return bytes(self.take(self.uvarint()))
+        reader = _READERS.get(tag)
+        if reader is None:
+            raise ValueError(f"unknown value tag: {tag}")
+        return reader(self, depth)
+
+
+def _get_get_blocks(r: Reader, depth: int) -> GetBlocks:
+    return GetBlocks(from_height=r.svarint(), count=r.svarint())
+
+
+def _get_blocks(r: Reader, depth: int) -> BlocksResponse:
+    return BlocksResponse(
+        from_height=r.svarint(),
+        blocks=r.list_value(depth + 1),
+        certificates=r.list_value(depth + 1),
+    )
+
+
+def _get_get_txs(r: Reader, depth: int) -> GetTxs:
+    return GetTxs(tx_ids=r.hex_list(), block_hash=r.opt_hex())
+
+
+def _get_txs(r: Reader, depth: int) -> TxsResponse:
+    return TxsResponse(txs=r.list_value(depth + 1), block_hash=r.opt_hex())
+
+
+def _get_tx_inv(r: Reader, depth: int) -> TxInventory:
+    return TxInventory(tx_ids=r.hex_list())
+
+
+_READERS: Dict[int, Callable[[Reader, int], Any]] = {
+    T_GET_BLOCKS: _get_get_blocks,
+    T_BLOCKS: _get_blocks,
+    T_GET_TXS: _get_get_txs,
+    T_TXS: _get_txs,
+    T_TX_INV: _get_tx_inv,
+}
+
+
+def register_payload(
+    cls: type,
+    tag: int,
+    writer: Callable[[bytearray, Any], None],
+    reader: Callable[[Reader, int], Any],
+) -> None:
+    """
+    Đăng ký codec cho 1 kiểu payload. Module sở hữu kiểu (core / blocklayer / consensus) gọi lúc
+    import, nên network không phải import các module đó. `writer(out, value)` ghi các field,
+    `reader(r, depth)` đọc lại theo đúng thứ tự. Tag đã dùng cho kiểu khác -> ValueError.
+    """
+    owners = {registered_tag: registered_cls for registered_cls, (registered_tag, _) in _WRITERS.items()}
+    if owners.get(tag, cls) is not cls or _WRITERS.get(cls, (tag,))[0] != tag:
+        raise ValueError(f"payload tag {tag} / type {cls.__name__} already registered")
+    _WRITERS[cls] = (tag, writer)
+    _READERS[tag] = reader
+
+
+def _finish(r: Reader) -> None:
+    if r.pos != r.end:
+        raise ValueError(f"{r.end - r.pos} trailing bytes")
+
+
+def decode_payload(data) -> Any:
+    """Decode payload đã encode bằng `encode_payload` (bytes / bytearray / memoryview)."""
+    r = Reader(data)
+    value = r.value()
+    _finish(r)
+    return value
+
+
+def decode_message(data) -> Message:
+    """
+    Decode 1 frame (bytes / bytearray / memoryview) thành Message.
+    `encoded_size` của message trả về là độ dài frame. ValueError nếu frame sai.
+    """
+    r = Reader(data)
+    version = r.byte()
+    if version != WIRE_VERSION:
+        raise ValueError(f"unsupported wire version: {version}")
+    msg_type = MessageType(r.byte())
+    flags = r.byte()
+    if flags & ~(_FLAG_HEIGHT | _FLAG_GOSSIP):
+        raise ValueError(f"unknown flags: {flags}")
+    msg_id = r.uvarint()
+    height = r.svarint() if flags & _FLAG_HEIGHT else None
+    gossip_id = (r.hex(), r.uvarint()) if flags & _FLAG_GOSSIP else None
+    from_id = r.hex()
+    to_id = r.hex()
+    payload = r.value()
+    _finish(r)
+    return Message(
+        msg_id=msg_id,
+        from_id=from_id,
+        to_id=to_id,
+        msg_type=msg_type,
+        payload=payload,
+        height=height,
+        gossip_id=gossip_id,
+        encoded_size=r.end,
+    )
+
+
+def wire_size(msg: Message) -> int:
+    """Kích thước frame (bytes) của message theo wire format."""
+    return len(encode_message(msg))
@@ -0,0 +1,81 @@
+# event_queue.py
+from __future__ import annotations
+
+from enum import Enum, auto
+from typing import Any, List, Optional, Tuple
+import heapq
+
+from .messages import Message
+
+
+class NetworkEventType(Enum):
+    DELIVER = auto()
+    TIMER = auto()
+    ARRIVE = auto()  # message tới node nhận, còn phải chờ downlink (chỉ khi có giới hạn downlink)
+    DELIVER_BATCH = auto()  # các message cùng link (src, dst) gộp trong cửa sổ coalesce, giao 1 lần
+    PROCESS = auto()  # node xử lý xong message trước, lấy message kế tiếp trong inbox
+
+
+# Event trong queue: (time, seq, event_type, message, node_id, timer)
+# - DELIVER: `message` giao cho `node_id` (None -> message.to_id; broadcast dùng chung message)
+# - TIMER: `message` là None, `node_id` là node nhận, `timer` là dữ liệu timer
+# - ARRIVE: message đã tới node nhận lúc `time`, network xếp vào hàng đợi downlink rồi mới DELIVER
+# - DELIVER_BATCH: `message` là list các Message cùng link, `node_id` là node nhận
+# - PROCESS: `node_id` rảnh lúc `time`, lấy message kế tiếp trong inbox để xử lý
+Event = Tuple[float, int, NetworkEventType, Any, Optional[str], Any]
+
+
+class EventQueue:
+    """
+    Priority queue các event của Network, sắp theo (time, seq) để deterministic.
+    Lưu tuple thường trong heapq: so sánh tuple chạy trong C và dừng ở `seq`
+    (luôn khác nhau), không qua __lt__ của dataclass hay dựng sort_key cho từng event.
+    `seq` tăng dần theo thứ tự push -> event cùng thời điểm ra theo đúng thứ tự xếp lịch.
+    """
+
+    __slots__ = ("_heap", "_next_seq")
+
+    def __init__(self):
+        self._heap: List[Event] = []
+        self._next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def push(
+        self,
+        time: float,
+        event_type: NetworkEventType,
+        message: Any = None,
+        node_id: Optional[str] = None,
+        timer: Any = None,
+    ) -> int:
+        """Xếp lịch 1 event, trả về seq đã cấp."""
+        seq = self._next_seq
+        self._next_seq = seq + 1
+        heapq.heappush(self._heap, (time, seq, event_type, message, node_id, timer))
+        return seq
+
+    def push_deliveries(self, message: Message, deliveries: List[Tuple[float, str]]) -> None:
+        """
+        Xếp lịch DELIVER cùng 1 message cho nhiều người nhận: `deliveries` là [(time, node_id)],
+        seq cấp theo thứ tự danh sách (giống push lần lượt từng phần tử).
+        """
+        heap = self._heap
+        seq = self._next_seq
+        deliver = NetworkEventType.DELIVER
+        for time, node_id in deliveries:
+            heapq.heappush(heap, (time, seq, deliver, message, node_id, None))
+            seq += 1
+        self._next_seq = seq
+
+    def pop(self) -> Event:
+        """Lấy event sớm nhất (IndexError nếu queue rỗng)."""
+        return heapq.heappop(self._heap)
+
+    def peek_time(self) -> Optional[float]:
+        """Thời điểm của event sớm nhất, None nếu queue rỗng."""
+        return self._heap[0][0] if self._heap else None
@@ -0,0 +1,117 @@
+# inbox.py
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .messages import Message, MessageType
+
+INBOX_TAIL_DROP = "tail_drop"
+INBOX_PRIORITY = "priority"
+
+# Mức ưu tiên theo loại message (số nhỏ = quan trọng hơn): consensus > block/sync > tx
+MESSAGE_PRIORITY: Dict[MessageType, int] = {
+    MessageType.VOTE: 0,
+    MessageType.COMMIT: 0,
+    MessageType.BLOCK_HEADER: 0,
+    MessageType.BLOCK_BODY: 1,
+    MessageType.GET_BLOCKS: 1,
+    MessageType.BLOCKS: 1,
+    MessageType.GET_TXS: 1,
+    MessageType.TXS: 1,
+    MessageType.TX_INV: 2,
+    MessageType.TX: 2,
+}
+LOWEST_PRIORITY = 2
+
+
+@dataclass
+class InboxStats:
+    """
+    Bộ đếm inbox của 1 node:
+    - enqueued / processed: số message đã xếp hàng / đã giao cho node xử lý
+    - dropped: message tới bị bỏ vì inbox đầy; evicted: message đang chờ bị đẩy ra
+      nhường chỗ cho message ưu tiên cao hơn (policy `priority`)
+    - lost_by_type: msg_type -> số message mất (dropped + evicted)
+    - max_depth: số message chờ lớn nhất
+    """
+    enqueued: int = 0
+    processed: int = 0
+    dropped: int = 0
+    evicted: int = 0
+    max_depth: int = 0
+    lost_by_type: Dict[str, int] = field(default_factory=dict)
+
+
+class Inbox:
+    """
+    Hàng đợi message chờ node xử lý, giới hạn `capacity` message (None -> không giới hạn).
+    - `tail_drop`: xử lý theo thứ tự tới (FIFO); đầy thì bỏ message mới tới
+    - `priority`: xử lý mức ưu tiên cao trước (FIFO trong cùng mức, header vẫn trước body);
+      đầy thì message mới đẩy ra message chờ có mức ưu tiên thấp hơn (mới nhất trong mức thấp nhất),
+      không có thì bỏ message mới -> vote không bị tx chiếm chỗ hay phải chờ sau tx
+    Mỗi mức ưu tiên 1 deque (seq, message): FIFO lấy head có seq nhỏ nhất, đẩy ra = tail của mức thấp nhất.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, policy: str = INBOX_TAIL_DROP):
+        if policy not in (INBOX_TAIL_DROP, INBOX_PRIORITY):
+            raise ValueError(f"unknown inbox policy: {policy}")
+        assert capacity is None or capacity > 0
+        self.capacity = capacity
+        self.policy = policy
+        self._levels: List[Deque[Tuple[int, Message]]] = [deque() for _ in range(LOWEST_PRIORITY + 1)]
+        self._next_seq = 0
+        self._size = 0
+        self.stats = InboxStats()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def _lost(self, msg: Message) -> None:
+        name = msg.msg_type.name
+        self.stats.lost_by_type[name] = self.stats.lost_by_type.get(name, 0) + 1
+
+    def offer(self, msg: Message) -> Tuple[bool, Optional[Message]]:
+        """
+        Xếp message vào inbox. Trả về (đã nhận hay chưa, message bị đẩy ra nếu có).
+        """
+        priority = MESSAGE_PRIORITY.get(msg.msg_type, LOWEST_PRIORITY)
+        evicted = None
+        if self.capacity is not None and self._size >= self.capacity:
+            if self.policy == INBOX_PRIORITY:
+                for level in range(LOWEST_PRIORITY, priority, -1):
+                    if self._levels[level]:
+                        evicted = self._levels[level].pop()[1]
+                        self._size -= 1
+                        self.stats.evicted += 1
+                        self._lost(evicted)
+                        break
+            if evicted is None:
+                self.stats.dropped += 1
+                self._lost(msg)
+                return False, None
+        self._levels[priority].append((self._next_seq, msg))
+        self._next_seq += 1
+        self._size += 1
+        self.stats.enqueued += 1
+        if self._size > self.stats.max_depth:
+            self.stats.max_depth = self._size
+        return True, evicted
+
+    def pop(self) -> Message:
+        """Lấy message kế tiếp theo policy (IndexError nếu rỗng)."""
+        best = None
+        for queue in self._levels:
+            if queue and (best is None or queue[0][0] < best[0][0]):
+                best = queue
+                if self.policy == INBOX_PRIORITY:
+                    break
+        if best is None:
+            raise IndexError("pop from empty inbox")
+        self._size -= 1
+        self.stats.processed += 1
+        return best.popleft()[1]
@@ -0,0 +1,135 @@
+# latency.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+JITTER_NONE = "none"
+JITTER_LOGNORMAL = "lognormal"
+JITTER_PARETO = "pareto"
+
+
+class LatencyModel:
+    """
+    Độ trễ một chiều theo vùng (region):
+    - mỗi node thuộc 1 region, `rtt_ms[a][b]` là RTT cơ sở giữa region a và b
+      -> delay cơ sở = RTT / 2
+    - cộng thêm jitter >= 0:
+      - `lognormal`: median `median_ms`, độ lệch `sigma` (log-space)
+      - `pareto`: đuôi dài, `scale_ms * Lomax(shape)` (shape nhỏ -> đuôi nặng)
+    Delay của cả một broadcast lấy bằng 1 lần gọi NumPy (`sample`), RNG riêng
+    (numpy Generator với seed cố định) nên vẫn deterministic.
+    Node không có trong bảng region (ví dụ client bên ngoài) coi như cùng region với phía còn lại.
+    Mảng region của danh sách người nhận được cache (node broadcast lặp lại cùng danh sách peer),
+    nên mỗi broadcast chỉ còn vài phép NumPy thay vì tra dict cho từng người nhận.
+    """
+
+    # Số danh sách người nhận giữ trong cache (LRU)
+    MAX_CACHED_RECIPIENT_LISTS = 1024
+
+    def __init__(
+        self,
+        regions: List[str],
+        rtt_ms: List[List[float]],
+        node_regions: Dict[str, int],
+        jitter: Optional[dict] = None,
+        seed: int = 0,
+    ):
+        rtt = np.asarray(rtt_ms, dtype=float)
+        if rtt.shape != (len(regions), len(regions)):
+            raise ValueError("rtt_ms must be a square matrix matching regions")
+        if (rtt < 0).any():
+            raise ValueError("rtt_ms must be non-negative")
+        self.regions = list(regions)
+        self.node_regions = dict(node_regions)
+        # Delay cơ sở một chiều (giây)
+        self._base = (rtt + rtt.T) / 2 / 2 / 1000.0
+
+        jitter = jitter or {}
+        self.jitter_kind = jitter.get("kind", JITTER_NONE)
+        if self.jitter_kind not in (JITTER_NONE, JITTER_LOGNORMAL, JITTER_PARETO):
+            raise ValueError(f"unknown jitter kind: {self.jitter_kind}")
+        self._median = jitter.get("median_ms", 1.0) / 1000.0
+        self._sigma = jitter.get("sigma", 0.5)
+        self._scale = jitter.get("scale_ms", 1.0) / 1000.0
+        self._shape = jitter.get("shape", 2.5)
+        self._rng = np.random.default_rng(seed)
+        self._index_cache: "OrderedDict[Tuple[str, ...], np.ndarray]" = OrderedDict()
+
+    def region_of(self, node_id: str) -> Optional[int]:
+        return self.node_regions.get(node_id)
+
+    def _jitter(self, count: int) -> np.ndarray:
+        if self.jitter_kind == JITTER_LOGNORMAL:
+            return self._rng.lognormal(np.log(self._median), self._sigma, count)
+        if self.jitter_kind == JITTER_PARETO:
+            return self._scale * self._rng.pareto(self._shape, count)
+        return np.zeros(count)
+
+    def _receiver_regions(self, receivers: List[str]) -> np.ndarray:
+        """Region của từng người nhận (-1 nếu không có trong bảng), cache theo danh sách."""
+        key = tuple(receivers)
+        cached = self._index_cache.get(key)
+        if cached is not None:
+            self._index_cache.move_to_end(key)
+            return cached
+        regions = self.node_regions
+        cached = np.fromiter((regions.get(r, -1) for r in receivers), dtype=np.intp, count=len(receivers))
+        self._index_cache[key] = cached
+        if len(self._index_cache) > self.MAX_CACHED_RECIPIENT_LISTS:
+            self._index_cache.popitem(last=False)
+        return cached
+
+    def sample(self, sender: str, receivers: List[str]) -> List[float]:
+        """Delay (giây) từ `sender` tới từng node trong `receivers`, 1 lần rút jitter cho cả lô."""
+        dst = self._receiver_regions(receivers)
+        src = self.node_regions.get(sender)
+        if src is None:
+            # Gửi từ ngoài bảng region: delay nội vùng của người nhận
+            dst = np.where(dst < 0, 0, dst)
+            base = self._base[dst, dst]
+        else:
+            base = self._base[src, np.where(dst < 0, src, dst)]
+        return (base + self._jitter(len(receivers))).tolist()
+
+    def sample_one(self, sender: str, receiver: str) -> float:
+        return self.sample(sender, [receiver])[0]
+
+    @staticmethod
+    def from_config(config: dict, node_ids: List[str], seed: int = 0) -> "LatencyModel":
+        """
+        Tạo từ section `latency` trong YAML:
+            regions: [us, eu, asia]
+            rtt_ms: [[10, 80, 200], [80, 10, 150], [200, 150, 10]]
+            node_regions: [0, 1, 2, 0]   # tùy chọn, theo thứ tự node
+            region_weights: [2, 1, 1]    # tùy chọn, chia node thành khối liên tiếp theo tỉ lệ
+            jitter: {kind: lognormal, median_ms: 5, sigma: 0.5}
+        Không có `node_regions` / `region_weights` -> gán region xoay vòng.
+        """
+        regions = config.get("regions") or ["default"]
+        rtt_ms = config.get("rtt_ms") or [[0.0] * len(regions) for _ in regions]
+        n = len(node_ids)
+
+        if config.get("node_regions") is not None:
+            assignment = list(config["node_regions"])
+            if len(assignment) != n:
+                raise ValueError("node_regions must list one region per node")
+        elif config.get("region_weights") is not None:
+            weights = config["region_weights"]
+            if len(weights) != len(regions) or any(w < 0 for w in weights) or sum(weights) <= 0:
+                raise ValueError("region_weights must be non-negative, one per region")
+            total = sum(weights)
+            assignment = []
+            cumulative = 0.0
+            for region, w in enumerate(weights):
+                cumulative += w
+                assignment.extend([region] * (round(n * cumulative / total) - len(assignment)))
+        else:
+            assignment = [i % len(regions) for i in range(n)]
+
+        if any(not 0 <= r < len(regions) for r in assignment):
+            raise ValueError("region index out of range")
+        node_regions = {node_id: region for node_id, region in zip(node_ids, assignment)}
+        return LatencyModel(regions, rtt_ms, node_regions, config.get("jitter"), seed)
@@ -1,9 +1,13 @@
 # messages.py
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict, is_dataclass
 from enum import Enum, auto
-from typing import Any, Optional
+from typing import Any, List, Optional, Tuple
+import json
+
+# Kích thước ước lượng của phần header message (id, from, to, type, height)
+MESSAGE_HEADER_SIZE = 32
 
 
 class MessageType(Enum):
@@ -11,6 +15,12 @@ class MessageType(Enum):
     BLOCK_HEADER = auto()
     BLOCK_BODY = auto()
     VOTE = auto()
+    GET_BLOCKS = auto()
+    BLOCKS = auto()
+    GET_TXS = auto()
+    TXS = auto()
+    TX_INV = auto()
+    COMMIT = auto()
 
 
 @dataclass
@@ -22,6 +32,9 @@ class Message:
     - payload: nội dung (tx, block, vote, ...)
     - msg_type: loại message
     - height: optional, dùng cho log & consensus
+    - gossip_id: (node gốc, số thứ tự) nếu message được gossip qua overlay; node nhận
+      khử trùng lặp theo id này rồi relay tiếp cho neighbour. None -> gửi trực tiếp.
+    - encoded_size: kích thước (bytes) đã tính, cache bởi `message_size` (payload không đổi sau khi gửi)
     """
     msg_id: int
     from_id: str
@@ -29,3 +42,83 @@ class Message:
     msg_type: MessageType
     payload: Any
     height: Optional[int] = None
+    gossip_id: Optional[Tuple[str, int]] = None
+    encoded_size: Optional[int] = field(default=None, repr=False, compare=False)
+
+
+@dataclass(frozen=True)
+class GetBlocks:
+    """
+    Payload của GET_BLOCKS: xin `count` block liên tiếp bắt đầu từ `from_height`.
+    """
+    from_height: int
+    count: int
+
+
+@dataclass
+class BlocksResponse:
+    """
+    Payload của BLOCKS: các block liên tiếp bắt đầu từ `from_height`.
+    Danh sách có thể ngắn hơn `count` đã xin (peer chưa có đủ block).
+    `certificates[i]` là CommitCertificate của `blocks[i]` (None nếu peer không có).
+    """
+    from_height: int
+    blocks: List[Any] = field(default_factory=list)
+    certificates: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class GetTxs:
+    """
+    Payload của GET_TXS: xin các tx theo id.
+    `block_hash` khác None khi xin tx còn thiếu để dựng lại body của block đó.
+    """
+    tx_ids: List[str] = field(default_factory=list)
+    block_hash: Optional[str] = None
+
+
+@dataclass
+class TxsResponse:
+    """
+    Payload của TXS: các tx (SignedTx) trả lời cho GET_TXS.
+    """
+    txs: List[Any] = field(default_factory=list)
+    block_hash: Optional[str] = None
+
+
+@dataclass
+class TxInventory:
+    """
+    Payload của TX_INV: thông báo theo lô các tx id mà node gửi đang có.
+    Peer chỉ xin (GET_TXS) những tx chưa có.
+    """
+    tx_ids: List[str] = field(default_factory=list)
+
+
+def estimate_size(msg: Message) -> int:
+    """
+    Ước lượng kích thước (bytes) của message: header cố định + payload dạng JSON.
+    Chỉ dùng cho thống kê băng thông, không phải wire format.
+    """
+    payload = msg.payload
+    if is_dataclass(payload):
+        payload = asdict(payload)
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return MESSAGE_HEADER_SIZE + len(body)
+
+
+def message_size(msg: Message) -> int:
+    """
+    Kích thước message (bytes) theo wire format (`codec.wire_size`), tính 1 lần rồi cache trên message:
+    broadcast / relay / gửi lại cùng message không phải serialize payload lại.
+    Payload có kiểu codec không hỗ trợ -> dùng `estimate_size`.
+    """
+    size = msg.encoded_size
+    if size is None:
+        from .codec import wire_size  # import muộn: codec import messages
+        try:
+            size = wire_size(msg)
+        except TypeError:
+            size = estimate_size(msg)
+        msg.encoded_size = size
+    return size
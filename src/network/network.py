@@ -1,59 +1,65 @@
 # src/network/network.py
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, Optional, List, Tuple, Protocol
-from enum import Enum, auto
-import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, List, Tuple, Protocol
 import random
 
-from .messages import Message
+from .event_queue import EventQueue, NetworkEventType
+from .inbox import INBOX_TAIL_DROP, Inbox, InboxStats
+from .messages import Message, message_size
 from .logging_utils import JsonLinesLogger
+from .latency import LatencyModel
 
 
-class NetworkEventType(Enum):
-    DELIVER = auto()
-
-
-@dataclass(order=True)
-class ScheduledDelivery:
+@dataclass
+class LinkStats:
     """
-    Một lần delivery được xếp lịch trong event queue.
-    Priority queue sắp theo (deliver_time, seq) để deterministic.
+    Bộ đếm đường truyền của 1 node (chỉ ghi khi có bandwidth model hoặc collect_stats):
+    - bytes / messages đã gửi (uplink) và đã nhận (deliver)
+    - độ sâu hàng đợi uplink / downlink lớn nhất (số message đang chờ hoặc đang truyền)
+    - tổng thời gian uplink / downlink bận truyền (giây)
     """
-    sort_key: Tuple[float, int] = field(init=False, repr=False)
-
-    deliver_time: float
-    seq: int
-    message: Message
-
-    def __post_init__(self):
-        self.sort_key = (self.deliver_time, self.seq)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    messages_sent: int = 0
+    messages_received: int = 0
+    max_uplink_queue: int = 0
+    max_downlink_queue: int = 0
+    uplink_busy: float = 0.0
+    downlink_busy: float = 0.0
 
 
 class Node(Protocol):
     """
     Interface đơn giản cho Node:
     chỉ cần có .node_id và .receive(message, sim_time)
+    (tùy chọn .receive_batch(messages, sim_time) cho batch khi bật coalescing,
+    không có thì network gọi receive cho từng message)
     """
     node_id: str
 
     def receive(self, message: Message, sim_time: float) -> None:
         ...
 
-# ... (inside Network.deliver_next)
-
-        node.receive(msg, t)
-        return t
-
 
 class Network:
     """
     Network layer đơn giản:
-    - Event queue (priority queue) cho các lần deliver.
+    - Event queue (priority queue, `EventQueue`) cho các lần deliver / timer.
     - Simulate delay / drop / duplicate / reorder.
     - Throttle outbound rate (min interval giữa 2 lần gửi của 1 node).
+    - Bandwidth: mỗi node có uplink / downlink (bit/s); message được truyền tuần tự (FIFO),
+      delay serialize = kích thước * 8 / bandwidth, cộng vào delay lan truyền.
+    - Coalescing (tùy chọn): message cùng link trong 1 cửa sổ thời gian được giao thành 1 batch.
+    - Inbox (tùy chọn): node xử lý mỗi message mất `processing_time`, message tới lúc node bận
+      chờ trong inbox giới hạn `inbox_capacity` (tail-drop hoặc theo ưu tiên msg_type);
+      message bị bỏ -> báo backpressure cho node gửi (`on_backpressure(peer, sim_time)`).
     - Block / unblock peer: chặn tạm thời 1 hướng gửi (src -> dst).
+    - Broadcast: 1 message dùng chung cho nhiều người nhận, 1 dòng log cho cả lần gửi.
+    - Message chưa có id (msg_id == 0) được cấp id duy nhất, tăng dần theo thứ tự gửi (deterministic):
+      log SEND / BROADCAST / DELIVER cùng id, bản duplicate / replay giữ nguyên id.
     - Ghi log toàn bộ event bằng JSON lines (deterministic).
     """
 
@@ -67,6 +73,14 @@ class Network:
         drop_prob: float = 0.0,
         dup_prob: float = 0.0,
         min_send_interval: float = 0.0,
+        collect_stats: bool = False,
+        latency: Optional[LatencyModel] = None,
+        uplink_bps: Optional[float] = None,
+        downlink_bps: Optional[float] = None,
+        coalesce_window: float = 0.0,
+        inbox_capacity: Optional[int] = None,
+        inbox_policy: str = INBOX_TAIL_DROP,
+        processing_time: float = 0.0,
     ):
         """
         :param logger: JsonLinesLogger để ghi log.
@@ -76,8 +90,18 @@ class Network:
         :param drop_prob: xác suất drop 1 message.
         :param dup_prob: xác suất tạo 1 bản duplicate (2 lần deliver).
         :param min_send_interval: khoảng thời gian tối thiểu giữa 2 lần gửi từ 1 node.
+        :param collect_stats: đếm số message và bytes (ước lượng) theo msg_type.
+        :param latency: LatencyModel (region, RTT, jitter) thay cho uniform(min_delay, max_delay).
+        :param uplink_bps: băng thông gửi mặc định của mỗi node (bit/s), None -> không giới hạn.
+        :param downlink_bps: băng thông nhận mặc định của mỗi node (bit/s), None -> không giới hạn.
+        :param coalesce_window: > 0 -> gộp các message cùng link (src, dst) rời sender trong cửa sổ này
+            thành 1 lần deliver (1 event, 1 dòng log, 1 lần gọi node.receive_batch).
+        :param inbox_capacity: số message tối đa chờ trong inbox mỗi node, None -> không giới hạn.
+        :param inbox_policy: "tail_drop" (bỏ message mới) hoặc "priority" (vote/block đẩy tx ra).
+        :param processing_time: thời gian node xử lý 1 message (giây simulated), 0 -> xử lý ngay.
         """
         assert min_delay >= 0 and max_delay >= min_delay
+        assert coalesce_window >= 0
 
         self._logger = logger
         self._rng = rng or random.Random(0)
@@ -86,34 +110,79 @@ class Network:
         self._drop_prob = drop_prob
         self._dup_prob = dup_prob
         self._min_send_interval = min_send_interval
+        self._latency = latency
 
         self._nodes: Dict[str, Node] = {}
-        self._queue: List[ScheduledDelivery] = []
-        self._next_seq: int = 0
+        self._events = EventQueue()
+        self._next_msg_id: int = 1
         self._last_send_time: Dict[str, float] = {}  # node_id -> last send time
 
         # tập các cặp (src, dst) đang bị block
         self._blocked_pairs: set[tuple[str, str]] = set()
 
+        # thống kê: msg_type -> {"messages": n, "bytes": b}
+        self._collect_stats = collect_stats
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+        # bandwidth: mặc định + override theo node (set_bandwidth)
+        self._default_uplink = uplink_bps
+        self._default_downlink = downlink_bps
+        self._uplink_bps: Dict[str, Optional[float]] = {}
+        self._downlink_bps: Dict[str, Optional[float]] = {}
+        # node_id -> thời điểm kết thúc truyền của các message đang chờ / đang truyền (FIFO)
+        self._uplink_queue: Dict[str, Deque[float]] = {}
+        self._downlink_queue: Dict[str, Deque[float]] = {}
+        self._track_links = collect_stats or uplink_bps is not None or downlink_bps is not None
+        self.link_stats: Dict[str, LinkStats] = {}
+
+        # coalescing: (src, dst) -> batch đang mở (hạn chót nhận thêm message, list message, thời điểm giao)
+        self._coalesce_window = coalesce_window
+        self._open_batches: Dict[Tuple[str, str], Tuple[float, List[Message], float]] = {}
+
+        # inbox: chỉ bật khi có giới hạn inbox hoặc thời gian xử lý
+        self._inbox_capacity = inbox_capacity
+        self._inbox_policy = inbox_policy
+        self._default_processing_time = processing_time
+        self._processing_time: Dict[str, float] = {}
+        self._inbox_enabled = inbox_capacity is not None or processing_time > 0
+        self._inboxes: Dict[str, Inbox] = {}
+        self._busy_until: Dict[str, float] = {}  # node_id -> thời điểm xử lý xong message hiện tại
+        self._process_pending: set[str] = set()  # node đã có event PROCESS trong queue
+
     # ---------- quản lý node ----------
 
     def add_node(self, node: Node) -> None:
         self._nodes[node.node_id] = node
 
+    def set_bandwidth(
+        self, node_id: str, uplink_bps: Optional[float] = None, downlink_bps: Optional[float] = None
+    ) -> None:
+        """Đặt uplink / downlink (bit/s) riêng cho 1 node, None -> không giới hạn."""
+        self._uplink_bps[node_id] = uplink_bps
+        self._downlink_bps[node_id] = downlink_bps
+        if uplink_bps is not None or downlink_bps is not None:
+            self._track_links = True
+
+    def set_processing_time(self, node_id: str, seconds: float) -> None:
+        """Đặt thời gian xử lý 1 message riêng cho 1 node (mô phỏng node chậm)."""
+        assert seconds >= 0
+        self._processing_time[node_id] = seconds
+        if seconds > 0:
+            self._inbox_enabled = True
+
     # ---------- helper internal ----------
 
-    def _alloc_seq(self) -> int:
-        seq = self._next_seq
-        self._next_seq += 1
-        return seq
+    def _assign_msg_id(self, msg: Message) -> None:
+        """Cấp id cho message lần đầu được gửi; message đã có id (gửi lại, relay) giữ nguyên."""
+        if msg.msg_id == 0:
+            msg.msg_id = self._next_msg_id
+            self._next_msg_id += 1
 
-    def _schedule_delivery(self, deliver_time: float, msg: Message) -> None:
-        sd = ScheduledDelivery(
-            deliver_time=deliver_time,
-            seq=self._alloc_seq(),
-            message=msg,
-        )
-        heapq.heappush(self._queue, sd)
+    def _schedule_delivery(self, deliver_time: float, msg: Message, depart_time: float) -> None:
+        if self._coalesce_window > 0:
+            deliver_time = self._coalesce(msg, msg.to_id, depart_time, deliver_time)
+        else:
+            self._push_arrival(deliver_time, msg, None)
 
         # log SCHEDULE_DELIVER
         self._logger.log_event(
@@ -129,6 +198,15 @@ class Network:
             },
         )
 
+    def schedule_timer(self, node_id: str, delay: float, timer: Any, now: float) -> None:
+        """
+        Xếp lịch timer cho node: sau `delay` giây simulated time, network gọi
+        node.on_timer(timer, sim_time). Timer đi chung event queue với message
+        nên thứ tự xử lý vẫn deterministic.
+        """
+        fire_time = now + max(delay, 0.0)
+        self._events.push(fire_time, NetworkEventType.TIMER, None, node_id, timer)
+
     # ---------- block / unblock peer ----------
 
     def block_peer(self, src: str, dst: str, now: float) -> None:
@@ -169,6 +247,263 @@ class Network:
     def is_blocked(self, src: str, dst: str) -> bool:
         return (src, dst) in self._blocked_pairs
 
+    # ---------- bandwidth ----------
+
+    def _uplink_of(self, node_id: str) -> Optional[float]:
+        return self._uplink_bps.get(node_id, self._default_uplink)
+
+    def _downlink_of(self, node_id: str) -> Optional[float]:
+        return self._downlink_bps.get(node_id, self._default_downlink)
+
+    def _link_stats(self, node_id: str) -> LinkStats:
+        stats = self.link_stats.get(node_id)
+        if stats is None:
+            stats = self.link_stats[node_id] = LinkStats()
+        return stats
+
+    @staticmethod
+    def _serialize(queue: Deque[float], now: float, size: int, bps: float) -> Tuple[float, int]:
+        """
+        Xếp 1 message vào hàng đợi FIFO của link: bắt đầu truyền khi message trước truyền xong.
+        Trả về (thời điểm truyền xong, độ sâu hàng đợi sau khi xếp).
+        """
+        while queue and queue[0] <= now:
+            queue.popleft()
+        start = queue[-1] if queue else now
+        done = start + size * 8 / bps
+        queue.append(done)
+        return done, len(queue)
+
+    def _transmit(self, sender: str, msg: Message, send_time: float) -> float:
+        """
+        Đưa 1 bản message lên uplink của sender (kể cả bản sẽ bị drop trên đường).
+        Trả về thời điểm rời uplink (= send_time nếu không giới hạn uplink).
+        """
+        if not self._track_links:
+            return send_time
+        size = message_size(msg)
+        stats = self._link_stats(sender)
+        stats.bytes_sent += size
+        stats.messages_sent += 1
+        bps = self._uplink_of(sender)
+        if bps is None:
+            return send_time
+        queue = self._uplink_queue.setdefault(sender, deque())
+        done, depth = self._serialize(queue, send_time, size, bps)
+        stats.uplink_busy += size * 8 / bps
+        if depth > stats.max_uplink_queue:
+            stats.max_uplink_queue = depth
+        return done
+
+    def _push_arrival(self, arrive_time: float, msg: Message, receiver: Optional[str]) -> None:
+        """
+        Xếp lịch message tới `receiver` lúc `arrive_time`: có giới hạn downlink -> event ARRIVE
+        (xếp hàng downlink theo đúng thứ tự tới), không -> DELIVER luôn.
+        `receiver` None -> người nhận là msg.to_id (send point-to-point).
+        """
+        event_type = NetworkEventType.DELIVER
+        if self._track_links and self._downlink_of(receiver if receiver is not None else msg.to_id) is not None:
+            event_type = NetworkEventType.ARRIVE
+        self._events.push(arrive_time, event_type, msg, receiver)
+
+    def _on_arrive(self, t: float, msg: Message, node_id: Optional[str]) -> None:
+        """Message tới node nhận lúc `t`: truyền qua downlink (FIFO) rồi xếp lịch DELIVER."""
+        receiver = node_id if node_id is not None else msg.to_id
+        size = message_size(msg)
+        bps = self._downlink_of(receiver)
+        queue = self._downlink_queue.setdefault(receiver, deque())
+        done, depth = self._serialize(queue, t, size, bps)
+        stats = self._link_stats(receiver)
+        stats.downlink_busy += size * 8 / bps
+        if depth > stats.max_downlink_queue:
+            stats.max_downlink_queue = depth
+        self._events.push(done, NetworkEventType.DELIVER, msg, node_id)
+
+    # ---------- coalescing ----------
+
+    def _coalesce(self, msg: Message, receiver: str, depart_time: float, deliver_time: float) -> float:
+        """
+        Đưa message vào batch đang mở của link (msg.from_id, receiver) nếu nó rời sender trước
+        hạn chót của batch; không thì mở batch mới: hạn chót = depart_time + window, giao lúc
+        deliver_time + window (message đầu chờ cả cửa sổ rồi đi cùng cả batch, không message nào
+        tới trước lúc được gửi). Trả về thời điểm batch được giao.
+        Receiver bị giới hạn downlink -> không gộp, message đi qua ARRIVE như bình thường.
+        """
+        if self._track_links and self._downlink_of(receiver) is not None:
+            self._push_arrival(deliver_time, msg, receiver)
+            return deliver_time
+        key = (msg.from_id, receiver)
+        batch = self._open_batches.get(key)
+        if batch is not None and depart_time <= batch[0]:
+            batch[1].append(msg)
+            return batch[2]
+        window = self._coalesce_window
+        batch = (depart_time + window, [msg], deliver_time + window)
+        self._open_batches[key] = batch
+        self._events.push(batch[2], NetworkEventType.DELIVER_BATCH, batch[1], receiver)
+        return batch[2]
+
+    def _deliver_batch(self, t: float, messages: List[Message], receiver: str) -> None:
+        """Giao cả batch của 1 link: 1 dòng log DELIVER_BATCH, 1 lần gọi node.receive_batch."""
+        first = messages[0]
+        sender = first.from_id
+        key = (sender, receiver)
+        batch = self._open_batches.get(key)
+        if batch is not None and batch[1] is messages:
+            del self._open_batches[key]
+        msg_ids = [m.msg_id for m in messages]
+
+        if self.is_blocked(sender, receiver):
+            self._logger.log_event(
+                sim_time=t,
+                node_id=receiver,
+                event="DELIVER_BLOCKED",
+                height=first.height,
+                msg_id=None,
+                extra={"from": sender, "to": receiver, "msg_ids": msg_ids, "reason": "blocked_peer"},
+            )
+            return
+
+        node = self._nodes.get(receiver)
+        if node is None:
+            self._logger.log_event(
+                sim_time=t,
+                node_id=receiver,
+                event="DELIVER_DROPPED_NO_NODE",
+                height=first.height,
+                msg_id=None,
+                extra={"from": sender, "to": receiver, "msg_ids": msg_ids},
+            )
+            return
+
+        self._logger.log_event(
+            sim_time=t,
+            node_id=receiver,
+            event="DELIVER_BATCH",
+            height=first.height,
+            msg_id=None,
+            extra={"from": sender, "to": receiver, "msg_ids": msg_ids},
+        )
+
+        if self._track_links:
+            stats = self._link_stats(receiver)
+            for m in messages:
+                stats.bytes_received += message_size(m)
+            stats.messages_received += len(messages)
+
+        self._hand_over(node, receiver, messages, t)
+
+    # ---------- inbox / backpressure ----------
+
+    def _inbox_of(self, node_id: str) -> Inbox:
+        inbox = self._inboxes.get(node_id)
+        if inbox is None:
+            inbox = self._inboxes[node_id] = Inbox(self._inbox_capacity, self._inbox_policy)
+        return inbox
+
+    def _hand_over(self, node: Node, receiver: str, messages: List[Message], t: float) -> None:
+        """
+        Giao message đã tới cho node: không bật inbox -> gọi receive / receive_batch ngay.
+        Có inbox: node rảnh và inbox rỗng -> xử lý ngay (bận thêm processing_time mỗi message),
+        ngược lại xếp từng message vào inbox và hẹn event PROCESS lúc node rảnh.
+        """
+        if self._inbox_enabled:
+            inbox = self._inbox_of(receiver)
+            if inbox or self._busy_until.get(receiver, t) > t:
+                for m in messages:
+                    accepted, evicted = inbox.offer(m)
+                    if evicted is not None:
+                        self._on_inbox_drop(evicted, receiver, t, "evicted")
+                    if not accepted:
+                        self._on_inbox_drop(m, receiver, t, "inbox_full")
+                if inbox and receiver not in self._process_pending:
+                    self._process_pending.add(receiver)
+                    self._events.push(self._busy_until[receiver], NetworkEventType.PROCESS, None, receiver)
+                return
+            processing = self._processing_time.get(receiver, self._default_processing_time)
+            self._busy_until[receiver] = t + processing * len(messages)
+            inbox.stats.processed += len(messages)
+
+        if len(messages) == 1:
+            node.receive(messages[0], t)
+            return
+        receive_batch = getattr(node, "receive_batch", None)
+        if receive_batch is not None:
+            receive_batch(messages, t)
+        else:
+            for m in messages:
+                node.receive(m, t)
+
+    def _on_process(self, t: float, receiver: str) -> None:
+        """Node rảnh: lấy message kế tiếp trong inbox, hẹn PROCESS tiếp nếu còn message chờ."""
+        self._process_pending.discard(receiver)
+        inbox = self._inboxes.get(receiver)
+        node = self._nodes.get(receiver)
+        if not inbox or node is None:
+            return
+        msg = inbox.pop()
+        processing = self._processing_time.get(receiver, self._default_processing_time)
+        self._busy_until[receiver] = t + processing
+        if inbox:
+            self._process_pending.add(receiver)
+            self._events.push(t + processing, NetworkEventType.PROCESS, None, receiver)
+        node.receive(msg, t)
+
+    def _on_inbox_drop(self, msg: Message, receiver: str, t: float, reason: str) -> None:
+        """Log message bị bỏ ở inbox và báo backpressure cho node gửi (nếu node có on_backpressure)."""
+        self._logger.log_event(
+            sim_time=t,
+            node_id=receiver,
+            event="INBOX_DROP",
+            height=msg.height,
+            msg_id=msg.msg_id,
+            extra={
+                "from": msg.from_id,
+                "to": receiver,
+                "msg_type": msg.msg_type.name,
+                "reason": reason,
+            },
+        )
+        sender = self._nodes.get(msg.from_id)
+        on_backpressure = getattr(sender, "on_backpressure", None)
+        if on_backpressure is not None:
+            on_backpressure(receiver, t)
+
+    def inbox_stats(self, node_id: str) -> InboxStats:
+        """Bộ đếm inbox của node (enqueued, processed, dropped, evicted, max_depth, ...)."""
+        return self._inbox_of(node_id).stats
+
+    def inbox_depth(self, node_id: str) -> int:
+        """Số message đang chờ trong inbox của node."""
+        inbox = self._inboxes.get(node_id)
+        return len(inbox) if inbox is not None else 0
+
+    def backpressure(self, node_id: str) -> float:
+        """Mức đầy inbox của node (0..1); inbox không giới hạn -> 0."""
+        if not self._inbox_capacity:
+            return 0.0
+        return self.inbox_depth(node_id) / self._inbox_capacity
+
+    def queue_depth(self, node_id: str, now: float) -> Tuple[int, int]:
+        """Số message đang chờ / đang truyền trên (uplink, downlink) của node tại thời điểm `now`."""
+        up = sum(1 for t in self._uplink_queue.get(node_id, ()) if t > now)
+        down = sum(1 for t in self._downlink_queue.get(node_id, ()) if t > now)
+        return up, down
+
+    # ---------- thống kê ----------
+
+    def _record_stats(self, msg: Message, count: int = 1) -> None:
+        entry = self.stats.setdefault(msg.msg_type.name, {"messages": 0, "bytes": 0})
+        entry["messages"] += count
+        entry["bytes"] += count * message_size(msg)
+
+    def total_stats(self) -> Dict[str, int]:
+        """Tổng số message và bytes đã gửi (mọi msg_type)."""
+        return {
+            "messages": sum(e["messages"] for e in self.stats.values()),
+            "bytes": sum(e["bytes"] for e in self.stats.values()),
+        }
+
     # ---------- API chính ----------
 
     def send(self, msg: Message, now: float) -> None:
@@ -177,12 +512,14 @@ class Network:
         Thực tế nó sẽ:
         - áp dụng throttle
         - nếu cặp (from, to) đang bị block → log & bỏ
+        - đưa lên uplink của sender (FIFO nếu giới hạn bandwidth)
         - random drop/duplicate
-        - random delay → xếp lịch deliver vào priority queue
+        - random delay → xếp lịch deliver vào priority queue (qua downlink nếu giới hạn)
         """
 
         sender = msg.from_id
         receiver = msg.to_id
+        self._assign_msg_id(msg)
 
         # throttle outbound rate
         last_t = self._last_send_time.get(sender, -1e18)
@@ -204,6 +541,9 @@ class Network:
             },
         )
 
+        if self._collect_stats:
+            self._record_stats(msg)
+
         # nếu đang bị block → log và dừng
         if self.is_blocked(sender, receiver):
             self._logger.log_event(
@@ -220,6 +560,9 @@ class Network:
             )
             return
 
+        # uplink: message rời sender khi truyền xong (bản bị drop vẫn chiếm uplink)
+        depart_time = self._transmit(sender, msg, send_time)
+
         # random drop
         if self._rng.random() < self._drop_prob:
             self._logger.log_event(
@@ -237,16 +580,19 @@ class Network:
             return
 
         # tính delay & schedule deliver
-        delay = self._rng.uniform(self._min_delay, self._max_delay)
-        deliver_time = send_time + delay
-        self._schedule_delivery(deliver_time, msg)
+        if self._latency is not None:
+            delay = self._latency.sample_one(sender, receiver)
+        else:
+            delay = self._rng.uniform(self._min_delay, self._max_delay)
+        deliver_time = depart_time + delay
+        self._schedule_delivery(deliver_time, msg, depart_time)
 
         # duplicate ?
         if self._rng.random() < self._dup_prob:
             # thêm một bản duplicate với delay hơi khác để tạo reorder
             extra_delay = self._rng.uniform(0.0, self._min_delay)
             dup_time = deliver_time + extra_delay
-            self._schedule_delivery(dup_time, msg)
+            self._schedule_delivery(dup_time, msg, depart_time)
 
             self._logger.log_event(
                 sim_time=send_time,
@@ -260,9 +606,96 @@ class Network:
                 },
             )
 
+    def broadcast(self, msg: Message, recipients: List[str], now: float) -> None:
+        """
+        Gửi cùng một message (không clone) từ msg.from_id tới từng node trong `recipients`.
+        - throttle tính 1 lần cho cả broadcast
+        - drop / delay / duplicate của mọi người nhận được rút theo lô, mỗi người nhận
+          luôn đúng 3 lần rút (drop, delay, dup) theo thứ tự `recipients` -> deterministic
+          và không phụ thuộc kết quả drop; có LatencyModel thì delay cả lô lấy từ 1 lần gọi NumPy
+        - log 1 dòng BROADCAST (số người nhận, danh sách bị drop/block/duplicate)
+          thay cho SEND + SCHEDULE_DELIVER của từng người nhận
+        - giới hạn uplink: các bản gửi cho từng người nhận truyền nối tiếp theo thứ tự `recipients`
+        """
+        sender = msg.from_id
+        count = len(recipients)
+        if count == 0:
+            return
+        self._assign_msg_id(msg)
+
+        last_t = self._last_send_time.get(sender, -1e18)
+        send_time = max(now, last_t + self._min_send_interval)
+        self._last_send_time[sender] = send_time
+
+        if self._collect_stats:
+            self._record_stats(msg, count)
+
+        rng = self._rng
+        drops = [rng.random() for _ in range(count)]
+        if self._latency is not None:
+            delays = self._latency.sample(sender, recipients)
+        else:
+            delays = [rng.uniform(self._min_delay, self._max_delay) for _ in range(count)]
+        dups = [rng.random() for _ in range(count)]
+
+        dropped: List[str] = []
+        blocked: List[str] = []
+        duplicated: List[str] = []
+        # Không giới hạn bandwidth: gom (time, người nhận) rồi xếp lịch cả lô
+        deliveries: List[Tuple[float, str]] = []
+        track_links = self._track_links
+        coalesce = self._coalesce_window > 0
+        for receiver, drop, delay, dup in zip(recipients, drops, delays, dups):
+            if self._blocked_pairs and (sender, receiver) in self._blocked_pairs:
+                blocked.append(receiver)
+                continue
+            depart_time = self._transmit(sender, msg, send_time) if track_links else send_time
+            if drop < self._drop_prob:
+                dropped.append(receiver)
+                continue
+            deliver_time = depart_time + delay
+            if coalesce:
+                self._coalesce(msg, receiver, depart_time, deliver_time)
+            elif track_links:
+                self._push_arrival(deliver_time, msg, receiver)
+            else:
+                deliveries.append((deliver_time, receiver))
+            if dup < self._dup_prob:
+                # bản duplicate trễ thêm (min_delay * dup / dup_prob) để tạo reorder, không rút thêm RNG
+                extra_delay = self._min_delay * dup / self._dup_prob
+                if coalesce:
+                    self._coalesce(msg, receiver, depart_time, deliver_time + extra_delay)
+                elif track_links:
+                    self._push_arrival(deliver_time + extra_delay, msg, receiver)
+                else:
+                    deliveries.append((deliver_time + extra_delay, receiver))
+                duplicated.append(receiver)
+        if deliveries:
+            self._events.push_deliveries(msg, deliveries)
+
+        extra: Dict[str, Any] = {
+            "from": sender,
+            "msg_type": msg.msg_type.name,
+            "recipients": count,
+        }
+        if dropped:
+            extra["dropped"] = dropped
+        if blocked:
+            extra["blocked"] = blocked
+        if duplicated:
+            extra["duplicated"] = duplicated
+        self._logger.log_event(
+            sim_time=send_time,
+            node_id=sender,
+            event="BROADCAST",
+            height=msg.height,
+            msg_id=msg.msg_id,
+            extra=extra,
+        )
+
     def has_pending_events(self) -> bool:
         """Kiểm tra còn event trong queue không."""
-        return bool(self._queue)
+        return bool(self._events)
 
     def deliver_next(self) -> Optional[float]:
         """
@@ -271,14 +704,40 @@ class Network:
         - ngược lại: log DELIVER rồi gọi Node.receive(message)
         Trả về simulated_time của lần deliver này, hoặc None nếu queue rỗng.
         """
-        if not self._queue:
+        if not self._events:
             return None
 
-        sd = heapq.heappop(self._queue)
-        msg = sd.message
-        t = sd.deliver_time
+        t, _, event_type, msg, node_id, timer = self._events.pop()
+
+        if event_type is NetworkEventType.TIMER:
+            node = self._nodes.get(node_id)
+            if node is not None:
+                self._logger.log_event(
+                    sim_time=t,
+                    node_id=node_id,
+                    event="TIMER",
+                    height=None,
+                    msg_id=None,
+                    extra={"timer": str(timer)},
+                )
+                node.on_timer(timer, t)
+            return t
+
+        if event_type is NetworkEventType.ARRIVE:
+            self._on_arrive(t, msg, node_id)
+            return t
+
+        if event_type is NetworkEventType.DELIVER_BATCH:
+            self._deliver_batch(t, msg, node_id)
+            return t
+
+        if event_type is NetworkEventType.PROCESS:
+            self._on_process(t, node_id)
+            return t
+
         sender = msg.from_id
-        receiver = msg.to_id
+        # delivery của broadcast: người nhận nằm ở node_id (message dùng chung)
+        receiver = node_id if node_id is not None else msg.to_id
 
         # nếu cặp đang bị block tại thời điểm deliver → drop
         if self.is_blocked(sender, receiver):
@@ -326,5 +785,13 @@ class Network:
             },
         )
 
-        node.receive(msg, t)
+        if self._track_links:
+            stats = self._link_stats(receiver)
+            stats.bytes_received += message_size(msg)
+            stats.messages_received += 1
+
+        if self._inbox_enabled:
+            self._hand_over(node, receiver, [msg], t)
+        else:
+            node.receive(msg, t)
         return t
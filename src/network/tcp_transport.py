@@ -0,0 +1,334 @@
+# src/network/tcp_transport.py
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import struct
+
+from .codec import decode_message, encode_message
+from .logging_utils import JsonLinesLogger
+from .messages import Message
+from .network import LinkStats, Node
+
+# Frame trên TCP: độ dài u32 big-endian + frame của codec
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+READ_CHUNK = 256 * 1024
+
+
+class _Link:
+    """
+    Kết nối TCP bền (src -> dst), mở lần đầu khi có dữ liệu và dùng lại cho mọi message sau.
+    `buffer` gom các frame chờ gửi; 1 task flush ghi cả buffer bằng 1 lần write.
+    """
+
+    __slots__ = ("src", "dst", "writer", "buffer", "frames", "flushing")
+
+    def __init__(self, src: str, dst: str):
+        self.src = src
+        self.dst = dst
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.buffer = bytearray()
+        self.frames = 0  # số frame đang nằm trong buffer
+        self.flushing = False
+
+
+class TcpTransport:
+    """
+    Transport asyncio thay cho Network: cùng interface `add_node` / `send` / `broadcast` /
+    `schedule_timer` nên Node chạy không đổi, nhưng message đi qua socket TCP thật trên localhost
+    và thời gian là thời gian thực (giây kể từ `start`).
+    - Mỗi node lắng nghe 1 port (`base_port + thứ tự add_node`, 0 -> OS chọn), `addresses[node_id]`.
+    - Mỗi link (src, dst) 1 kết nối bền, mở lúc gửi lần đầu, dùng lại cho mọi message sau.
+    - Frame: độ dài u32 + `codec.encode_message`; broadcast encode 1 lần cho mọi người nhận.
+    - Write batching: frame gửi trong cùng 1 vòng event loop (hoặc trong lúc kết nối đang drain)
+      dồn vào buffer của link và ghi bằng 1 lần write; bên nhận đọc theo chunk, mọi frame đủ
+      trong chunk giao 1 lần qua `receive_batch` (không có thì `receive` từng message).
+    - Buffer của link vượt `high_water` bytes -> báo `on_backpressure(peer, t)` cho node gửi.
+    - Message chưa có id (msg_id == 0) được cấp id duy nhất như Network.
+    Handler của node chạy trên event loop; exception được giữ lại và ném ra ở `run_until`.
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        base_port: int = 0,
+        logger: Optional[JsonLinesLogger] = None,
+        high_water: int = 4 * 1024 * 1024,
+    ):
+        """
+        :param host: địa chỉ lắng nghe / kết nối.
+        :param base_port: port của node đầu tiên (node thứ i dùng base_port + i), 0 -> OS chọn port trống.
+        :param logger: JsonLinesLogger ghi SEND / BROADCAST / DELIVER (thời gian thực), None -> không log.
+        :param high_water: số byte chờ gửi trên 1 link mà vượt quá thì báo backpressure cho node gửi.
+        """
+        self.host = host
+        self.base_port = base_port
+        self.high_water = high_water
+        self._logger = logger
+
+        self._nodes: Dict[str, Node] = {}
+        self.addresses: Dict[str, Tuple[str, int]] = {}
+        self._servers: List[asyncio.AbstractServer] = []
+        self._links: Dict[Tuple[str, str], _Link] = {}
+        self._next_msg_id = 1
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_time = 0.0
+        self._pending_timers: List[Tuple[str, float, Any]] = []  # timer đặt trước khi start
+        self._timers: Set[asyncio.TimerHandle] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._peer_writers: Set[asyncio.StreamWriter] = set()  # kết nối phía nhận
+        self.errors: List[BaseException] = []
+
+        self.link_stats: Dict[str, LinkStats] = {}
+        self.writes = 0  # số lần write xuống socket (mỗi lần gồm 1 hoặc nhiều frame)
+        self.frames_sent = 0
+
+    # ---------- quản lý node ----------
+
+    def add_node(self, node: Node) -> None:
+        self._nodes[node.node_id] = node
+
+    def _link_stats(self, node_id: str) -> LinkStats:
+        stats = self.link_stats.get(node_id)
+        if stats is None:
+            stats = self.link_stats[node_id] = LinkStats()
+        return stats
+
+    # ---------- vòng đời ----------
+
+    async def start(self) -> None:
+        """Mở server cho mọi node đã add, gửi các frame / timer xếp trước khi start."""
+        self._loop = asyncio.get_running_loop()
+        self._start_time = self._loop.time()
+        for index, node_id in enumerate(self._nodes):
+            port = self.base_port + index if self.base_port else 0
+            server = await asyncio.start_server(
+                lambda reader, writer, node_id=node_id: self._serve(node_id, reader, writer),
+                self.host, port,
+            )
+            self._servers.append(server)
+            self.addresses[node_id] = server.sockets[0].getsockname()[:2]
+        pending, self._pending_timers = self._pending_timers, []
+        for node_id, fire_time, timer in pending:
+            self._arm_timer(node_id, fire_time, timer)
+        for link in self._links.values():
+            if link.buffer:
+                self._schedule_flush(link)
+
+    async def close(self) -> None:
+        """Hủy timer, đóng mọi kết nối và server."""
+        for handle in self._timers:
+            handle.cancel()
+        self._timers.clear()
+        for task in list(self._tasks):
+            task.cancel()
+        writers = [link.writer for link in self._links.values() if link.writer is not None]
+        writers += list(self._peer_writers)
+        for writer in writers:
+            writer.close()
+        for server in self._servers:
+            server.close()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+
+    def now(self) -> float:
+        """Thời gian thực (giây) kể từ `start`, 0 nếu chưa start."""
+        return self._loop.time() - self._start_time if self._loop is not None else 0.0
+
+    async def run_until(self, predicate: Callable[[], bool], timeout: float, poll: float = 0.01) -> bool:
+        """
+        Chờ tới khi `predicate()` đúng (True) hoặc hết `timeout` giây (False).
+        Exception trong handler của node / task gửi được ném lại ở đây.
+        """
+        deadline = self.now() + timeout
+        while True:
+            if self.errors:
+                raise self.errors[0]
+            if predicate():
+                return True
+            if self.now() >= deadline:
+                return False
+            await asyncio.sleep(poll)
+
+    def _spawn(self, coro) -> None:
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors.append(task.exception())
+
+    # ---------- timer ----------
+
+    def schedule_timer(self, node_id: str, delay: float, timer: Any, now: float) -> None:
+        """Sau `delay` giây (tính từ `now`) gọi node.on_timer(timer, t) trên event loop."""
+        fire_time = now + max(delay, 0.0)
+        if self._loop is None:
+            self._pending_timers.append((node_id, fire_time, timer))
+        else:
+            self._arm_timer(node_id, fire_time, timer)
+
+    def _arm_timer(self, node_id: str, fire_time: float, timer: Any) -> None:
+        handle = None
+
+        def fire():
+            self._timers.discard(handle)
+            node = self._nodes.get(node_id)
+            if node is None:
+                return
+            try:
+                node.on_timer(timer, self.now())
+            except Exception as exc:
+                self.errors.append(exc)
+
+        handle = self._loop.call_at(self._start_time + fire_time, fire)
+        self._timers.add(handle)
+
+    # ---------- gửi ----------
+
+    def _assign_msg_id(self, msg: Message) -> None:
+        if msg.msg_id == 0:
+            msg.msg_id = self._next_msg_id
+            self._next_msg_id += 1
+
+    def _frame(self, msg: Message) -> bytes:
+        frame = encode_message(msg)
+        msg.encoded_size = len(frame)
+        return FRAME_HEADER.pack(len(frame)) + frame
+
+    def _enqueue(self, sender: str, receiver: str, data: bytes, now: float) -> None:
+        link = self._links.get((sender, receiver))
+        if link is None:
+            link = self._links[(sender, receiver)] = _Link(sender, receiver)
+        link.buffer += data
+        link.frames += 1
+        stats = self._link_stats(sender)
+        stats.bytes_sent += len(data)
+        stats.messages_sent += 1
+        if len(link.buffer) > self.high_water:
+            node = self._nodes.get(sender)
+            if node is not None and hasattr(node, "on_backpressure"):
+                node.on_backpressure(receiver, now)
+        if self._loop is not None and not link.flushing:
+            self._schedule_flush(link)
+
+    def _schedule_flush(self, link: _Link) -> None:
+        link.flushing = True
+        self._spawn(self._flush(link))
+
+    async def _flush(self, link: _Link) -> None:
+        """Ghi buffer của link (mở kết nối nếu chưa có); frame thêm vào lúc drain đi chung lần write sau."""
+        try:
+            if link.writer is None:
+                if link.dst not in self.addresses:
+                    raise KeyError(f"unknown node: {link.dst}")
+                _, link.writer = await asyncio.open_connection(*self.addresses[link.dst])
+            while link.buffer:
+                data, link.buffer = link.buffer, bytearray()
+                self.frames_sent += link.frames
+                link.frames = 0
+                self.writes += 1
+                link.writer.write(data)
+                await link.writer.drain()
+        finally:
+            link.flushing = False
+
+    def send(self, msg: Message, now: float) -> None:
+        """Gửi message từ msg.from_id tới msg.to_id qua kết nối TCP của link."""
+        self._assign_msg_id(msg)
+        if self._logger is not None:
+            self._log(now, msg.from_id, "SEND", msg, {"from": msg.from_id, "to": msg.to_id})
+        self._enqueue(msg.from_id, msg.to_id, self._frame(msg), now)
+
+    def broadcast(self, msg: Message, recipients: List[str], now: float) -> None:
+        """Gửi cùng 1 message tới từng node trong `recipients`; frame encode 1 lần."""
+        if not recipients:
+            return
+        self._assign_msg_id(msg)
+        if self._logger is not None:
+            self._log(now, msg.from_id, "BROADCAST", msg, {"from": msg.from_id, "recipients": len(recipients)})
+        data = self._frame(msg)
+        for receiver in recipients:
+            self._enqueue(msg.from_id, receiver, data, now)
+
+    # ---------- nhận ----------
+
+    async def _serve(self, node_id: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Đọc frame từ 1 kết nối tới `node_id`, giao theo từng chunk đọc được."""
+        self._peer_writers.add(writer)
+        pending = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(READ_CHUNK)
+                if not chunk:
+                    return
+                pending += chunk
+                messages, consumed = self._parse_frames(pending)
+                if consumed:
+                    del pending[:consumed]
+                if messages:
+                    self._deliver(node_id, messages)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        except Exception as exc:
+            self.errors.append(exc)
+        finally:
+            self._peer_writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _parse_frames(buffer: bytearray) -> Tuple[List[Message], int]:
+        """Decode mọi frame đủ trong buffer (trên memoryview, không copy), trả về (messages, số byte đã dùng)."""
+        messages = []
+        pos = 0
+        end = len(buffer)
+        header_size = FRAME_HEADER.size
+        with memoryview(buffer) as view:
+            while end - pos >= header_size:
+                (size,) = FRAME_HEADER.unpack_from(view, pos)
+                if size > MAX_FRAME_SIZE:
+                    raise ValueError(f"frame too large: {size}")
+                if end - pos - header_size < size:
+                    break
+                start = pos + header_size
+                with view[start:start + size] as frame:
+                    messages.append(decode_message(frame))
+                pos = start + size
+        return messages, pos
+
+    def _deliver(self, receiver: str, messages: List[Message]) -> None:
+        node = self._nodes.get(receiver)
+        if node is None:
+            return
+        now = self.now()
+        stats = self._link_stats(receiver)
+        stats.messages_received += len(messages)
+        for msg in messages:
+            stats.bytes_received += msg.encoded_size + FRAME_HEADER.size
+        if self._logger is not None:
+            for msg in messages:
+                self._log(now, receiver, "DELIVER", msg, {"from": msg.from_id, "to": receiver})
+        if len(messages) == 1:
+            node.receive(messages[0], now)
+        elif hasattr(node, "receive_batch"):
+            node.receive_batch(messages, now)
+        else:
+            for msg in messages:
+                node.receive(msg, now)
+
+    def _log(self, t: float, node_id: str, event: str, msg: Message, extra: Dict[str, Any]) -> None:
+        extra["msg_type"] = msg.msg_type.name
+        self._logger.log_event(sim_time=t, node_id=node_id, event=event, height=msg.height,
+                               msg_id=msg.msg_id, extra=extra)
@@ -0,0 +1,136 @@
+# topology.py
+from __future__ import annotations
+
+import random
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Overlay: node_id -> danh sách neighbour (đối xứng, đã sort)
+Topology = Dict[str, List[str]]
+
+TOPOLOGY_RANDOM_REGULAR = "random_regular"
+TOPOLOGY_SMALL_WORLD = "small_world"
+TOPOLOGY_RING_OF_CLUSTERS = "ring_of_clusters"
+
+
+def _adjacency(node_ids: List[str], edges: Iterable[Tuple[int, int]]) -> Topology:
+    neighbors: List[Set[int]] = [set() for _ in node_ids]
+    for u, v in edges:
+        neighbors[u].add(v)
+        neighbors[v].add(u)
+    return {node_ids[i]: [node_ids[j] for j in sorted(adj)] for i, adj in enumerate(neighbors)}
+
+
+def random_regular(node_ids: List[str], degree: int, rng: random.Random, max_attempts: int = 100) -> Topology:
+    """
+    Đồ thị d-regular ngẫu nhiên (mọi node đúng `degree` neighbour).
+    Ghép ngẫu nhiên từng cặp "stub" còn lại, bỏ cặp tạo self-loop/cạnh trùng;
+    bí thì làm lại từ đầu (với degree << N hiếm khi xảy ra). O(N * degree).
+    """
+    n = len(node_ids)
+    if degree >= n or (n * degree) % 2 != 0:
+        raise ValueError("random regular graph needs degree < n and n * degree even")
+    for _ in range(max_attempts):
+        stubs = [i for i in range(n) for _ in range(degree)]
+        edges: Set[Tuple[int, int]] = set()
+        while stubs:
+            for _ in range(100):
+                i, j = rng.sample(range(len(stubs)), 2)
+                u, v = stubs[i], stubs[j]
+                edge = (min(u, v), max(u, v))
+                if u != v and edge not in edges:
+                    break
+            else:
+                break
+            edges.add(edge)
+            # Bỏ 2 stub đã ghép (đổi chỗ với phần tử cuối, index lớn trước)
+            for k in sorted((i, j), reverse=True):
+                stubs[k] = stubs[-1]
+                stubs.pop()
+        if not stubs:
+            return _adjacency(node_ids, edges)
+    raise ValueError("failed to generate random regular graph")
+
+
+def small_world(node_ids: List[str], k: int, beta: float, rng: random.Random) -> Topology:
+    """
+    Small-world (Watts-Strogatz): vòng tròn, mỗi node nối với k/2 node mỗi bên,
+    sau đó mỗi cạnh (u, u+j) được nối lại tới node ngẫu nhiên với xác suất `beta`.
+    """
+    n = len(node_ids)
+    if k % 2 != 0 or not 0 < k < n:
+        raise ValueError("small world needs an even k with 0 < k < n")
+    edges: Set[Tuple[int, int]] = set()
+    for u in range(n):
+        for j in range(1, k // 2 + 1):
+            v = (u + j) % n
+            edges.add((min(u, v), max(u, v)))
+    for j in range(1, k // 2 + 1):
+        for u in range(n):
+            v = (u + j) % n
+            edge = (min(u, v), max(u, v))
+            if rng.random() >= beta or edge not in edges:
+                continue
+            w = rng.randrange(n)
+            new_edge = (min(u, w), max(u, w))
+            if w == u or new_edge in edges:
+                continue
+            edges.remove(edge)
+            edges.add(new_edge)
+    return _adjacency(node_ids, edges)
+
+
+def ring_of_clusters(node_ids: List[str], cluster_size: int, bridges: int = 1) -> Topology:
+    """
+    Các cluster `cluster_size` node (full mesh trong cluster) xếp thành vòng:
+    thành viên thứ i (i < `bridges`) của mỗi cluster nối với thành viên thứ i của cluster kế tiếp.
+    Mô phỏng các vùng/datacenter nối với nhau qua ít đường liên vùng.
+    """
+    n = len(node_ids)
+    if cluster_size <= 0 or bridges <= 0:
+        raise ValueError("cluster_size and bridges must be positive")
+    clusters = [list(range(start, min(start + cluster_size, n))) for start in range(0, n, cluster_size)]
+    edges: Set[Tuple[int, int]] = set()
+    for members in clusters:
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                edges.add((members[a], members[b]))
+    if len(clusters) > 1:
+        for c, members in enumerate(clusters):
+            following = clusters[(c + 1) % len(clusters)]
+            for i in range(min(bridges, len(members), len(following))):
+                u, v = members[i], following[i]
+                if u != v:
+                    edges.add((min(u, v), max(u, v)))
+    return _adjacency(node_ids, edges)
+
+
+def build_topology(config: dict, node_ids: List[str], rng: random.Random) -> Topology:
+    """
+    Tạo overlay từ section `topology` trong YAML, ví dụ
+    `{kind: random_regular, degree: 8}`, `{kind: small_world, k: 6, beta: 0.2}`,
+    `{kind: ring_of_clusters, cluster_size: 16, bridges: 2}`.
+    """
+    kind = config.get("kind", TOPOLOGY_RANDOM_REGULAR)
+    if kind == TOPOLOGY_RANDOM_REGULAR:
+        return random_regular(node_ids, config.get("degree", 8), rng)
+    if kind == TOPOLOGY_SMALL_WORLD:
+        return small_world(node_ids, config.get("k", 6), config.get("beta", 0.2), rng)
+    if kind == TOPOLOGY_RING_OF_CLUSTERS:
+        return ring_of_clusters(node_ids, config.get("cluster_size", 8), config.get("bridges", 1))
+    raise ValueError(f"unknown topology kind: {kind}")
+
+
+def is_connected(topology: Topology) -> bool:
+    """Overlay liên thông (BFS từ một node bất kỳ tới được mọi node)."""
+    if not topology:
+        return True
+    start = next(iter(topology))
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        for peer in topology[queue.popleft()]:
+            if peer not in seen:
+                seen.add(peer)
+                queue.append(peer)
+    return len(seen) == len(topology)
@@ -1,24 +1,67 @@
-from typing import List, Optional
+from dataclasses import replace
+from typing import Dict, List, Optional, Set, Tuple
 import binascii
+import random
 
 from network.network import Node as NetworkNode
-from network.messages import Message, MessageType
+from network.messages import Message, MessageType, BlocksResponse, GetTxs, TxsResponse, TxInventory
+from consensus.certificate import CommitCertificate
 from consensus.consensus import ConsensusEngine
-from blocklayer.block import Block, build_block, validate_block
+from consensus.vote import PHASE_PREVOTE
+from consensus.timeouts import TimeoutConfig
+from blocklayer.block import Block, SignedHeader, CompactBody, build_block
+from blocklayer.block_tree import BlockTree
 from core.state import State
 from core.crypto_layer import KeyPair
 from core.types_tx import SignedTx
+from node_sim.sync import BlockSync
+from node_sim.seen_cache import SeenCache
+
+# Các chế độ lan truyền tx
+TX_GOSSIP_INVENTORY = "inventory" # announce tx id theo lô, peer chỉ xin tx còn thiếu
+TX_GOSSIP_FLOOD = "flood" # relay nguyên SignedTx tới mọi peer
+TX_GOSSIP_OFF = "off" # không relay
 
 class Node:
-    def __init__(self, node_id: str, network, keypair: KeyPair, validators: List[str]):
+    def __init__(
+        self,
+        node_id: str,
+        network,
+        keypair: KeyPair,
+        validators: List[str],
+        sync_batch_size: int = 64,
+        sync_window: int = 4,
+        tx_gossip: str = TX_GOSSIP_INVENTORY,
+        tx_request_timeout: float = 1.0,
+        timeouts: Optional[TimeoutConfig] = None,
+        pipelined: bool = False,
+        min_block_time: float = 0.0,
+        auto_propose: bool = False,
+        validator_powers: Optional[List[int]] = None,
+        committee_size: Optional[int] = None,
+        committee_seed: int = 0,
+        neighbors: Optional[List[str]] = None,
+        gossip_fanout: Optional[int] = None,
+    ):
         self.node_id = node_id # String ID for network
         self.network = network
         self.keypair = keypair
         self.validators = validators
+        self.pipelined = pipelined # Consensus pipelined: QC của height H+1 chốt height H
+        self.min_block_time = min_block_time # Khoảng cách tối thiểu giữa 2 block (simulated time)
+        self._last_block_time = 0.0 # Thời điểm finalize block gần nhất
+        self.auto_propose = auto_propose
+        self.proposal_resend_interval = 0.5 # Proposer gửi lại header/body nếu round chưa xong
+        self._proposal: Optional[Tuple[int, int, Message, Message]] = None # (height, round, header, body) đã propose
+        self._now = 0.0 # Simulated time của message gần nhất
         
         # Initialize State and Blockchain
         self.state = State() # Genesis state
         self.blockchain: List[Block] = [] # Genesis block is usually implicit or added explicitly
+        self.certificates: Dict[int, CommitCertificate] = {} # height -> certificate đã chốt block
+        self._commit_sent: Dict[str, Tuple[int, float]] = {} # peer -> (height certificate cao nhất đã gửi, thời điểm gửi)
+        self.commit_resend_interval = 1.0 # Gửi lại certificate nếu peer vẫn tụt lại sau khoảng này
+        self.block_tree = BlockTree(self.state) # Các block chưa finalize + post-state
         
         # Initialize Consensus Engine
         self.consensus = ConsensusEngine(
@@ -26,40 +69,185 @@ class Node:
             total_validators=len(validators),
             validator_index=validators.index(self.keypair.pubkey()) if self.keypair.pubkey() in validators else None,
             on_finalize_callback=self.on_finalize,
-            block_validator=self.validate_block_callback
+            on_ask_for_block=self.on_ask_for_block,
+            block_validator=self.validate_block_callback,
+            validators=validators,
+            timeouts=timeouts,
+            # Round timeout chạy bằng timer của network (simulated time); None -> tắt
+            on_schedule_timeout=self.schedule_consensus_timeout if timeouts is not None else None,
+            clock=lambda: self._now,
+            pipelined=pipelined,
+            # Tới lượt propose -> đặt timer propose ngay (Simulator bật); tắt -> gọi propose_block thủ công
+            on_become_proposer=self.schedule_proposal if auto_propose else None,
+            validator_powers=validator_powers, # Voting power theo thứ tự `validators`, None -> đều nhau
+            # Committee C validator/height: chỉ committee vote, node khác theo certificate
+            committee_size=committee_size,
+            committee_seed=committee_seed
         )
         
         self.mempool: List[SignedTx] = []
+        self.tx_index: Dict[str, SignedTx] = {} # tx_id -> tx trong mempool
+        
+        # Tx gossip: khử trùng lặp theo tx id, announce theo lô
+        self.tx_gossip = tx_gossip
+        self.tx_request_timeout = tx_request_timeout
+        self.seen_txs = SeenCache()
+        self._requested_txs: Dict[str, float] = {} # tx_id -> thời điểm đã xin
+        self._inv_queue: List[Tuple[str, str]] = [] # (tx_id, peer đã gửi tx) chờ announce
+        
+        # Header-first propagation: header và compact body đến riêng lẻ
+        self.pending_headers: Dict[str, SignedHeader] = {} # block_hash -> header đã verify
+        self.pending_bodies: Dict[str, Tuple[CompactBody, str, float]] = {} # block_hash -> (body, sender, lúc nhận)
+        self.missing_txs: Dict[str, Set[str]] = {} # block_hash -> tx id đang xin lại
+        self._txs_requested_at: Dict[str, float] = {} # block_hash -> lần gửi GET_TXS gần nhất
+        self._fetched_txs: Dict[str, Dict[str, SignedTx]] = {} # block_hash -> tx đã xin về nhưng không vào mempool
+        self.orphan_body_timeout = 5.0 # Body chưa có header sau khoảng này thì bỏ
+        
+        # Gossip overlay: None -> full mesh (broadcast thẳng tới mọi validator).
+        # Có neighbour -> broadcast/relay chỉ tới neighbour (tối đa `gossip_fanout`), khử trùng lặp theo gossip_id
+        self.neighbors = neighbors
+        self.gossip_fanout = gossip_fanout
+        self.seen_gossip = SeenCache()
+        self._gossip_seq = 0
+        self._bodies_to_relay: Dict[str, Message] = {} # block_hash -> body gossip chờ header để kiểm tra rồi mới relay
+        
+        # Khử trùng lặp theo (node gốc, msg_id): bản duplicate của network, replay, relay lặp
+        # bị bỏ trước mọi bước verify chữ ký / consensus
+        self.seen_messages = SeenCache()
+        self.duplicates_dropped = 0
+        
+        # Backpressure: peer báo inbox đầy -> tạm ngừng gửi tx gossip (TX / TX_INV) tới peer đó
+        self.backpressure_backoff = 1.0
+        self._congested_until: Dict[str, float] = {} # peer -> hết backoff lúc
+        self._gossip_rng = random.Random(node_id) # chọn neighbour khi fanout < degree (deterministic)
+        
+        # Batched block sync khi bị tụt lại nhiều height
+        self.sync = BlockSync(self, batch_size=sync_batch_size, max_in_flight=sync_window)
+        self.max_blocks_per_response = sync_batch_size
         
         # Register with network
         network.add_node(self)
+        self.consensus.start()
 
     def receive(self, message: Message, sim_time: float):
         """Handle incoming messages from the network."""
+        self._handle(message, sim_time)
+        # Gom các tx mới nhận trong message này vào một TX_INV cho mỗi peer
+        self._flush_inventory(sim_time)
+
+    def receive_batch(self, messages: List[Message], sim_time: float):
+        """
+        Nhận cả batch message của 1 link (Network bật coalescing): bản trùng bị bỏ theo msg id
+        như `receive`, vote trong batch được xử lý liền nhau và tx mới của cả batch
+        gom vào một TX_INV cho mỗi peer.
+        """
+        for message in messages:
+            self._handle(message, sim_time)
+        self._flush_inventory(sim_time)
+
+    def _handle(self, message: Message, sim_time: float):
+        """Xử lý 1 message (TX_INV do receive / receive_batch gửi sau)."""
         # print(f"[Node {self.node_id}] Received {message.msg_type} from {message.from_id}")
+        self._now = sim_time
+        
+        # msg_id == 0: transport chưa cấp id -> không phân biệt được bản trùng, không khử theo id
+        if message.msg_id != 0 and not self.seen_messages.add((self._origin(message), message.msg_id)):
+            self.duplicates_dropped += 1
+            return
+        
+        if message.gossip_id is not None:
+            # Gossip: bỏ bản trùng, bản mới xử lý như message trực tiếp;
+            # chỉ relay tiếp sau khi payload qua được bước kiểm tra (chữ ký, header, tx_root)
+            if not self.seen_gossip.add(message.gossip_id):
+                return
         
         if message.msg_type == MessageType.TX:
             tx: SignedTx = message.payload
-            if tx not in self.mempool:
-                if tx.verify():
-                    self.mempool.append(tx)
-                    # print(f"[Node {self.node_id}] Added TX to mempool. Size: {len(self.mempool)}")
+            self.add_tx(tx, source=message.from_id)
+
+        elif message.msg_type == MessageType.TX_INV:
+            inventory: TxInventory = message.payload
+            wanted = []
+            for tx_id in inventory.tx_ids:
+                if tx_id in self.seen_txs:
+                    continue
+                requested_at = self._requested_txs.get(tx_id)
+                if requested_at is not None and sim_time - requested_at < self.tx_request_timeout:
+                    continue
+                self._requested_txs[tx_id] = sim_time
+                wanted.append(tx_id)
+            if wanted:
+                self.send(Message(
+                    msg_id=0,
+                    from_id=self.node_id,
+                    to_id=message.from_id,
+                    msg_type=MessageType.GET_TXS,
+                    payload=GetTxs(tx_ids=wanted)
+                ), sim_time)
 
         elif message.msg_type == MessageType.BLOCK_HEADER:
-            # In this simple sim, we treat BLOCK_HEADER as full block for simplicity 
-            # or we might need separate types. 
-            # Looking at ConsensusEngine, it expects 'block'. 
-            # Let's assume payload is the Block object.
-            block: Block = message.payload
+            signed_header: SignedHeader = message.payload
+            block_hash = signed_header.block_hash()
+            if block_hash in self.pending_headers:
+                # Header gửi lại (proposal chưa xong, đã verify) -> relay và xin lại tx còn thiếu ngay
+                self._relay(message, sim_time)
+                self._try_reconstruct_block(block_hash, sim_time, retry=True)
+                return
             
-            # Verify signature
-            if not block.verify_signature():
+            # Kiểm tra ngay khi có header, không cần chờ body:
+            # chữ ký, proposer và parent của header
+            if signed_header.header.proposer_pubkey_hex != signed_header.pubkey:
+                return
+            if not self._header_from_scheduled_proposer(signed_header):
+                return
+            if not self._header_extends_chain(signed_header):
+                return
+            if not signed_header.verify_signature():
                 # print(f"[Node {self.node_id}] Invalid block signature")
                 return
 
-            vote = self.consensus.on_receive_block(block)
-            if vote:
-                self.broadcast_vote(vote, sim_time)
+            self._relay(message, sim_time)
+            self.pending_headers[block_hash] = signed_header
+            self._try_reconstruct_block(block_hash, sim_time)
+
+        elif message.msg_type == MessageType.BLOCK_BODY:
+            body: CompactBody = message.payload
+            if message.gossip_id is not None:
+                # Body chỉ kiểm tra được (khớp tx_root) khi đã có header -> relay trong _try_reconstruct_block
+                self._bodies_to_relay[body.block_hash] = message
+            if body.block_hash in self.pending_bodies:
+                # Body gửi lại -> xin lại tx còn thiếu ngay
+                self._try_reconstruct_block(body.block_hash, sim_time, retry=True)
+                return
+            # Xin tx thiếu từ node gốc (proposer): node relay có thể chưa có đủ tx
+            self.pending_bodies[body.block_hash] = (body, self._origin(message), sim_time)
+            self._try_reconstruct_block(body.block_hash, sim_time)
+
+        elif message.msg_type == MessageType.GET_TXS:
+            request: GetTxs = message.payload
+            txs = [self.tx_index[tx_id] for tx_id in request.tx_ids if tx_id in self.tx_index]
+            self.send(Message(
+                msg_id=0,
+                from_id=self.node_id,
+                to_id=message.from_id,
+                msg_type=MessageType.TXS,
+                payload=TxsResponse(txs=txs, block_hash=request.block_hash),
+                height=message.height
+            ), sim_time)
+
+        elif message.msg_type == MessageType.TXS:
+            response: TxsResponse = message.payload
+            wanted = self.missing_txs.get(response.block_hash, ())
+            for tx in response.txs:
+                if self.add_tx(tx, source=message.from_id):
+                    continue
+                # Tx đã thấy nhưng không còn trong mempool (vd. đã vào block khác): seen_txs chặn,
+                # vẫn giữ riêng cho block đang dựng nếu đúng là tx block đó đang thiếu
+                tx_id = tx.tx_id()
+                if tx_id in wanted and tx_id not in self.tx_index and tx.verify():
+                    self._fetched_txs.setdefault(response.block_hash, {})[tx_id] = tx
+            if response.block_hash is not None:
+                self._try_reconstruct_block(response.block_hash, sim_time)
 
         elif message.msg_type == MessageType.VOTE:
             vote = message.payload
@@ -69,53 +257,379 @@ class Node:
                 # print(f"[Node {self.node_id}] Invalid vote signature")
                 return
 
+            # Vote ở height H nghĩa là người gửi đã có block tới H-1.
+            # Nếu bị tụt lại > 1 height -> sync theo lô thay vì chờ từng block.
+            if vote.validator_pubkey_hex in self.validators:
+                # Chỉ relay vote đã verify của validator
+                self._relay(message, sim_time)
+                voter = self._origin(message)
+                self.sync.observe_peer(voter, vote.height - 1)
+                if vote.height > self.consensus.current_height + 1:
+                    self.sync.request_up_to(vote.height - 1, sim_time)
+                elif vote.height < self.consensus.current_height:
+                    # Người gửi còn ở height đã chốt -> gửi 1 certificate thay vì N vote
+                    self._send_certificate(voter, vote.height, sim_time)
+
             vote_response = self.consensus.on_receive_vote(vote)
             if vote_response:
                 self.broadcast_vote(vote_response, sim_time)
 
-    def validate_block_callback(self, block: Block) -> bool:
-        """Callback for ConsensusEngine to validate a block."""
-        # Find parent block
-        parent_block = None
-        parent_state = self.state # Default to current state (assuming extends tip)
-        
-        if self.blockchain:
-            if block.header.parent_hash == self.blockchain[-1].block_hash():
-                parent_block = self.blockchain[-1]
-                parent_state = self.state
-            else:
-                # If it's not extending the tip, we might reject it for this simple sim
-                # or we'd need to look back in history.
-                # For now, reject forks that are not immediate extensions
-                # UNLESS it's genesis (parent_hash all zeros)
-                if block.header.height == 0 and not self.blockchain:
-                     pass # Genesis case
-                else:
-                     # print(f"[Node {self.node_id}] Rejecting block {block.header.height} (parent mismatch)")
-                     return False
-        elif block.header.height > 0:
-             # We have no blocks but this is not height 0
-             return False
+        elif message.msg_type == MessageType.GET_BLOCKS:
+            request = message.payload
+            if request.from_height < 0 or request.count <= 0:
+                return
+            count = min(request.count, self.max_blocks_per_response)
+            blocks = self.blockchain[request.from_height:request.from_height + count]
+            # Dừng lô ở height đầu tiên không có certificate (vd. finalize qua fast forward):
+            # syncer từ chối block thiếu certificate, phần còn lại sẽ xin peer khác
+            certificates = []
+            for block in blocks:
+                certificate = self.certificates.get(block.header.height)
+                if certificate is None:
+                    break
+                certificates.append(certificate)
+            blocks = blocks[:len(certificates)]
+            self.send(Message(
+                msg_id=0,
+                from_id=self.node_id,
+                to_id=message.from_id,
+                msg_type=MessageType.BLOCKS,
+                payload=BlocksResponse(
+                    from_height=request.from_height, blocks=blocks, certificates=certificates
+                ),
+                height=request.from_height
+            ), sim_time)
+
+        elif message.msg_type == MessageType.BLOCKS:
+            self.sync.on_blocks(message.payload, message.from_id, sim_time)
+
+        elif message.msg_type == MessageType.COMMIT:
+            certificate: CommitCertificate = message.payload
+            if certificate.height > self.consensus.current_height:
+                # Node ngoài committee không thấy vote -> certificate của height cao hơn
+                # là dấu hiệu duy nhất cho biết mình đã tụt lại
+                self.sync.observe_peer(message.from_id, certificate.height - 1)
+                self.sync.request_up_to(certificate.height - 1, sim_time)
+            for vote in self.consensus.on_receive_certificate(certificate):
+                self.broadcast_vote(vote, sim_time)
+
+    def add_tx(self, tx: SignedTx, source: Optional[str] = None) -> bool:
+        """
+        Thêm tx hợp lệ vào mempool và xếp lịch relay tới các peer (trừ `source`).
+        Tx đã thấy (kể cả đã vào block hoặc không hợp lệ) bị bỏ qua trước khi verify.
+        Trả về True nếu là tx mới.
+        """
+        tx_id = tx.tx_id()
+        if not self.seen_txs.add(tx_id):
+            return False
+        self._requested_txs.pop(tx_id, None)
+        if not tx.verify():
+            return False
+        self.mempool.append(tx)
+        self.tx_index[tx_id] = tx
+        # print(f"[Node {self.node_id}] Added TX to mempool. Size: {len(self.mempool)}")
+
+        if self.tx_gossip == TX_GOSSIP_INVENTORY:
+            self._inv_queue.append((tx_id, source))
+        elif self.tx_gossip == TX_GOSSIP_FLOOD:
+            for peer in self.tx_peers(self._now):
+                if peer != source:
+                    self.send(Message(
+                        msg_id=0,
+                        from_id=self.node_id,
+                        to_id=peer,
+                        msg_type=MessageType.TX,
+                        payload=tx
+                    ), self._now)
+        return True
+
+    def _flush_inventory(self, sim_time: float):
+        """Gửi TX_INV gom tất cả tx id mới tới mỗi peer (trừ peer đã gửi tx đó)."""
+        if not self._inv_queue:
+            return
+        queue, self._inv_queue = self._inv_queue, []
+        for peer in self.tx_peers(sim_time):
+            tx_ids = [tx_id for tx_id, source in queue if source != peer]
+            if tx_ids:
+                self.send(Message(
+                    msg_id=0,
+                    from_id=self.node_id,
+                    to_id=peer,
+                    msg_type=MessageType.TX_INV,
+                    payload=TxInventory(tx_ids=tx_ids)
+                ), sim_time)
+
+    def peers(self) -> List[str]:
+        """Các validator khác (node_id == pubkey_hex), hoặc chỉ neighbour nếu dùng gossip overlay."""
+        if self.neighbors is not None:
+            return list(self.neighbors)
+        return [v for v in self.validators if v != self.node_id]
 
-        return validate_block(block, parent_block, parent_state)
+    def tx_peers(self, sim_time: float) -> List[str]:
+        """Peer nhận tx gossip: bỏ peer đang backoff vì inbox đầy (tx thiếu vẫn xin lại được qua GET_TXS)."""
+        if not self._congested_until:
+            return self.peers()
+        return [p for p in self.peers() if self._congested_until.get(p, 0.0) <= sim_time]
 
-    def on_finalize(self, block: Block):
+    def on_backpressure(self, peer: str, sim_time: float):
+        """Network báo inbox của `peer` đầy (message mình gửi bị bỏ): backoff tx gossip tới peer."""
+        self._congested_until[peer] = sim_time + self.backpressure_backoff
+
+    def _header_from_scheduled_proposer(self, signed_header: SignedHeader) -> bool:
+        """
+        Proposer của header phải là validator có lịch propose ở height đó, trong cửa sổ
+        height/round mà ConsensusEngine chấp nhận (header không mang round -> xét mọi round
+        từ 0 tới current_round + max_future_rounds). Header khác không relay, không lưu.
+        """
+        header = signed_header.header
+        if header.proposer_pubkey_hex not in self.validators:
+            return False
+        if header.height > self.consensus.current_height + self.consensus.max_future_heights:
+            return False
+        validator_set = self.consensus.validator_set_for(header.height)
+        last_round = self.consensus.current_round + self.consensus.max_future_rounds
+        return any(
+            validator_set.pubkey_at(validator_set.proposer_index(header.height, round)) == header.proposer_pubkey_hex
+            for round in range(last_round + 1)
+        )
+
+    def _header_extends_chain(self, signed_header: SignedHeader) -> bool:
+        """Header cũ hoặc không nối vào block nào đã biết thì bỏ qua."""
+        height = signed_header.header.height
+        if height < len(self.blockchain):
+            return False
+        if signed_header.header.parent_hash in self.block_tree:
+            return True
+        return height > len(self.blockchain) # Header tương lai -> để ConsensusEngine buffer
+
+    def _try_reconstruct_block(self, block_hash: str, sim_time: float, retry: bool = False):
+        """
+        Dựng lại Block khi đã có cả header và compact body.
+        Còn thiếu tx -> GET_TXS tới node gốc, xin lại sau mỗi `tx_request_timeout` (timer "txs")
+        hoặc ngay khi `retry` (header/body được gửi lại).
+        """
+        signed_header = self.pending_headers.get(block_hash)
+        pending = self.pending_bodies.get(block_hash)
+        if signed_header is None or pending is None:
+            return
+        body, body_sender, _ = pending
+
+        # Danh sách tx id phải khớp tx_root trước khi xin tx hay execute
+        relay = self._bodies_to_relay.pop(block_hash, None)
+        if not body.matches(signed_header.header):
+            del self.pending_bodies[block_hash]
+            return
+        if relay is not None:
+            self._relay(relay, sim_time)
+
+        fetched = self._fetched_txs.get(block_hash, {})
+        missing = [tx_id for tx_id in body.tx_ids if tx_id not in self.tx_index and tx_id not in fetched]
+        if missing:
+            # Fallback: xin các tx thiếu từ node đã gửi body; reply bị mất -> timer xin lại
+            self.missing_txs[block_hash] = set(missing)
+            requested_at = self._txs_requested_at.get(block_hash)
+            if requested_at is None or retry or sim_time - requested_at >= self.tx_request_timeout:
+                self._txs_requested_at[block_hash] = sim_time
+                self.send(Message(
+                    msg_id=0,
+                    from_id=self.node_id,
+                    to_id=body_sender,
+                    msg_type=MessageType.GET_TXS,
+                    payload=GetTxs(tx_ids=missing, block_hash=block_hash),
+                    height=signed_header.header.height
+                ), sim_time)
+                if requested_at is None:
+                    self.network.schedule_timer(self.node_id, self.tx_request_timeout, ("txs", block_hash), sim_time)
+            return
+
+        del self.pending_headers[block_hash]
+        del self.pending_bodies[block_hash]
+        self.missing_txs.pop(block_hash, None)
+        self._txs_requested_at.pop(block_hash, None)
+        self._fetched_txs.pop(block_hash, None)
+
+        block = signed_header.to_block([self.tx_index.get(tx_id) or fetched[tx_id] for tx_id in body.tx_ids])
+        vote = self.consensus.on_receive_block(block)
+        if vote:
+            self.broadcast_vote(vote, sim_time)
+
+    def on_ask_for_block(self, block_hash: str):
+        """Callback khi ConsensusEngine thiếu block của height hiện tại."""
+        self.sync.request_up_to(self.consensus.current_height, self._now)
+
+    def validate_block_callback(self, block: Block) -> bool:
+        """
+        Callback for ConsensusEngine to validate a block.
+        Block có thể xây trên bất kỳ block nào đã biết trong block tree (không chỉ tip);
+        chỉ block mới được execute, post-state của tổ tiên lấy từ cache.
+        """
+        parent_hash = block.header.parent_hash
+        if parent_hash not in self.block_tree:
+            # Ngoài committee ở height trước -> block cha (đã certify) chưa được validate
+            parent = self.consensus.certified_block
+            if parent is not None and parent.block_hash() == parent_hash:
+                self.validate_block_callback(parent)
+        return self.block_tree.add_block(block) is not None
+
+    def on_finalize(self, block: Block, certificate: Optional[CommitCertificate] = None):
         """Callback when a block is finalized."""
         # print(f"[Node {self.node_id}] Finalized block {block.header.height}: {block.block_hash()}")
         self.blockchain.append(block)
+        self._last_block_time = self._now
+        if certificate is not None:
+            self.certificates[block.header.height] = certificate
+        
+        # Update state: dùng post-state đã cache trong block tree nếu có
+        tree_node = self.block_tree.add_block(block, check_signature=False)
+        if tree_node is not None:
+            self.state = tree_node.post_state
+            self.block_tree.finalize(tree_node.block_hash)
+        else:
+            state = self.state.fork()
+            for tx in block.txs:
+                state.apply_tx(tx)
+            self.state = state
+            self.block_tree = BlockTree(self.state, block)
+        
+        # Remove from mempool: bỏ id đã vào block khỏi tx_index rồi dựng lại mempool từ index
+        # (giữ thứ tự nhận), không hash lại từng tx trong mempool
+        removed = [self.tx_index.pop(tx.tx_id(), None) for tx in block.txs]
+        if any(tx is not None for tx in removed):
+            self.mempool = list(self.tx_index.values())
         
-        # Update state
-        for tx in block.txs:
-            self.state.apply_tx(tx)
-            # Remove from mempool
-            if tx in self.mempool:
-                self.mempool.remove(tx)
+        # Thành viên committee đẩy certificate cho node ngoài committee (chúng không nhận vote).
+        # Pipelined: height này finalize nhờ QC của height vừa certify -> gửi QC đó (kèm block),
+        # người gửi là committee của height được certify
+        height = block.header.height
+        qc = self.consensus.certified_qc
+        cert_height = qc.height if self.pipelined and qc is not None else height
+        committee = self.consensus.committee_for(cert_height)
+        if committee is not None and self.keypair.pubkey() in committee:
+            for validator_pk in self.validators:
+                if validator_pk not in committee and validator_pk != self.node_id:
+                    self._send_certificate(validator_pk, cert_height, self._now)
+        
+        # Dọn header/body đang chờ của các height đã finalize
+        stale = [h for h, sh in self.pending_headers.items() if sh.header.height <= height]
+        for block_hash in stale:
+            del self.pending_headers[block_hash]
+            self.pending_bodies.pop(block_hash, None)
+            self.missing_txs.pop(block_hash, None)
+            self._txs_requested_at.pop(block_hash, None)
+            self._fetched_txs.pop(block_hash, None)
+            self._bodies_to_relay.pop(block_hash, None)
+        # Body không có header (header bị mất / không hợp lệ) thì hết hạn theo thời gian
+        orphans = [
+            block_hash for block_hash, (_, _, received_at) in self.pending_bodies.items()
+            if block_hash not in self.pending_headers and self._now - received_at >= self.orphan_body_timeout
+        ]
+        for block_hash in orphans:
+            del self.pending_bodies[block_hash]
+            self._bodies_to_relay.pop(block_hash, None)
+
+    def schedule_consensus_timeout(self, height: int, round: int, step: str, delay: float):
+        """Callback cho ConsensusEngine: đặt timer round timeout qua network."""
+        self.network.schedule_timer(self.node_id, delay, ("consensus", height, round, step), self._now)
+
+    def schedule_proposal(self, height: int, round: int):
+        """
+        Callback cho ConsensusEngine khi node là proposer của (height, round) mới:
+        đặt 1 timer propose (ngay, hoặc chờ đủ `min_block_time` kể từ height trước).
+        """
+        delay = 0.0
+        if round == 0:
+            delay = max(0.0, self._last_block_time + self.min_block_time - self._now)
+        self.network.schedule_timer(self.node_id, delay, ("propose", height, round), self._now)
+
+    def on_timer(self, timer, sim_time: float):
+        """Network gọi khi timer đến hạn."""
+        self._now = sim_time
+        kind = timer[0]
+        if kind == "propose":
+            _, height, round = timer
+            # Chỉ propose nếu engine vẫn ở đúng (height, round) đã hẹn
+            if (self.consensus.current_height, self.consensus.current_round) == (height, round):
+                self.propose_block(sim_time)
+            return
+        if kind == "repropose":
+            _, height, round = timer
+            # Round vẫn chưa xong -> gửi lại proposal cho node bị mất header/body
+            current = (self.consensus.current_height, self.consensus.current_round)
+            if self._proposal is not None and self._proposal[:2] == current == (height, round):
+                _, _, header_msg, body_msg = self._proposal
+                # Bản gửi lại là message mới (id mới): node đã nhận bản trước sẽ bỏ như replay
+                # nếu giữ id cũ, kể cả node đã bỏ qua header vì lúc đó chưa sẵn sàng
+                self.broadcast(replace(header_msg, msg_id=0), sim_time)
+                self.broadcast(replace(body_msg, msg_id=0), sim_time)
+                self.network.schedule_timer(self.node_id, self.proposal_resend_interval, timer, sim_time)
+            return
+        if kind == "txs":
+            _, block_hash = timer
+            # Block vẫn thiếu tx (chưa dựng được, chưa bị dọn) -> xin lại và hẹn lần sau
+            if block_hash in self._txs_requested_at:
+                self._try_reconstruct_block(block_hash, sim_time, retry=True)
+                if block_hash in self.missing_txs:
+                    self.network.schedule_timer(self.node_id, self.tx_request_timeout, timer, sim_time)
+                else:
+                    self._txs_requested_at.pop(block_hash, None)
+            return
+        if kind != "consensus":
+            return
+        
+        _, height, round, step = timer
+        votes = self.consensus.on_timeout(height, round, step)
+        for vote in votes:
+            self.broadcast_vote(vote, sim_time)
+
+    def _send_certificate(self, peer: str, height: int, sim_time: float):
+        """
+        Gửi CommitCertificate của `height` cho peer đang tụt lại (mỗi height 1 lần,
+        gửi lại sau `commit_resend_interval` nếu peer vẫn vote ở height đó).
+        """
+        certificate = self.certificates.get(height)
+        certified_block = None
+        if certificate is None:
+            # Pipelined: height vừa certify chưa finalize nhưng đã có QC prevote;
+            # block chưa finalize nên peer không lấy được qua sync -> gửi kèm block
+            qc = self.consensus.certified_qc
+            if qc is not None and qc.height == height:
+                certificate = qc
+                certified_block = self.consensus.certified_block
+        if certificate is None:
+            return
+        sent_height, sent_at = self._commit_sent.get(peer, (-1, 0.0))
+        if sent_height > height or (sent_height == height and sim_time - sent_at < self.commit_resend_interval):
+            return
+        self._commit_sent[peer] = (height, sim_time)
+        
+        if certified_block is not None:
+            for msg_type, payload in (
+                (MessageType.BLOCK_HEADER, certified_block.signed_header()),
+                (MessageType.BLOCK_BODY, certified_block.compact_body()),
+            ):
+                self.send(Message(
+                    msg_id=0,
+                    from_id=self.node_id,
+                    to_id=peer,
+                    msg_type=msg_type,
+                    payload=payload,
+                    height=height
+                ), sim_time)
+        self.send(Message(
+            msg_id=0,
+            from_id=self.node_id,
+            to_id=peer,
+            msg_type=MessageType.COMMIT,
+            payload=certificate,
+            height=height
+        ), sim_time)
 
     def propose_block(self, sim_time: float):
         """Propose a new block if it's our turn."""
         # Check if consensus engine thinks we should propose
         # We need to know current height/round from consensus or track it ourselves.
         # ConsensusEngine tracks current_height and current_round.
+        self._now = sim_time
         
         height = self.consensus.current_height
         round = self.consensus.current_round
@@ -124,59 +638,98 @@ class Node:
             # print(f"[Node {self.node_id}] Proposing block for H={height} R={round}")
             
             parent_block = self.blockchain[-1] if self.blockchain else None
+            parent_state = self.state
+            txs = self.mempool[:] # Include all txs
+            
+            # Pipelined: xây trên block đã certify (chưa finalize) ở height trước
+            certified = self.consensus.certified_block
+            if certified is not None and certified.header.height == height - 1:
+                tree_node = self.block_tree.get(certified.block_hash())
+                if tree_node is None:
+                    # Ngoài committee height trước: block đã certify nhưng chưa execute
+                    tree_node = self.block_tree.add_block(certified)
+                if tree_node is not None:
+                    parent_block, parent_state = certified, tree_node.post_state
+                    pending = {tx.tx_id() for tx in certified.txs}
+                    txs = [tx for tx_id, tx in self.tx_index.items() if tx_id not in pending]
             
             # Build block
             block = build_block(
                 parent_block=parent_block,
-                parent_state=self.state,
-                txs=self.mempool[:], # Include all txs
+                parent_state=parent_state,
+                txs=txs,
                 keypair=self.keypair
             )
             
             # Feed to own consensus
             vote = self.consensus.on_receive_block(block)
             
-            # Broadcast block
-            msg = Message(
-                msg_id=0, # Network assigns IDs usually? No, Network uses internal seq. Message dataclass has msg_id.
+            # Header-first: gửi header đã ký trước, sau đó body dạng compact (tx id)
+            header_msg = Message(
+                msg_id=0, # Network cấp id khi gửi
+                from_id=self.node_id,
+                to_id="BROADCAST", # Network.broadcast giao cho từng người nhận
+                msg_type=MessageType.BLOCK_HEADER,
+                payload=block.signed_header(),
+                height=height
+            )
+            body_msg = Message(
+                msg_id=0,
                 from_id=self.node_id,
-                to_id="BROADCAST", # Network handles broadcast?
-                msg_type=MessageType.BLOCK_HEADER, # Using BLOCK_HEADER as BLOCK for now
-                payload=block,
+                to_id="BROADCAST",
+                msg_type=MessageType.BLOCK_BODY,
+                payload=block.compact_body(),
                 height=height
             )
             
-            self.broadcast(msg, sim_time)
+            self.broadcast(header_msg, sim_time)
+            self.broadcast(body_msg, sim_time)
+            self._proposal = (height, round, header_msg, body_msg)
+            if self.auto_propose:
+                self.network.schedule_timer(
+                    self.node_id, self.proposal_resend_interval, ("repropose", height, round), sim_time
+                )
             
             if vote:
                 self.broadcast_vote(vote, sim_time)
+        
+        self._flush_inventory(sim_time)
 
-    def broadcast(self, message: Message, sim_time: float):
-        """Helper to broadcast a message to all other validators."""
-        # In a real p2p, we gossip. Here we send to all known validators.
-        # We assume we know all validators from init.
-        
-        for validator_pk in self.validators:
-            # Map pubkey to node_id?
-            # We initialized Node with node_id.
-            # But validators list contains pubkeys (from consensus).
-            # We need a mapping from pubkey to node_id.
-            # OR we assume node_id IS the pubkey?
-            # For simplicity, let's assume node_id == pubkey_hex.
-            
-            target_id = validator_pk
-            if target_id != self.node_id:
-                # Clone message for each recipient? Message is immutable dataclass so okay.
-                # But to_id needs to change.
-                new_msg = Message(
-                    msg_id=message.msg_id, # Should be unique per send? Network logs it.
-                    from_id=self.node_id,
-                    to_id=target_id,
-                    msg_type=message.msg_type,
-                    payload=message.payload,
-                    height=message.height
-                )
-                self.network.send(new_msg, sim_time)
+    def send(self, message: Message, sim_time: float):
+        """Gửi message point-to-point qua network."""
+        self.network.send(message, sim_time)
+
+    def broadcast(self, message: Message, sim_time: float, recipients: Optional[List[str]] = None):
+        """
+        Helper to broadcast a message to all other validators (hoặc chỉ `recipients`).
+        Một Message dùng chung cho mọi người nhận (node_id == pubkey_hex), network xếp lịch theo lô.
+        """
+        if self.neighbors is not None:
+            # Overlay: gắn gossip_id và gửi cho neighbour; `recipients` bỏ qua vì mọi node đều relay
+            self._gossip_seq += 1
+            message = replace(message, from_id=self.node_id, gossip_id=(self.node_id, self._gossip_seq))
+            self.seen_gossip.add(message.gossip_id)
+            self._relay(message, sim_time)
+            return
+        targets = recipients if recipients is not None else self.validators
+        self.network.broadcast(message, [pk for pk in targets if pk != self.node_id], sim_time)
+
+    @staticmethod
+    def _origin(message: Message) -> str:
+        """Node tạo ra message (node gốc nếu được gossip qua nhiều hop)."""
+        return message.gossip_id[0] if message.gossip_id is not None else message.from_id
+
+    def _relay(self, message: Message, sim_time: float):
+        """Chuyển tiếp message gossip cho neighbour (trừ người vừa gửi và node gốc), tối đa `gossip_fanout`."""
+        if message.gossip_id is None:
+            return
+        origin = message.gossip_id[0]
+        targets = [p for p in self.neighbors if p != message.from_id and p != origin]
+        if self.gossip_fanout is not None and len(targets) > self.gossip_fanout:
+            targets = self._gossip_rng.sample(targets, self.gossip_fanout)
+        if targets:
+            relayed = message if message.from_id == self.node_id else replace(message, from_id=self.node_id)
+            self.network.broadcast(relayed, targets, sim_time)
 
     def broadcast_vote(self, vote, sim_time: float):
         msg = Message(
@@ -187,5 +740,16 @@ class Node:
             payload=vote,
             height=vote.height
         )
-        self.broadcast(msg, sim_time)
+        # Committee: vote chỉ cần tới các thành viên committee của height
+        recipients = self.consensus.committee_for(vote.height)
+        if recipients is not None and self.pipelined and vote.phase == PHASE_PREVOTE:
+            # Pipelined: committee height kế tiếp cũng cần QC của height này để prevote block con
+            recipients = list(dict.fromkeys(recipients + self.consensus.committee_for(vote.height + 1)))
+        self.broadcast(msg, sim_time, recipients=recipients)
+        
+        # Vote của chính mình cũng được tính vào vote pool cục bộ: quorum chỉ cần
+        # 2/3+ tính cả mình, không phải toàn bộ vote của các node khác đều đến nơi
+        vote_response = self.consensus.on_receive_vote(vote)
+        if vote_response:
+            self.broadcast_vote(vote_response, sim_time)
 
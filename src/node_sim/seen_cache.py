@@ -0,0 +1,29 @@
+from typing import Dict, Hashable
+
+
+class SeenCache:
+    """
+    Tập các key đã thấy với kích thước giới hạn (FIFO):
+    khi vượt `capacity`, key cũ nhất bị loại ra.
+    Dùng để khử trùng lặp tx id, message id, ... mà không tăng bộ nhớ vô hạn.
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        assert capacity > 0
+        self.capacity = capacity
+        self._keys: Dict[Hashable, None] = {}
+
+    def add(self, key: Hashable) -> bool:
+        """Thêm key. Trả về True nếu key mới, False nếu đã thấy."""
+        if key in self._keys:
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.capacity:
+            del self._keys[next(iter(self._keys))]
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
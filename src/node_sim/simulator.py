@@ -4,8 +4,13 @@ import random
 from typing import List
 
 from network.network import Network
+from network.inbox import INBOX_TAIL_DROP
+from network.latency import LatencyModel
 from network.logging_utils import JsonLinesLogger
+from network.topology import build_topology
 from node_sim.node import Node
+from consensus.metrics import ConsensusMetrics, summarize
+from consensus.timeouts import TimeoutConfig
 from core.crypto_layer import KeyPair
 
 class Simulator:
@@ -19,15 +24,9 @@ class Simulator:
         # Initialize Logger
         self.logger = JsonLinesLogger(output_file)
         
-        # Initialize Network
-        self.network = Network(
-            logger=self.logger,
-            rng=self.rng,
-            min_delay=self.config["simulation"].get("min_delay", 0.1),
-            max_delay=self.config["simulation"].get("max_delay", 0.5),
-            drop_prob=self.config["simulation"].get("drop_prob", 0.0),
-            dup_prob=self.config["simulation"].get("dup_prob", 0.0)
-        )
+        # Round timeout (section `timeouts` trong YAML, `enabled: false` để tắt)
+        timeouts_cfg = self.config.get("timeouts") or {}
+        timeouts = TimeoutConfig.from_dict(timeouts_cfg) if timeouts_cfg.get("enabled", True) else None
         
         # Initialize Nodes
         num_nodes = self.config["simulation"].get("num_nodes", 4)
@@ -43,72 +42,20 @@ class Simulator:
             
         self.validators = [kp.pubkey() for kp in keypairs]
         
-        for i in range(num_nodes):
-            node_id = self.validators[i] # Use pubkey as node_id for simplicity
-            node = Node(
-                node_id=node_id,
-                network=self.network,
-                keypair=keypairs[i],
-                validators=self.validators
-            )
-            self.nodes.append(node)
-
-    def load_config(self, path):
-        try:
-            with open(path, "r") as f:
-                self.config = yaml.safe_load(f)
-            # print(f"Loaded config: {self.config}")
-        except FileNotFoundError:
-            print(f"Config file not found at {path}, using defaults.")
-            self.config = {"simulation": {"num_nodes": 4, "max_blocks": 10}}
-
-    def run(self, max_steps=None):
-        print("Starting simulation...")
-        limit = max_steps if max_steps is not None else self.config.get("simulation", {}).get("max_blocks", 100)
-        
-        current_time = 0.0
-        last_proposal_time = 0.0
-        proposal_interval = 1.0 # Try to propose every 1 second
-        
-        finalized_count = 0
-        
-        while True:
-            # 1. Deliver next event
-            next_event_time = self.network.deliver_next()
-            
-            if next_event_time:
-                current_time = next_event_time
-            else:
-                # No events, advance time
-                current_time += 0.1
-            
-            # 2. Trigger block proposal periodically
-            if current_time - last_proposal_time >= proposal_interval:
-                for node in self.nodes:
-                    node.propose_block(current_time)
-                last_proposal_time = current_time
-            
-            # 3. Check termination condition
-import yaml
-import sys
-import random
-from typing import List
-
-from network.network import Network
-from network.logging_utils import JsonLinesLogger
-from node_sim.node import Node
-from core.crypto_layer import KeyPair
-
-class Simulator:
-    def __init__(self, config_path="config/config.yaml", output_file=sys.stdout, seed=0):
-        self.config = {}
-        self.load_config(config_path)
+        # Độ trễ theo region/RTT (section `latency` trong YAML); không có -> uniform(min_delay, max_delay)
+        latency_cfg = self.config.get("latency")
+        latency = None
+        if latency_cfg:
+            latency = LatencyModel.from_config(latency_cfg, self.validators, seed=self.rng.getrandbits(64))
         
-        # Initialize RNG
-        self.rng = random.Random(seed)
+        # Bandwidth (section `simulation.bandwidth`, Mbit/s): 1 số cho mọi node hoặc list theo thứ tự node
+        bandwidth_cfg = self.config["simulation"].get("bandwidth") or {}
+        uplink = bandwidth_cfg.get("uplink_mbps")
+        downlink = bandwidth_cfg.get("downlink_mbps")
         
-        # Initialize Logger
-        self.logger = JsonLinesLogger(output_file)
+        # Inbox (section `simulation.inbox`): capacity, policy, processing_time (1 số hoặc list theo node)
+        inbox_cfg = self.config["simulation"].get("inbox") or {}
+        processing_time = inbox_cfg.get("processing_time", 0.0)
         
         # Initialize Network
         self.network = Network(
@@ -117,22 +64,31 @@ class Simulator:
             min_delay=self.config["simulation"].get("min_delay", 0.1),
             max_delay=self.config["simulation"].get("max_delay", 0.5),
             drop_prob=self.config["simulation"].get("drop_prob", 0.0),
-            dup_prob=self.config["simulation"].get("dup_prob", 0.0)
+            dup_prob=self.config["simulation"].get("dup_prob", 0.0),
+            latency=latency,
+            coalesce_window=self.config["simulation"].get("coalesce_window", 0.0),
+            inbox_capacity=inbox_cfg.get("capacity"),
+            inbox_policy=inbox_cfg.get("policy", INBOX_TAIL_DROP),
+            processing_time=0.0 if isinstance(processing_time, list) else processing_time,
+            uplink_bps=None if uplink is None or isinstance(uplink, list) else uplink * 1e6,
+            downlink_bps=None if downlink is None or isinstance(downlink, list) else downlink * 1e6
         )
-        
-        # Initialize Nodes
-        num_nodes = self.config["simulation"].get("num_nodes", 4)
-        self.nodes: List[Node] = []
-        self.validators: List[str] = []
-        
-        # Generate keys deterministically
-        keypairs = []
-        for _ in range(num_nodes):
-            # KeyPair expects 32 bytes seed
-            kp_seed = self.rng.randbytes(32)
-            keypairs.append(KeyPair(seed=kp_seed))
-            
-        self.validators = [kp.pubkey() for kp in keypairs]
+        if isinstance(processing_time, list):
+            for node_id, seconds in zip(self.validators, processing_time):
+                self.network.set_processing_time(node_id, seconds)
+        if isinstance(uplink, list) or isinstance(downlink, list):
+            for i, node_id in enumerate(self.validators):
+                up = uplink[i] if isinstance(uplink, list) else uplink
+                down = downlink[i] if isinstance(downlink, list) else downlink
+                self.network.set_bandwidth(
+                    node_id,
+                    uplink_bps=None if up is None else up * 1e6,
+                    downlink_bps=None if down is None else down * 1e6
+                )
+        
+        # Gossip overlay (section `simulation.topology`); không cấu hình -> full mesh
+        topology_cfg = self.config["simulation"].get("topology")
+        self.topology = build_topology(topology_cfg, self.validators, self.rng) if topology_cfg else None
         
         for i in range(num_nodes):
             node_id = self.validators[i] # Use pubkey as node_id for simplicity
@@ -140,7 +96,19 @@ class Simulator:
                 node_id=node_id,
                 network=self.network,
                 keypair=keypairs[i],
-                validators=self.validators
+                validators=self.validators,
+                sync_batch_size=self.config["simulation"].get("sync_batch_size", 64),
+                sync_window=self.config["simulation"].get("sync_window", 4),
+                tx_gossip=self.config["simulation"].get("tx_gossip", "inventory"),
+                timeouts=timeouts,
+                pipelined=self.config["simulation"].get("pipelined", False),
+                min_block_time=self.config["simulation"].get("min_block_time", 0.0),
+                auto_propose=True,
+                validator_powers=self.config["simulation"].get("stakes"),
+                committee_size=self.config["simulation"].get("committee_size"),
+                committee_seed=self.config["simulation"].get("committee_seed", 0),
+                neighbors=self.topology[node_id] if self.topology is not None else None,
+                gossip_fanout=self.config["simulation"].get("gossip_fanout")
             )
             self.nodes.append(node)
 
@@ -158,28 +126,20 @@ class Simulator:
         limit = max_steps if max_steps is not None else self.config.get("simulation", {}).get("max_blocks", 100)
         
         current_time = 0.0
-        last_proposal_time = 0.0
-        proposal_interval = 1.0 # Try to propose every 1 second
-        
-        finalized_count = 0
         
         while True:
             # 1. Deliver next event
+            # (proposal là timer do ConsensusEngine xin đặt khi tới lượt propose, không cần poll)
             next_event_time = self.network.deliver_next()
             
-            if next_event_time:
+            if next_event_time is not None:
                 current_time = next_event_time
-            else:
-                # No events, advance time
-                current_time += 0.1
-            
-            # 2. Trigger block proposal periodically
-            if current_time - last_proposal_time >= proposal_interval:
-                for node in self.nodes:
-                    node.propose_block(current_time)
-                last_proposal_time = current_time
+            elif not self.network.has_pending_events():
+                print("Simulation ended (no pending events).")
+                self._print_final_states()
+                break
             
-            # 3. Check termination condition
+            # 2. Check termination condition
             # Check max height among nodes
             max_height = 0
             for node in self.nodes:
@@ -197,8 +157,27 @@ class Simulator:
                 self._print_final_states()
                 break
 
+    def consensus_latency(self):
+        """Latency từng phase consensus (simulated time) gộp trên mọi node: phase -> {count, p50, p95, p99}."""
+        return summarize(ConsensusMetrics.merge(node.consensus.metrics for node in self.nodes))
+
     def _print_final_states(self):
         print("\n=== Final State Hashes ===")
         for node in self.nodes:
             state_hash = node.state.commitment().hex()
-            print(f"Node {node.node_id}: {state_hash} (Height: {len(node.blockchain)})")
\ No newline at end of file
+            print(f"Node {node.node_id}: {state_hash} (Height: {len(node.blockchain)})")
+        
+        print("\n=== Consensus Latency (simulated s) ===")
+        print(f"{'phase':<18} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for phase, stats in self.consensus_latency().items():
+            print(f"{phase:<18} {stats['count']:>6} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f}")
+        processed = sum(node.consensus.metrics.votes_processed for node in self.nodes)
+        verified = sum(node.consensus.metrics.votes_verified for node in self.nodes)
+        print(f"votes processed: {processed}, verified: {verified}")
+        
+        if self.config["simulation"].get("inbox"):
+            print("\n=== Inbox ===")
+            for node in self.nodes:
+                stats = self.network.inbox_stats(node.node_id)
+                print(f"Node {node.node_id[:16]}: max depth {stats.max_depth}, dropped {stats.dropped}, "
+                      f"evicted {stats.evicted}, lost {stats.lost_by_type}")
\ No newline at end of file
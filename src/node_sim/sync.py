@@ -0,0 +1,209 @@
+from typing import Dict, List, Optional, Tuple
+
+from network.messages import Message, MessageType, GetBlocks, BlocksResponse
+from blocklayer.block import Block, verify_block_range
+from consensus.certificate import CommitCertificate, verify_certificate
+from consensus.vote import PHASE_PRECOMMIT, PHASE_PREVOTE
+
+
+class BlockSync:
+    """
+    Đồng bộ block theo lô cho node bị tụt lại nhiều height:
+    - Chia khoảng height còn thiếu thành các lô GET_BLOCKS(from_height, count).
+    - Giữ tối đa `max_in_flight` request cùng lúc (pipelined window).
+    - Phân các request cho nhiều peer theo vòng (fetch song song).
+    - Kiểm tra chữ ký header (proposer phải là validator) của cả lô một lần trước khi re-execute state.
+    - Mỗi block phải kèm CommitCertificate hợp lệ (precommit; pipelined: QC prevote), được lưu cùng block.
+      Thiếu certificate -> cả lô bị từ chối: 1 peer không thể tự ký 1 chain rồi bắt node finalize.
+    - Pipelined: QC của H chỉ certify, block H chỉ được nhập (finalize) khi đã có block H+1 (kèm QC)
+      nối lên nó (2-chain); block tip còn lại đi theo đường consensus.
+    Request quá `request_timeout` (simulated time) sẽ được xin lại từ peer khác.
+    """
+
+    def __init__(
+        self,
+        node,
+        batch_size: int = 64,
+        max_in_flight: int = 4,
+        request_timeout: float = 2.0,
+    ):
+        self.node = node
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.request_timeout = request_timeout
+
+        self.target_height = -1  # height cao nhất cần đồng bộ tới
+        self.next_request_height = 0  # height đầu tiên chưa được xin
+        self.in_flight: Dict[int, Tuple[str, int, float]] = {}  # from_height -> (peer, count, sent_time)
+        self.received: Dict[int, Block] = {}  # block đã nhận nhưng chưa nối được vào chain
+        self.received_certs: Dict[int, CommitCertificate] = {}  # certificate của block đã nhận
+        self.peer_heights: Dict[str, int] = {}  # peer -> height cao nhất peer đã có
+
+        self._retry: List[Tuple[int, int]] = []  # các khoảng (from_height, count) cần xin lại
+        self._next_peer = 0
+        self.requests_sent = 0
+
+    # ---------- API cho Node ----------
+
+    def observe_peer(self, peer: str, height: int) -> None:
+        """Ghi nhận peer đã có block tới `height`."""
+        if height > self.peer_heights.get(peer, -1):
+            self.peer_heights[peer] = height
+
+    def request_up_to(self, target_height: int, now: float) -> None:
+        """Yêu cầu đồng bộ chain tới `target_height` (bao gồm)."""
+        if target_height > self.target_height:
+            self.target_height = target_height
+        self.next_request_height = max(self.next_request_height, self._local_next_height())
+        self._expire(now)
+        self._fill_window(now)
+
+    def on_blocks(self, response: BlocksResponse, peer: str, now: float) -> None:
+        """Xử lý BLOCKS trả về từ peer."""
+        entry = self.in_flight.get(response.from_height)
+        if entry is None or entry[0] != peer:
+            return  # response không được yêu cầu hoặc đã hết hạn
+        del self.in_flight[response.from_height]
+
+        _, count, _ = entry
+        blocks = response.blocks[:count]
+        certificates = response.certificates[:len(blocks)]
+
+        if blocks and (
+            blocks[0].header.height != response.from_height
+            or not verify_block_range(blocks, self.node.validators)
+            or not self._verify_certificates(blocks, certificates)
+        ):
+            # Cả lô không hợp lệ -> xin lại từ peer khác
+            self._retry.append((response.from_height, count))
+            self._next_peer += 1
+        else:
+            for block in blocks:
+                self.received[block.header.height] = block
+            for block, certificate in zip(blocks, certificates):
+                self.received_certs[block.header.height] = certificate
+            if len(blocks) < count:
+                # Peer chưa có đủ block -> phần còn lại xin peer khác
+                self.peer_heights[peer] = response.from_height + len(blocks) - 1
+                self._retry.append((response.from_height + len(blocks), count - len(blocks)))
+
+        self._apply_ready(now)
+        self._fill_window(now)
+
+    def is_syncing(self) -> bool:
+        return self._local_next_height() <= self.target_height
+
+    # ---------- helper internal ----------
+
+    def _local_next_height(self) -> int:
+        return len(self.node.blockchain)
+
+    def _verify_certificates(self, blocks: List[Block], certificates: List) -> bool:
+        """Mỗi block phải có certificate đúng phase, khớp block và có 2/3+ chữ ký hợp lệ."""
+        if len(certificates) != len(blocks):
+            return False
+        phase = PHASE_PREVOTE if self.node.pipelined else PHASE_PRECOMMIT
+        for block, certificate in zip(blocks, certificates):
+            if (
+                certificate is None
+                or certificate.height != block.header.height
+                or certificate.block_hash != block.block_hash()
+                or not verify_certificate(certificate, self.node.consensus.validator_set_for(certificate.height), phase)
+            ):
+                return False
+        return True
+
+    def _pick_peer(self, from_height: int) -> Optional[str]:
+        """Chọn peer theo vòng, bỏ qua peer đã biết là chưa có `from_height`."""
+        peers = self.node.peers()
+        for i in range(len(peers)):
+            peer = peers[(self._next_peer + i) % len(peers)]
+            if self.peer_heights.get(peer, from_height) >= from_height:
+                self._next_peer = (self._next_peer + i + 1) % len(peers)
+                return peer
+        return None
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            from_height for from_height, (_, _, sent_time) in self.in_flight.items()
+            if now - sent_time >= self.request_timeout
+        ]
+        for from_height in expired:
+            _, count, _ = self.in_flight.pop(from_height)
+            self._retry.append((from_height, count))
+
+    def _next_range(self) -> Optional[Tuple[int, int]]:
+        local_next = self._local_next_height()
+        while self._retry:
+            self._retry.sort()
+            from_height, count = self._retry.pop(0)
+            # Bỏ phần đã có trong chain
+            end = from_height + count
+            from_height = max(from_height, local_next)
+            if from_height < end:
+                return from_height, end - from_height
+
+        if self.next_request_height > self.target_height:
+            return None
+        from_height = self.next_request_height
+        count = min(self.batch_size, self.target_height - from_height + 1)
+        self.next_request_height += count
+        return from_height, count
+
+    def _fill_window(self, now: float) -> None:
+        while len(self.in_flight) < self.max_in_flight:
+            next_range = self._next_range()
+            if next_range is None:
+                return
+            from_height, count = next_range
+
+            peer = self._pick_peer(from_height)
+            if peer is None:
+                self._retry.append(next_range)
+                return
+
+            self.in_flight[from_height] = (peer, count, now)
+            self.requests_sent += 1
+            self.node.send(
+                Message(
+                    msg_id=0,
+                    from_id=self.node.node_id,
+                    to_id=peer,
+                    msg_type=MessageType.GET_BLOCKS,
+                    payload=GetBlocks(from_height=from_height, count=count),
+                    height=from_height,
+                ),
+                now,
+            )
+
+    def _apply_ready(self, now: float) -> None:
+        """Nối các block liên tiếp đã nhận vào chain qua ConsensusEngine."""
+        while True:
+            height = self._local_next_height()
+            block = self.received.get(height)
+            if block is None:
+                break
+            if self.node.pipelined:
+                # 2-chain: cần block con (đã có QC) nối lên block này mới chốt được
+                child = self.received.get(height + 1)
+                if child is None or child.header.parent_hash != block.block_hash():
+                    break
+            del self.received[height]
+            certificate = self.received_certs.pop(height)
+
+            # Chữ ký đã kiểm tra theo lô; execute trên post-state của tip trong block tree
+            if self.node.block_tree.add_block(block, check_signature=False) is None:
+                self._retry.append((height, 1))
+                break
+
+            votes = self.node.consensus.import_finalized_block(block, certificate)
+            if self._local_next_height() == height:
+                break  # engine không ở đúng height này
+            for vote in votes:
+                self.node.broadcast_vote(vote, now)
+
+        # Dọn các block cũ (đã có trong chain bằng đường khác)
+        local_next = self._local_next_height()
+        for height in [h for h in self.received if h < local_next]:
+            del self.received[height]
+            self.received_certs.pop(height, None)
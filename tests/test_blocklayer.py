@@ -10,7 +10,11 @@ src_path = Path(__file__).parent.parent / "src"
 sys.path.insert(0, str(src_path))
 
 from core import KeyPair, TxBody, SignedTx, State
-from blocklayer import BlockHeader, Block, build_block, validate_block, Ledger
+from blocklayer import (
+    BlockHeader, Block, build_block, validate_block, verify_block_range, Ledger,
+    compute_tx_root, merkle_root, merkle_proof, verify_merkle_proof,
+)
+from blocklayer.block_tree import BlockTree
 
 
 def test_build_genesis_block():
@@ -247,4 +251,119 @@ def test_chain_building():
     assert ledger.get_height() == 5
     final_block, final_state = ledger.latest_finalized()
     assert final_block.header.height == 5
-    assert final_state.get(alice.pubkey(), "counter") == 5
\ No newline at end of file
+    assert final_state.get(alice.pubkey(), "counter") == 5
+
+
+def test_verify_block_range():
+    """Test kiểm tra cả dãy block khi sync (chữ ký + liên kết parent)"""
+    proposer = KeyPair()
+    state = State()
+
+    chain = []
+    parent = None
+    for _ in range(5):
+        parent = build_block(parent, state, [], proposer)
+        chain.append(parent)
+
+    assert verify_block_range(chain) is True
+    assert verify_block_range(chain[2:]) is True
+    assert verify_block_range(chain, validators={proposer.pubkey()}) is True
+    # Proposer không thuộc tập validator -> từ chối
+    assert verify_block_range(chain, validators={KeyPair().pubkey()}) is False
+
+    # Thiếu một block ở giữa -> height không liên tục
+    assert verify_block_range(chain[:2] + chain[3:]) is False
+
+    # Chữ ký sai ở một block -> cả dãy bị từ chối
+    chain[3].header_signature = "00" * 64
+    assert verify_block_range(chain) is False
+
+
+def test_merkle_proofs():
+    """Test inclusion proof cho mọi tx với số lượng leaf chẵn/lẻ"""
+    kp = KeyPair()
+    for n in range(1, 10):
+        txs = [SignedTx.create(TxBody(kp.pubkey(), f"k{i}", i), kp) for i in range(n)]
+        tx_ids = [tx.tx_id() for tx in txs]
+        root = merkle_root(tx_ids)
+        assert root == compute_tx_root(txs)
+
+        for i, tx_id in enumerate(tx_ids):
+            proof = merkle_proof(tx_ids, i)
+            assert verify_merkle_proof(tx_id, proof, root) is True
+            # Sai vị trí hoặc sai leaf -> từ chối
+            if n > 1:
+                other = tx_ids[(i + 1) % n]
+                assert verify_merkle_proof(other, proof, root) is False
+
+
+def test_validate_block_wrong_tx_root():
+    """Test body không khớp tx_root bị từ chối trước khi execute"""
+    proposer = KeyPair()
+    alice = KeyPair()
+    state = State()
+
+    tx1 = SignedTx.create(TxBody(alice.pubkey(), "a", 1), alice)
+    tx2 = SignedTx.create(TxBody(alice.pubkey(), "b", 2), alice)
+    block = build_block(None, state, [tx1, tx2], proposer)
+    assert block.has_valid_tx_root()
+    assert validate_block(block, None, state) is True
+
+    # Đổi thứ tự tx: header (và chữ ký) giữ nguyên nhưng body không còn khớp
+    block.txs = [tx2, tx1]
+    assert block.has_valid_tx_root() is False
+    assert validate_block(block, None, state) is False
+    assert verify_block_range([block]) is False
+
+
+def test_block_tree_forks_and_pruning():
+    """Test block tree: validate trên tổ tiên bất kỳ, cache post-state, cắt nhánh thua"""
+    proposer_a = KeyPair()
+    proposer_b = KeyPair()
+    alice = KeyPair()
+    genesis_state = State()
+
+    tree = BlockTree(genesis_state)
+    genesis = build_block(None, genesis_state, [], proposer_a)
+    assert tree.add_block(genesis) is not None
+
+    # Hai proposal cạnh tranh ở height 1, cùng xây trên genesis
+    tx_a = SignedTx.create(TxBody(alice.pubkey(), "v", "A"), alice)
+    tx_b = SignedTx.create(TxBody(alice.pubkey(), "v", "B"), alice)
+    block_a = build_block(genesis, genesis_state, [tx_a], proposer_a)
+    block_b = build_block(genesis, genesis_state, [tx_b], proposer_b)
+    node_a = tree.add_block(block_a)
+    node_b = tree.add_block(block_b)
+    assert node_a.post_state.get(alice.pubkey(), "v") == "A"
+    assert node_b.post_state.get(alice.pubkey(), "v") == "B"
+    # State của cha không bị thay đổi
+    assert tree.get(genesis.block_hash()).post_state.get(alice.pubkey(), "v") is None
+
+    # Block height 2 xây trên nhánh A chỉ cần execute chính nó
+    block_a2 = build_block(block_a, node_a.post_state, [], proposer_a)
+    assert tree.add_block(block_a2) is not None
+    # Lần thứ hai lấy từ cache
+    assert tree.add_block(block_a2) is tree.get(block_a2.block_hash())
+
+    # Block sai (state hash của nhánh B nhưng nối vào A) bị từ chối
+    bad = build_block(block_a, node_b.post_state, [], proposer_b)
+    assert tree.add_block(bad) is None
+    bad_1 = build_block(genesis, node_a.post_state, [], proposer_b)
+    assert tree.add_block(bad_1) is None
+
+    # Post-state là overlay trên state của cha, không phải bản copy
+    assert tree.get(block_a2.block_hash()).post_state._parent is node_a.post_state
+
+    # Finalize A -> nhánh B bị cắt, A2 còn giữ; post-state của gốc mới được gộp phẳng
+    tree.finalize(block_a.block_hash())
+    assert node_a.post_state._parent is None
+    assert node_a.post_state.get(alice.pubkey(), "v") == "A"
+    assert block_b.block_hash() not in tree
+    assert genesis.block_hash() not in tree
+    assert block_a2.block_hash() in tree
+    assert tree.add_block(build_block(block_b, node_b.post_state, [], proposer_b)) is None
+    # Chỉ quên block sai ở height đã finalize, block sai ở height 2 vẫn được nhớ
+    assert bad_1.block_hash() not in tree.invalid
+    assert bad.block_hash() in tree.invalid
+    tree.finalize(block_a2.block_hash())
+    assert not tree.invalid
@@ -6,8 +6,12 @@ from collections import defaultdict
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
 
-from consensus.consensus import ConsensusEngine
-from consensus.vote import build_vote, PHASE_PREVOTE, PHASE_PRECOMMIT
+from consensus.certificate import CommitCertificate, build_certificate, verify_certificate
+from consensus.consensus import ConsensusEngine, VoteTally
+from consensus.metrics import summarize
+from consensus.timeouts import TimeoutConfig, TimeoutSchedule, STEP_PROPOSE, STEP_PREVOTE, STEP_PRECOMMIT
+from consensus.validator_set import ValidatorSet
+from consensus.vote import Vote, build_vote, PHASE_PREVOTE, PHASE_PRECOMMIT
 from core.crypto_layer import KeyPair
 from core.state import State
 from blocklayer.block import Block, BlockHeader
@@ -223,6 +227,20 @@ class TestConsensus(unittest.TestCase):
         self.assertEqual(engine.get_latest_finalized().block_hash(), block_hash)
         print("[PASS] Finalization resumed and completed after receiving block")
 
+    def test_fast_forward_ignores_nil_quorum(self):
+        """2/3+ precommit NIL ở height+1 không chốt block nào -> không fast forward, không xin block"""
+        requested_blocks = []
+        engine = ConsensusEngine(self.validator_kp, total_validators=4, validator_index=0,
+                                 on_ask_for_block=requested_blocks.append)
+        engine.on_receive_block(create_test_block(height=0, keypair=self.validator_kp))
+        for kp in [KeyPair() for _ in range(3)]:
+            engine.on_receive_vote(build_vote(1, 0, "NIL", PHASE_PRECOMMIT, kp))
+
+        self.assertEqual(requested_blocks, [])
+        self.assertEqual(engine.get_finalized_count(), 0)
+        self.assertEqual(engine.current_height, 0)
+        self.assertIsNone(engine.waiting_for_block_to_finalize)
+
     def test_advanced_block_fetching(self):
         print("\n=== Testing Advanced Block Fetching (Parent Hash) ===")
         
@@ -291,6 +309,32 @@ class TestConsensus(unittest.TestCase):
         # The actual behavior depends on implementation details
         print("[PASS] Locking mechanism verified through state inspection")
 
+    def test_locked_rejects_conflicting_block(self):
+        """Test lock chỉ được bỏ khi block mới có 2/3+ prevote ở round sau"""
+        voters = [KeyPair() for _ in range(3)]
+        block_a = create_test_block(height=0, keypair=self.validator_kp)
+        self.engine.on_receive_block(block_a)
+        for kp in voters:
+            self.engine.on_receive_vote(build_vote(0, 0, block_a.block_hash(), PHASE_PREVOTE, kp))
+        self.assertEqual(self.engine.locked_block, block_a.block_hash())
+        
+        # Round 1: block khác không có POL -> prevote NIL
+        self.engine.advance_round()
+        block_b = create_test_block(height=0, keypair=voters[0])
+        vote = self.engine.on_receive_block(block_b)
+        self.assertEqual(vote.block_hash, "NIL")
+        
+        # Quorum prevote của round 1 cho B (không phải round hiện tại) chỉ cập nhật valid_block
+        self.engine.advance_round()
+        for kp in voters:
+            self.assertIsNone(self.engine.on_receive_vote(build_vote(0, 1, block_b.block_hash(), PHASE_PREVOTE, kp)))
+        self.assertEqual((self.engine.valid_block, self.engine.valid_round), (block_b.block_hash(), 1))
+        self.assertEqual(self.engine.locked_block, block_a.block_hash())
+        
+        # Round 2: B có POL ở round 1 > locked_round -> được unlock
+        vote = self.engine.on_receive_block(block_b)
+        self.assertEqual(vote.block_hash, block_b.block_hash())
+
     def test_round_advancement(self):
         """Test advancing rounds for liveness"""
         print("\n=== Testing Round Advancement ===")
@@ -469,5 +513,403 @@ class TestConsensus(unittest.TestCase):
         self.assertIsNone(self.engine.my_prevote)
         print("[PASS] No prevote for old block")
 
+    def test_equivocation_evidence(self):
+        """Test that a conflicting second vote is kept as equivocation evidence"""
+        print("\n=== Testing Equivocation Evidence ===")
+        
+        kp = KeyPair()
+        pool = self.engine._get_vote_pool(0, 0)
+        
+        self.assertTrue(pool.add_vote(build_vote(0, 0, "block_0", PHASE_PREVOTE, kp)))
+        # Exact duplicate -> rejected, not evidence
+        self.assertFalse(pool.add_vote(build_vote(0, 0, "block_0", PHASE_PREVOTE, kp)))
+        self.assertEqual(len(self.engine.evidence), 0)
+        
+        # Conflicting vote -> rejected but recorded once
+        self.assertFalse(pool.add_vote(build_vote(0, 0, "block_1", PHASE_PREVOTE, kp)))
+        self.assertFalse(pool.add_vote(build_vote(0, 0, "block_2", PHASE_PREVOTE, kp)))
+        self.assertEqual(len(self.engine.evidence), 1)
+        evidence = self.engine.evidence[0]
+        self.assertEqual(evidence.validator_pubkey_hex, kp.pubkey())
+        self.assertEqual(evidence.first.block_hash, "block_0")
+        self.assertEqual(evidence.second.block_hash, "block_1")
+        self.assertTrue(evidence.is_valid())
+        print("[PASS] Equivocation recorded as evidence")
+
+    def test_incremental_leader_large_validator_set(self):
+        """Test leader is detected as soon as the quorum vote arrives (500 validators)"""
+        print("\n=== Testing Incremental Tally (500 validators) ===")
+        
+        engine = ConsensusEngine(KeyPair(), total_validators=500, validator_index=0)
+        pool = engine._get_vote_pool(0, 0)
+        threshold = 2 * 500 // 3
+        
+        for i in range(threshold + 1):
+            self.assertIsNone(pool.get_prevote_leader())
+            self.assertTrue(pool.add_vote(build_vote(0, 0, "block_x", PHASE_PREVOTE, KeyPair())))
+        
+        self.assertEqual(pool.get_prevote_leader(), "block_x")
+        self.assertEqual(pool.get_prevote_count("block_x"), threshold + 1)
+        self.assertIsNone(pool.get_precommit_leader())
+        print("[PASS] Leader cached at quorum")
+
+    def test_validator_set_bitset_tally(self):
+        """Test closed validator set: unknown voters rejected, tally by bitset"""
+        print("\n=== Testing Validator Set Bitsets ===")
+        
+        kps = [KeyPair() for _ in range(4)]
+        engine = ConsensusEngine(kps[0], total_validators=4, validator_index=0,
+                                 validators=[kp.pubkey() for kp in kps])
+        pool = engine._get_vote_pool(0, 0)
+        
+        # Voter ngoài tập -> bị từ chối
+        self.assertFalse(pool.add_vote(build_vote(0, 0, "block_0", PHASE_PREVOTE, KeyPair())))
+        
+        for kp in kps[1:]:
+            self.assertTrue(pool.add_vote(build_vote(0, 0, "block_0", PHASE_PREVOTE, kp)))
+        self.assertEqual(pool.prevotes.by_hash["block_0"], 0b1110)
+        self.assertEqual(pool.get_prevote_count("block_0"), 3)
+        self.assertEqual(pool.get_prevote_leader(), "block_0")
+        
+        # Fast forward dùng cùng bitset: vote trùng không được đếm lại
+        for _ in range(3):
+            engine.on_receive_vote(build_vote(1, 0, "block_1", PHASE_PRECOMMIT, kps[1]))
+        self.assertEqual(engine.future_precommits[(1, 0)].count("block_1"), 1)
+        print("[PASS] Bitset tally with closed validator set")
+
+    def test_weighted_validator_set(self):
+        """Test voting power: quorum theo tổng power, lịch proposer theo stake"""
+        kps = [KeyPair() for _ in range(4)]
+        validators = [kp.pubkey() for kp in kps]
+        vs = ValidatorSet(validators, powers=[5, 1, 1, 1])
+        self.assertEqual((vs.total_power, vs.quorum_threshold), (8, 5))
+        self.assertFalse(vs.has_quorum(0b0001))
+        self.assertFalse(vs.has_quorum(0b1110))
+        self.assertTrue(vs.has_quorum(0b0011))
+        # Bit signer ngoài tập (index >= 4): bị từ chối, không IndexError khi cộng power
+        self.assertFalse(vs.has_quorum(0b10011))
+        self.assertEqual(vs.power_of_bitset(0b10011), 6)
+        forged = CommitCertificate(0, 0, "ab" * 32, 0b10011, ["00" * 64] * 3)
+        self.assertFalse(verify_certificate(forged, vs))
+        
+        # Validator nặng + 1 validator khác đã đủ 2/3+ power
+        engine = ConsensusEngine(kps[2], total_validators=4, validator_index=2, validators=validators,
+                                 validator_powers=[5, 1, 1, 1])
+        block_0 = create_test_block(height=0, keypair=kps[0])
+        engine.on_receive_block(block_0)
+        self.assertIsNone(engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PREVOTE, kps[0])))
+        precommit = engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PREVOTE, kps[1]))
+        self.assertEqual(precommit.phase, PHASE_PRECOMMIT)
+        
+        # Power bằng nhau -> đúng round-robin (height + round) % N
+        equal = ValidatorSet(validators, powers=[7, 7, 7, 7])
+        for h in range(10):
+            for r in range(3):
+                self.assertEqual(equal.proposer_index(h, r), (h + r) % 4)
+        self.assertEqual(ValidatorSet(validators[:2], powers=[3, 1])._schedule, [0, 0, 1, 0])
+        
+        # Tập lớn, stake lệch: mỗi validator được số lượt propose đúng bằng power trong 1 chu kỳ
+        powers = [1 + 1000 // (i + 1) for i in range(3000)]
+        big = ValidatorSet(["v%d" % i for i in range(3000)], powers=powers)
+        cycle = len(big._schedule)
+        self.assertEqual(cycle, sum(powers))
+        counts = [0] * 3000
+        for h in range(cycle):
+            counts[big.proposer_index(h, 0)] += 1
+        self.assertEqual(counts, powers)
+        
+        # Tally cộng dồn power, khớp với tổng tính lại từ bitset
+        tally = VoteTally()
+        for i in range(3000):
+            power = tally.add(i, "b", big.power_of(i))
+            if big.has_quorum_power(power):
+                break
+        self.assertEqual(power, big.power_of_bitset(tally.by_hash["b"]))
+        self.assertTrue(big.has_quorum(tally.by_hash["b"]))
+        self.assertLess(i, 2999)
+
+    def test_committee_sampled_voting(self):
+        """Test committee: chọn deterministic theo seed/height, chỉ committee vote và tính quorum"""
+        kps = [KeyPair() for _ in range(8)]
+        validators = [kp.pubkey() for kp in kps]
+        engines = [
+            ConsensusEngine(kp, total_validators=8, validator_index=i, validators=validators,
+                            committee_size=3, committee_seed=42)
+            for i, kp in enumerate(kps)
+        ]
+        committee = engines[0].committee_for(0)
+        self.assertEqual(len(committee), 3)
+        self.assertTrue(all(e.committee_for(0) == committee for e in engines))
+        self.assertEqual(committee, ValidatorSet(validators).sample_committee(3, 42, 0).pubkeys)
+        self.assertNotEqual([engines[0].committee_for(h) for h in range(10)], [committee] * 10)
+        
+        members = [i for i in range(8) if validators[i] in committee]
+        outsider = next(i for i in range(8) if i not in members)
+        proposer = next(i for i in members if engines[i].should_propose(0, 0))
+        self.assertEqual(sum(e.should_propose(0, 0) for e in engines), 1)
+        
+        # Node ngoài committee không vote (kể cả NIL khi timeout), chỉ finalize theo certificate
+        block_0 = create_test_block(height=0, keypair=kps[proposer])
+        self.assertIsNone(engines[outsider].on_receive_block(block_0))
+        self.assertEqual(engines[outsider].on_timeout(0, 0, STEP_PROPOSE), [])
+        
+        # Quorum tính trên committee: 3/3 thành viên (2/3+ của 3) đủ chốt; vote người ngoài bị bỏ
+        engine = engines[members[0]]
+        engine.on_receive_block(block_0)
+        engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PRECOMMIT, kps[outsider]))
+        for i in members:
+            engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PRECOMMIT, kps[i]))
+        self.assertEqual(engine.get_finalized_count(), 1)
+        cert = engine.last_certificate
+        self.assertEqual(cert.signer_count(), 3)
+        self.assertTrue(verify_certificate(cert, engine.validator_set_for(0)))
+        self.assertFalse(verify_certificate(cert, engine.validator_set))
+        
+        engines[outsider].on_receive_certificate(cert)
+        self.assertEqual(engines[outsider].get_finalized_count(), 1)
+        self.assertEqual(engines[outsider].current_height, 1)
+
+    def test_consensus_metrics(self):
+        """Test mốc thời gian từng phase theo clock của engine và số vote đã xử lý/verify"""
+        kps = [KeyPair() for _ in range(4)]
+        validators = [kp.pubkey() for kp in kps]
+        now = [0.0]
+        engine = ConsensusEngine(kps[0], total_validators=4, validator_index=0, validators=validators,
+                                 clock=lambda: now[0])
+        block_0 = create_test_block(height=0, keypair=kps[0])
+        now[0] = 0.5
+        engine.on_receive_block(block_0)
+        for t, phase in ((1.0, PHASE_PREVOTE), (2.0, PHASE_PRECOMMIT)):
+            now[0] = t
+            for kp in kps[1:]:
+                engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), phase, kp))
+        engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PREVOTE, kps[1]))
+        
+        self.assertEqual(engine.metrics.timeline(0), {
+            "height_start": 0.0, "proposal": 0.5, "prevote": 0.5,
+            "prevote_quorum": 1.0, "precommit_quorum": 2.0, "finalize": 2.0,
+        })
+        latencies = engine.metrics.phase_latencies()
+        self.assertEqual(latencies["propose"], [0.5])
+        self.assertEqual(latencies["precommit_quorum"], [1.0])
+        self.assertEqual(latencies["finalize"], [2.0])
+        # Vote height 0 cuối cùng đến sau khi đã sang height 1 -> xử lý nhưng không verify
+        self.assertEqual(engine.metrics.votes_processed, 7)
+        self.assertEqual(engine.metrics.votes_verified, 6)
+        self.assertEqual(engine.metrics.timeline(1), {})
+        
+        summary = summarize({"finalize": [0.1 * i for i in range(1, 101)]})["finalize"]
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p50"], 5.0)
+        self.assertAlmostEqual(summary["p95"], 9.5)
+        self.assertAlmostEqual(summary["p99"], 9.9)
+
+    def test_commit_certificate(self):
+        """Test engine builds a CommitCertificate that another engine can finalize from"""
+        print("\n=== Testing Commit Certificate ===")
+        
+        kps = [KeyPair() for _ in range(4)]
+        validators = [kp.pubkey() for kp in kps]
+        engine = ConsensusEngine(kps[0], total_validators=4, validator_index=0, validators=validators)
+        block_0 = create_test_block(height=0, keypair=kps[0])
+        engine.on_receive_block(block_0)
+        for kp in kps[1:]:
+            engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PRECOMMIT, kp))
+        
+        cert = engine.last_certificate
+        self.assertIsNotNone(cert)
+        self.assertEqual((cert.height, cert.block_hash), (0, block_0.block_hash()))
+        self.assertEqual(cert.signer_indices(), [1, 2, 3])
+        self.assertTrue(verify_certificate(cert, engine.validator_set))
+        
+        # Chữ ký bị sửa hoặc thiếu signer -> không hợp lệ
+        tampered = CommitCertificate(cert.height, cert.round, cert.block_hash, cert.signers,
+                                     [cert.signatures[1]] + cert.signatures[1:])
+        self.assertFalse(verify_certificate(tampered, engine.validator_set))
+        short = CommitCertificate(cert.height, cert.round, cert.block_hash, 0b0110, cert.signatures[:2])
+        self.assertFalse(verify_certificate(short, engine.validator_set))
+        
+        # Engine khác: 1 certificate thay cho 3 precommit
+        asked = []
+        follower = ConsensusEngine(kps[1], total_validators=4, validator_index=1,
+                                   validators=validators, on_ask_for_block=asked.append)
+        # QC prevote (chữ ký hợp lệ) không chốt được block ở chế độ thường
+        prevote_qc = build_certificate(
+            [build_vote(0, 0, block_0.block_hash(), PHASE_PREVOTE, kp) for kp in kps[1:]], engine.validator_set)
+        self.assertTrue(verify_certificate(prevote_qc, engine.validator_set, PHASE_PREVOTE))
+        self.assertEqual(follower.on_receive_certificate(prevote_qc), [])
+        self.assertIsNone(follower.pending_certificate)
+        self.assertEqual(asked, [])
+        self.assertEqual(follower.on_receive_certificate(cert), [])
+        self.assertEqual(asked, [block_0.block_hash()])
+        follower.on_receive_block(block_0)
+        self.assertEqual(follower.get_finalized_count(), 1)
+        self.assertEqual(follower.current_height, 1)
+        self.assertIs(follower.last_certificate, cert)
+        print("[PASS] Certificate verified and used to finalize")
+
+    def test_bounded_memory_long_run(self):
+        """Test engine buffers stay flat over 100k finalized heights"""
+        print("\n=== Testing Bounded Memory (100k heights) ===")
+        
+        class FakeHeader:
+            def __init__(self, height):
+                self.height = height
+                self.parent_hash = "p%d" % (height - 1)
+        
+        class FakeBlock:
+            """Block nhẹ: không ký, không execute tx"""
+            def __init__(self, height, tag="a"):
+                self.header = FakeHeader(height)
+                self.txs = []
+                self._hash = "%s%d" % (tag, height)
+            def block_hash(self):
+                return self._hash
+        
+        kps = [KeyPair() for _ in range(4)]
+        validators = [kp.pubkey() for kp in kps]
+        engine = ConsensusEngine(kps[0], total_validators=4, validator_index=0,
+                                 validators=validators, block_validator=lambda b: False,
+                                 finalized_history=16)
+        # Vote giả phase lạ: vẫn được buffer và tạo vote pool, nhưng bị loại trước
+        # khi verify chữ ký -> test không tốn thời gian crypto
+        def fake_vote(height, round, sender):
+            return Vote(height, round, "x%d" % height, "PROBE", sender, "00", sender, "")
+        
+        import io, contextlib
+        heights = 100_000
+        sizes = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for h in range(heights):
+                engine.on_receive_block(FakeBlock(h))
+                engine.on_receive_block(FakeBlock(h, tag="b"))  # proposal cạnh tranh
+                engine.on_receive_block(FakeBlock(h + 1))  # block tương lai
+                engine.on_receive_vote(fake_vote(h + 1, 0, validators[1]))
+                engine.on_receive_vote(fake_vote(h + 2, 1, validators[2]))
+                engine.on_receive_vote(fake_vote(h, 3, validators[3]))  # round tương lai
+                engine.import_finalized_block(FakeBlock(h))
+                if h % 10_000 == 0:
+                    sizes.append((len(engine.vote_pools), len(engine.proposed_blocks),
+                                  len(engine.proposals), len(engine.future_vote_buffer),
+                                  len(engine.future_block_buffer)))
+        
+        self.assertEqual(engine.get_finalized_count(), heights)
+        self.assertEqual(engine.get_latest_finalized().block_hash(), "a%d" % (heights - 1))
+        self.assertEqual(len(engine.finalized_blocks), 16)
+        # Kích thước buffer không tăng theo chiều dài chain
+        self.assertEqual(len(set(sizes[1:])), 1, sizes)
+        self.assertLessEqual(max(max(sz) for sz in sizes), 4)
+        print("[PASS] Engine memory flat over 100k heights")
+    
+    def test_round_timeouts(self):
+        """Test propose/prevote/precommit timeouts drive NIL votes and round changes"""
+        print("\n=== Testing Round Timeouts ===")
+        
+        scheduled = []
+        config = TimeoutConfig(propose=1.0, prevote=2.0, precommit=3.0,
+                               propose_delta=0.5, prevote_delta=0.5, precommit_delta=0.5)
+        engine = ConsensusEngine(self.validator_kp, total_validators=4, validator_index=0,
+                                 timeouts=config,
+                                 on_schedule_timeout=lambda h, r, step, d: scheduled.append((h, r, step, d)))
+        engine.start()
+        self.assertEqual(scheduled, [(0, 0, STEP_PROPOSE, 1.0)])
+        
+        # Không có proposal -> prevote NIL
+        votes = engine.on_timeout(0, 0, STEP_PROPOSE)
+        self.assertEqual([(v.phase, v.block_hash) for v in votes], [(PHASE_PREVOTE, "NIL")])
+        self.assertEqual(scheduled[-1], (0, 0, STEP_PREVOTE, 2.0))
+        
+        # Không đạt prevote quorum -> precommit NIL
+        votes = engine.on_timeout(0, 0, STEP_PREVOTE)
+        self.assertEqual([(v.phase, v.block_hash) for v in votes], [(PHASE_PRECOMMIT, "NIL")])
+        self.assertEqual(scheduled[-1], (0, 0, STEP_PRECOMMIT, 3.0))
+        
+        # Không finalize -> round mới, timeout tăng theo round
+        engine.on_timeout(0, 0, STEP_PRECOMMIT)
+        self.assertEqual(engine.current_round, 1)
+        self.assertEqual(scheduled[-1], (0, 1, STEP_PROPOSE, 1.5))
+        
+        # Timer của round cũ bị bỏ qua
+        self.assertEqual(engine.on_timeout(0, 0, STEP_PROPOSE), [])
+        self.assertIsNone(engine.my_prevote)
+        print("[PASS] Timeouts drive NIL votes and round changes")
+    
+    def test_adaptive_timeout_schedule(self):
+        """Test adaptive timeouts follow observed quorum latency within bounds"""
+        schedule = TimeoutSchedule(TimeoutConfig(prevote=2.0, prevote_delta=0.5, adaptive=True,
+                                                 adaptive_factor=3.0, adaptive_min=0.2))
+        self.assertEqual(schedule.timeout(STEP_PREVOTE, 0), 2.0)
+        schedule.observe(STEP_PREVOTE, 0.1)
+        self.assertAlmostEqual(schedule.timeout(STEP_PREVOTE, 0), 0.3)
+        self.assertAlmostEqual(schedule.timeout(STEP_PREVOTE, 2), 1.3)
+        schedule.observe(STEP_PREVOTE, 10.0)  # mạng chậm: không vượt quá cấu hình
+        self.assertEqual(schedule.timeout(STEP_PREVOTE, 0), 2.0)
+    
+    def test_future_buffer_caps(self):
+        """Test per-sender and window caps on buffered future votes/blocks"""
+        kps = [KeyPair() for _ in range(4)]
+        engine = ConsensusEngine(kps[0], total_validators=4, validator_index=0,
+                                 validators=[kp.pubkey() for kp in kps],
+                                 max_future_heights=4, max_buffered_votes_per_sender=3)
+        
+        # Quá cửa sổ height -> bỏ
+        engine.on_receive_vote(build_vote(5, 0, "far", PHASE_PREVOTE, kps[1]))
+        engine.on_receive_block(create_test_block(height=5, keypair=kps[1]))
+        self.assertEqual(len(engine.future_vote_buffer), 0)
+        self.assertEqual(len(engine.future_block_buffer), 0)
+        
+        # Quota mỗi validator
+        for h in range(1, 5):
+            engine.on_receive_vote(build_vote(h, 0, "b%d" % h, PHASE_PREVOTE, kps[1]))
+        self.assertEqual(sum(len(v) for v in engine.future_vote_buffer.values()), 3)
+        # Validator ngoài tập không được buffer
+        engine.on_receive_vote(build_vote(1, 0, "b1", PHASE_PREVOTE, KeyPair()))
+        self.assertEqual(len(engine.future_vote_buffer[(1, 0)]), 1)
+        
+        # Vote rời buffer -> trả lại quota
+        block_0 = create_test_block(height=0, keypair=kps[0])
+        engine.import_finalized_block(block_0)
+        engine.on_receive_vote(build_vote(4, 0, "b4", PHASE_PREVOTE, kps[1]))
+        self.assertEqual(len(engine.future_vote_buffer[(4, 0)]), 1)
+
+    def test_pipelined_two_chain_commit(self):
+        """Test pipelined mode: QC prevote certify H, QC của con trực tiếp chốt H"""
+        kps = [KeyPair() for _ in range(4)]
+        validators = [kp.pubkey() for kp in kps]
+        finalized = []
+        engine = ConsensusEngine(kps[0], total_validators=4, validator_index=0, validators=validators,
+                                 on_finalize_callback=lambda block, cert: finalized.append((block, cert)),
+                                 block_validator=lambda block: True, pipelined=True)
+        
+        # H0: 2/3+ prevote -> certify và sang H1 ngay, chưa finalize
+        block_0 = create_test_block(height=0, keypair=kps[0])
+        self.assertEqual(engine.on_receive_block(block_0).block_hash, block_0.block_hash())
+        for kp in kps[1:]:
+            engine.on_receive_vote(build_vote(0, 0, block_0.block_hash(), PHASE_PREVOTE, kp))
+        self.assertEqual(engine.current_height, 1)
+        self.assertIsNone(engine.my_precommit)
+        self.assertEqual(finalized, [])
+        self.assertIs(engine.certified_block, block_0)
+        self.assertEqual(engine.certified_qc.phase, PHASE_PREVOTE)
+        self.assertTrue(verify_certificate(engine.certified_qc, engine.validator_set, PHASE_PREVOTE))
+        # QC prevote không phải certificate chốt block
+        self.assertFalse(verify_certificate(engine.certified_qc, engine.validator_set))
+        
+        # H1 không xây trên block đã certify -> prevote NIL
+        orphan = create_test_block(height=1, keypair=kps[1])
+        self.assertEqual(engine.on_receive_block(orphan).block_hash, "NIL")
+        
+        # Round sau: H1 xây trên H0, QC của H1 chốt H0 (2-chain)
+        engine.advance_round()
+        block_1 = create_test_block(height=1, parent_block=block_0, keypair=kps[2])
+        self.assertEqual(engine.on_receive_block(block_1).block_hash, block_1.block_hash())
+        for kp in kps[1:]:
+            engine.on_receive_vote(build_vote(1, 1, block_1.block_hash(), PHASE_PREVOTE, kp))
+        self.assertEqual(engine.current_height, 2)
+        self.assertEqual([b.block_hash() for b, _ in finalized], [block_0.block_hash()])
+        self.assertEqual(finalized[0][1].block_hash, block_0.block_hash())
+        self.assertIs(engine.certified_block, block_1)
+        print("[PASS] Pipelined 2-chain commit")
+
 if __name__ == "__main__":
     pytest.main([__file__])
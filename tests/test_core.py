@@ -62,4 +62,27 @@ def test_state_commitment_deterministic():
     """
     state1 = State({"a/b": 1, "c/d": 2})
     state2 = State({"c/d": 2, "a/b": 1})
-    assert state1.commitment() == state2.commitment()
\ No newline at end of file
+    assert state1.commitment() == state2.commitment()
+def test_state_fork_overlay():
+    """fork() là overlay copy-on-write: đọc xuyên xuống cha, ghi chỉ ở lớp con; flatten() không đổi nội dung."""
+    alice = KeyPair()
+    bob = KeyPair()
+    parent = State()
+    assert parent.apply_tx(SignedTx.create(TxBody(alice.pubkey(), "msg", "hello"), alice))
+
+    child = parent.fork()
+    assert child.get(alice.pubkey(), "msg") == "hello"
+    assert child.apply_tx(SignedTx.create(TxBody(alice.pubkey(), "msg", "edited"), alice))
+    assert child.apply_tx(SignedTx.create(TxBody(bob.pubkey(), "other", 1), bob))
+    # Quyền sở hữu key của lớp cha vẫn được kiểm tra
+    assert child.apply_tx(SignedTx.create(TxBody(bob.pubkey(), "msg", "hacked"), bob)) is False
+    assert child.get(alice.pubkey(), "msg") == "edited"
+    assert parent.get(alice.pubkey(), "msg") == "hello"
+    assert parent.get(bob.pubkey(), "other") is None
+
+    grandchild = child.fork()
+    flat = State(dict(child.data))
+    assert grandchild.commitment() == child.commitment() == flat.commitment()
+    grandchild.flatten()
+    assert grandchild.data == flat.data
+    assert grandchild.apply_tx(SignedTx.create(TxBody(bob.pubkey(), "msg", "hacked"), bob)) is False
@@ -3,6 +3,9 @@ import sys
 import os
 import shutil
 import filecmp
+import io
+import json
+from collections import defaultdict
 from typing import List
 
 # Add src to path
@@ -12,6 +15,12 @@ from node_sim.simulator import Simulator
 from network.messages import Message, MessageType
 from core.types_tx import SignedTx, TxBody
 from core.crypto_layer import KeyPair, sign_struct
+from core.state import State
+from blocklayer.block import CompactBody, build_block
+from consensus.certificate import verify_certificate
+from network.network import Network
+from network.logging_utils import JsonLinesLogger
+from node_sim.node import Node
 
 @pytest.fixture
 def temp_config(tmp_path):
@@ -94,6 +103,13 @@ def test_block_proposal(temp_config):
             max_height = max(max_height, node.blockchain[-1].header.height)
             
     assert max_height > 0, "Should have finalized at least one block"
+    
+    # Block chốt bằng precommit phải đi kèm CommitCertificate hợp lệ
+    assert any(node.certificates for node in sim.nodes)
+    for node in sim.nodes:
+        for height, cert in node.certificates.items():
+            assert cert.block_hash == node.blockchain[height].block_hash()
+            assert verify_certificate(cert, node.consensus.validator_set)
 
 def test_safety_one_block_per_height(temp_config):
     """
@@ -225,6 +241,46 @@ def test_robustness_replays_duplicates(tmp_path):
         for i in range(min_len):
             assert reference_chain[i].block_hash() == node.blockchain[i].block_hash()
 
+def test_duplicates_dropped_before_verification():
+    """
+    3b. network cấp msg_id duy nhất; bản duplicate (dup_prob) và replay cùng id
+    bị node bỏ trước khi verify chữ ký vote.
+    """
+    import random
+    from consensus.vote import build_vote, PHASE_PREVOTE
+
+    keypairs = [KeyPair(seed=bytes([i + 31]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    log = io.StringIO()
+    net = Network(logger=JsonLinesLogger(log), rng=random.Random(0), min_delay=0.01, max_delay=0.05, dup_prob=1.0)
+    nodes = [Node(v, net, kp, validators, tx_gossip="off") for v, kp in zip(validators, keypairs)]
+
+    # Prevote height 1: node chỉ buffer, không kích hoạt consensus
+    vote = build_vote(1, 0, "ab" * 32, PHASE_PREVOTE, keypairs[1])
+    nodes[1].broadcast_vote(vote, 0.0)
+    while net.has_pending_events():
+        net.deliver_next()
+
+    events = [json.loads(line) for line in log.getvalue().splitlines()]
+    broadcast = next(e for e in events if e["event"] == "BROADCAST")
+    delivered = [e for e in events if e["event"] == "DELIVER"]
+    assert broadcast["msg_id"] > 0
+    assert len(delivered) == 6 and {e["msg_id"] for e in delivered} == {broadcast["msg_id"]}
+    for i in (0, 2, 3):
+        assert nodes[i].duplicates_dropped == 1
+        assert nodes[i].consensus.metrics.votes_processed == 1
+
+    # Replay: gửi lại đúng message (cùng id) -> bỏ; message mới cùng nội dung -> id mới, xử lý
+    replay = Message(msg_id=broadcast["msg_id"], from_id=validators[1], to_id=validators[0],
+                     msg_type=MessageType.VOTE, payload=vote, height=1)
+    net.send(replay, 1.0)
+    net.send(Message(msg_id=0, from_id=validators[1], to_id=validators[0],
+                     msg_type=MessageType.VOTE, payload=vote, height=1), 1.0)
+    while net.has_pending_events():
+        net.deliver_next()
+    assert nodes[0].duplicates_dropped == 1 + 2 + 1
+    assert nodes[0].consensus.metrics.votes_processed == 2
+
 def test_network_issues_drops_delays(tmp_path):
     """
     4. delayed or dropped messages do not cause conflicting finalization;
@@ -246,6 +302,353 @@ def test_network_issues_drops_delays(tmp_path):
             for i in range(min_len):
                 assert reference_chain[i].block_hash() == node.blockchain[i].block_hash()
 
+def test_round_timeouts_under_drops(tmp_path):
+    """
+    Round timeouts keep the chain moving when messages are dropped.
+    """
+    config_path = tmp_path / "timeout_config.yaml"
+    with open(config_path, "w") as f:
+        f.write("simulation:\n  num_nodes: 4\n  max_blocks: 10\n  drop_prob: 0.1\n"
+                "timeouts:\n  propose: 1.0\n  prevote: 1.0\n  precommit: 1.0\n")
+    
+    from consensus.timeouts import STEPS, TimeoutConfig, TimeoutSchedule
+    
+    sim = Simulator(config_path=str(config_path), output_file=io.StringIO(), seed=7)
+    sim.run(max_steps=3)
+    
+    # Proposer round 0 của height kế tiếp bị chặn mọi message gửi đi cho tới khi height đó được chốt
+    height = max(node.consensus.current_height for node in sim.nodes)
+    validator_set = sim.nodes[0].consensus.validator_set
+    proposer = validator_set.pubkey_at(validator_set.proposer_index(height, 0))
+    others = [node.node_id for node in sim.nodes if node.node_id != proposer]
+    now = max(node._now for node in sim.nodes)
+    for peer in others:
+        sim.network.block_peer(proposer, peer, now)
+    sim.run(max_steps=height)
+    now = max(node._now for node in sim.nodes)
+    for peer in others:
+        sim.network.unblock_peer(proposer, peer, now)
+    sim.run()
+    
+    heights = [len(node.blockchain) for node in sim.nodes]
+    assert max(heights) > 10, "Chain should reach max_blocks despite drops"
+    assert min(heights) >= 10, "Every node keeps finalizing despite drops"
+    assert max(node._now for node in sim.nodes) < 200
+    
+    # Height của proposer bị chặn chỉ chốt được sau view change (round >= 1), trong thời gian
+    # không quá tổng timeout các bước của round 0 và 1 (cộng 1s cho độ trễ mạng)
+    schedule = TimeoutSchedule(TimeoutConfig(propose=1.0, prevote=1.0, precommit=1.0))
+    bound = sum(schedule.timeout(step, r) for r in (0, 1) for step in STEPS) + 1.0
+    for node in sim.nodes:
+        metrics = node.consensus.metrics
+        assert metrics.finalized_round[height] >= 1
+        timeline = metrics.timeline(height)
+        elapsed = timeline["finalize"] - timeline["height_start"]
+        assert schedule.timeout("propose", 0) <= elapsed <= bound
+    
+    reference_chain = max((node.blockchain for node in sim.nodes), key=len)
+    for node in sim.nodes:
+        for i, block in enumerate(node.blockchain):
+            assert block.block_hash() == reference_chain[i].block_hash()
+
+def test_event_driven_proposals(tmp_path):
+    """
+    Proposer propose ngay khi vào height mới (không poll mỗi giây);
+    `min_block_time` giãn khoảng cách giữa các block.
+    """
+    def run(extra=""):
+        config_path = tmp_path / "proposal_config.yaml"
+        with open(config_path, "w") as f:
+            f.write("simulation:\n  num_nodes: 4\n  max_blocks: 10\n  min_delay: 0.01\n  max_delay: 0.05\n" + extra)
+        sim = Simulator(config_path=str(config_path), seed=3)
+        sim.run()
+        return sim
+    
+    fast = run()
+    assert max(len(node.blockchain) for node in fast.nodes) > 10
+    # Mỗi height chỉ tốn vài lượt trễ mạng, không còn ~1s chờ poll
+    assert max(node._now for node in fast.nodes) < 5.0
+    
+    paced = run("  min_block_time: 0.5\n")
+    assert max(len(node.blockchain) for node in paced.nodes) > 10
+    assert max(node._now for node in paced.nodes) >= 10 * 0.5
+
+def test_pipelined_consensus(tmp_path):
+    """
+    Pipelined mode: QC của height H+1 chốt height H, chain vẫn nhất quán khi có drop.
+    """
+    config_path = tmp_path / "pipelined_config.yaml"
+    with open(config_path, "w") as f:
+        f.write("simulation:\n  num_nodes: 4\n  max_blocks: 10\n  drop_prob: 0.1\n  pipelined: true\n"
+                "timeouts:\n  propose: 1.0\n  prevote: 1.0\n  precommit: 1.0\n")
+    
+    sim = Simulator(config_path=str(config_path), seed=7)
+    sim.run()
+    
+    reference_chain = max((node.blockchain for node in sim.nodes), key=len)
+    assert len(reference_chain) > 10
+    for node in sim.nodes:
+        assert node.consensus.pipelined
+        for i, block in enumerate(node.blockchain):
+            assert block.block_hash() == reference_chain[i].block_hash()
+        # Certificate của chế độ pipelined là QC prevote
+        for height, cert in node.certificates.items():
+            assert cert.phase == "PREVOTE"
+            assert verify_certificate(cert, node.consensus.validator_set, "PREVOTE")
+            assert not verify_certificate(cert, node.consensus.validator_set)
+
+def test_committee_sampled_voting(tmp_path):
+    """
+    Committee: mỗi height chỉ C node vote, node ngoài committee theo certificate.
+    Chain nhất quán, mọi node đều tiến, số VOTE ít hơn nhiều so với cả tập vote.
+    """
+    counts = {}
+    for committee_size in (8, 3):
+        config_path = tmp_path / f"committee_{committee_size}.yaml"
+        with open(config_path, "w") as f:
+            f.write("simulation:\n  num_nodes: 8\n  max_blocks: 8\n  min_delay: 0.01\n  max_delay: 0.1\n"
+                    f"  committee_size: {committee_size}\n  committee_seed: 5\n"
+                    "timeouts:\n  propose: 1.0\n  prevote: 1.0\n  precommit: 1.0\n")
+        log = io.StringIO()
+        sim = Simulator(config_path=str(config_path), output_file=log, seed=3)
+        sim.run()
+        
+        reference_chain = max((node.blockchain for node in sim.nodes), key=len)
+        for node in sim.nodes:
+            assert len(node.blockchain) >= 7
+            for i, block in enumerate(node.blockchain):
+                assert block.block_hash() == reference_chain[i].block_hash()
+            for height, cert in node.certificates.items():
+                assert verify_certificate(cert, node.consensus.validator_set_for(height))
+        counts[committee_size] = log.getvalue().count('"VOTE"')
+    
+    assert counts[3] * 3 < counts[8]
+
+def test_consensus_latency_summary(tmp_path):
+    """
+    Simulator gộp mốc thời gian của mọi node thành p50/p95/p99 cho từng phase.
+    """
+    config_path = tmp_path / "latency_config.yaml"
+    with open(config_path, "w") as f:
+        f.write("simulation:\n  num_nodes: 4\n  max_blocks: 5\n  min_delay: 0.01\n  max_delay: 0.1\n")
+    
+    sim = Simulator(config_path=str(config_path), output_file=io.StringIO(), seed=1)
+    sim.run()
+    
+    summary = sim.consensus_latency()
+    assert set(summary) == {"propose", "prevote", "prevote_quorum", "precommit_quorum", "finalize"}
+    assert summary["finalize"]["count"] >= 4 * 5
+    for stats in summary.values():
+        assert 0.0 <= stats["p50"] <= stats["p95"] <= stats["p99"]
+    # Quorum cần ít nhất 1 lượt truyền message (min_delay)
+    assert summary["prevote_quorum"]["p50"] >= 0.01
+    assert summary["finalize"]["p99"] < 2.0
+    assert all(node.consensus.metrics.votes_verified > 0 for node in sim.nodes)
+
+def test_gossip_overlay_consensus(tmp_path):
+    """
+    Gossip overlay (random regular degree 4): node chỉ gửi cho neighbour, block và vote
+    vẫn tới mọi node qua relay, chain nhất quán.
+    """
+    config_path = tmp_path / "gossip_config.yaml"
+    with open(config_path, "w") as f:
+        f.write("simulation:\n  num_nodes: 12\n  max_blocks: 6\n  min_delay: 0.01\n  max_delay: 0.1\n"
+                "  drop_prob: 0.05\n  topology:\n    kind: random_regular\n    degree: 4\n"
+                "timeouts:\n  propose: 1.0\n  prevote: 1.0\n  precommit: 1.0\n")
+    log = io.StringIO()
+    sim = Simulator(config_path=str(config_path), output_file=log, seed=4)
+    sim.run()
+    
+    reference_chain = max((node.blockchain for node in sim.nodes), key=len)
+    for node in sim.nodes:
+        assert len(node.neighbors) == 4
+        assert len(node.blockchain) >= 5
+        for i, block in enumerate(node.blockchain):
+            assert block.block_hash() == reference_chain[i].block_hash()
+    
+    records = [json.loads(line) for line in log.getvalue().splitlines()]
+    broadcasts = [r for r in records if r["event"] == "BROADCAST"]
+    assert broadcasts and all(r["recipients"] <= 4 for r in broadcasts)
+
+def test_gossip_relays_only_validated_payloads():
+    """Node trong overlay chỉ relay vote / header đã qua kiểm tra chữ ký; bản giả dừng ở hop đầu."""
+    import random
+    from dataclasses import replace
+    from consensus.vote import PHASE_PREVOTE, build_vote
+
+    keypairs = [KeyPair(seed=bytes([i + 31]) * 32) for i in range(3)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(logger=JsonLinesLogger(io.StringIO()), rng=random.Random(0), min_delay=0.01, max_delay=0.01)
+    # Đường thẳng 0 - 1 - 2: node 2 chỉ nhận được gossip qua relay của node 1
+    neighbors = {0: [validators[1]], 1: [validators[0], validators[2]], 2: [validators[1]]}
+    nodes = [Node(v, net, kp, validators, tx_gossip="off", neighbors=neighbors[i])
+             for i, (v, kp) in enumerate(zip(validators, keypairs))]
+
+    block = build_block(None, State(), [], keypairs[0])
+    vote = build_vote(5, 0, block.block_hash(), PHASE_PREVOTE, keypairs[0])
+    payloads = {
+        1: (MessageType.VOTE, replace(vote, signature="00" * 64)),
+        2: (MessageType.BLOCK_HEADER, replace(block.signed_header(), header_signature="00" * 64)),
+        3: (MessageType.VOTE, vote),
+        4: (MessageType.BLOCK_HEADER, block.signed_header()),
+    }
+    for seq, (msg_type, payload) in payloads.items():
+        net.send(Message(msg_id=0, from_id=validators[0], to_id=validators[1], msg_type=msg_type,
+                         payload=payload, gossip_id=(validators[0], seq)), 0.0)
+    while net.has_pending_events():
+        net.deliver_next()
+
+    for seq in payloads:
+        assert (validators[0], seq) in nodes[1].seen_gossip
+    assert (validators[0], 1) not in nodes[2].seen_gossip
+    assert (validators[0], 2) not in nodes[2].seen_gossip
+    assert (validators[0], 3) in nodes[2].seen_gossip
+    assert (validators[0], 4) in nodes[2].seen_gossip
+
+def test_gossip_drops_headers_from_unscheduled_proposers():
+    """Header của node ngoài tập validator, của validator không tới lượt propose, hay ở height quá xa: không relay, không lưu."""
+    import random
+
+    keypairs = [KeyPair(seed=bytes([i + 41]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    outsider = KeyPair(seed=bytes([99]) * 32)
+    net = Network(logger=JsonLinesLogger(io.StringIO()), rng=random.Random(0), min_delay=0.01, max_delay=0.01)
+    neighbors = {0: [validators[1]], 1: [validators[0], validators[2]], 2: [validators[1]], 3: []}
+    nodes = [Node(v, net, kp, validators, tx_gossip="off", neighbors=neighbors[i])
+             for i, (v, kp) in enumerate(zip(validators, keypairs))]
+    # Cửa sổ round nhỏ để có validator không tới lượt propose ở height 0
+    nodes[1].consensus.max_future_rounds = 1
+    validator_set = nodes[1].consensus.validator_set_for(0)
+    scheduled = {validator_set.pubkey_at(validator_set.proposer_index(0, r)) for r in range(2)}
+    unscheduled = next(kp for kp in keypairs if kp.pubkey() not in scheduled)
+    proposer = next(kp for kp in keypairs if kp.pubkey() in scheduled)
+
+    chain = [build_block(None, State(), [], proposer)]
+    for _ in range(nodes[1].consensus.max_future_heights + 1):
+        chain.append(build_block(chain[-1], State(), [], proposer))
+    headers = {
+        1: build_block(None, State(), [], outsider).signed_header(),
+        2: build_block(None, State(), [], unscheduled).signed_header(),
+        3: chain[-1].signed_header(),
+        4: chain[0].signed_header(),
+    }
+    for seq, signed_header in headers.items():
+        net.send(Message(msg_id=0, from_id=validators[0], to_id=validators[1], msg_type=MessageType.BLOCK_HEADER,
+                         payload=signed_header, gossip_id=(validators[0], seq)), 0.0)
+    while net.has_pending_events() and net.deliver_next() < 1.0:
+        pass
+
+    for seq in (1, 2, 3):
+        assert (validators[0], seq) not in nodes[2].seen_gossip
+        assert headers[seq].block_hash() not in nodes[1].pending_headers
+    assert (validators[0], 4) in nodes[2].seen_gossip
+
+def test_regional_latency_slows_finality(tmp_path):
+    """
+    Latency theo region: cùng số node, RTT liên vùng lớn -> finality chậm hơn rõ rệt so với 1 vùng.
+    """
+    finalize_p50 = {}
+    for name, latency in (
+        ("local", "  regions: [a]\n  rtt_ms: [[20]]\n"),
+        ("global", "  regions: [us, eu, asia]\n  rtt_ms: [[10, 80, 200], [80, 10, 150], [200, 150, 10]]\n"
+                   "  jitter: {kind: pareto, scale_ms: 5, shape: 2.0}\n"),
+    ):
+        config_path = tmp_path / f"{name}.yaml"
+        with open(config_path, "w") as f:
+            f.write("simulation:\n  num_nodes: 6\n  max_blocks: 5\nlatency:\n" + latency)
+        sim = Simulator(config_path=str(config_path), output_file=io.StringIO(), seed=2)
+        sim.run()
+        assert min(len(node.blockchain) for node in sim.nodes) >= 4
+        finalize_p50[name] = sim.consensus_latency()["finalize"]["p50"]
+    
+    assert finalize_p50["global"] > 3 * finalize_p50["local"]
+
+def test_bandwidth_limits_slow_finality(tmp_path):
+    """
+    Bandwidth: uplink hẹp -> vote/block phải xếp hàng trên uplink, finality chậm hơn so với không giới hạn;
+    bandwidth khai báo theo từng node, network đếm bytes đã gửi/nhận của mỗi node.
+    """
+    finalize_p50 = {}
+    link_stats = {}
+    for name, bandwidth in (
+        ("unlimited", ""),
+        ("narrow", "  bandwidth:\n    uplink_mbps: [0.05, 0.05, 0.05, 0.05, 0.05, 1]\n    downlink_mbps: 1\n"),
+    ):
+        config_path = tmp_path / f"{name}.yaml"
+        with open(config_path, "w") as f:
+            f.write("simulation:\n  num_nodes: 6\n  max_blocks: 5\n  min_delay: 0.01\n  max_delay: 0.05\n" + bandwidth)
+        sim = Simulator(config_path=str(config_path), output_file=io.StringIO(), seed=3)
+        sim.run()
+        assert min(len(node.blockchain) for node in sim.nodes) >= 4
+        finalize_p50[name] = sim.consensus_latency()["finalize"]["p50"]
+        link_stats[name] = sim.network.link_stats
+
+    assert finalize_p50["narrow"] > 2 * finalize_p50["unlimited"]
+    # Không giới hạn bandwidth và không collect_stats -> không đếm
+    assert link_stats["unlimited"] == {}
+    narrow = link_stats["narrow"]
+    assert len(narrow) == 6
+    assert all(stats.bytes_sent > 0 and stats.bytes_received > 0 for stats in narrow.values())
+    assert max(stats.max_uplink_queue for stats in narrow.values()) > 1
+
+def test_coalesced_delivery_consensus(tmp_path):
+    """
+    Coalescing: vote/block cùng link gộp thành batch, node nhận qua receive_batch;
+    chain vẫn nhất quán và số lần deliver ít hơn số message.
+    """
+    config_path = tmp_path / "coalesce.yaml"
+    with open(config_path, "w") as f:
+        f.write("simulation:\n  num_nodes: 8\n  max_blocks: 5\n  min_delay: 0.01\n  max_delay: 0.05\n"
+                "  coalesce_window: 0.01\n")
+    log = io.StringIO()
+    sim = Simulator(config_path=str(config_path), output_file=log, seed=4)
+    sim.run()
+
+    assert min(len(node.blockchain) for node in sim.nodes) >= 4
+    reference = [b.block_hash() for b in sim.nodes[0].blockchain]
+    for node in sim.nodes[1:]:
+        n = min(len(reference), len(node.blockchain))
+        assert [b.block_hash() for b in node.blockchain[:n]] == reference[:n]
+
+    events = [json.loads(line) for line in log.getvalue().splitlines()]
+    batches = [e for e in events if e["event"] == "DELIVER_BATCH"]
+    assert not any(e["event"] == "DELIVER" for e in events)
+    delivered = sum(len(e["msg_ids"]) for e in batches)
+    assert delivered > len(batches)
+
+def test_priority_inbox_keeps_flooded_node_in_consensus(tmp_path):
+    """
+    Inbox: node chậm bị client flood tx. tail_drop -> vote/header bị bỏ và chờ sau tx, node tụt lại;
+    priority -> chỉ tx bị bỏ, vote được xử lý trước, node theo kịp chain.
+    """
+    from network.inbox import INBOX_PRIORITY
+
+    client = KeyPair(seed=b"f" * 32)
+    txs = [SignedTx.create(TxBody(sender_pubkey_hex=client.pubkey(), key=f"k{i}", value="v"), client)
+           for i in range(1500)]
+    heights = {}
+    for policy in ("tail_drop", INBOX_PRIORITY):
+        config_path = tmp_path / f"{policy}.yaml"
+        with open(config_path, "w") as f:
+            f.write("simulation:\n  num_nodes: 4\n  max_blocks: 6\n  min_delay: 0.01\n  max_delay: 0.05\n"
+                    "  tx_gossip: 'off'\n  inbox:\n    capacity: 50\n"
+                    f"    policy: {policy}\n    processing_time: [0.0, 0.0, 0.0, 0.01]\n")
+        sim = Simulator(config_path=str(config_path), output_file=io.StringIO(), seed=5)
+        slow = sim.nodes[3].node_id
+        for i, tx in enumerate(txs):
+            sim.network.send(Message(msg_id=0, from_id="CLIENT", to_id=slow,
+                                     msg_type=MessageType.TX, payload=tx), i * 0.004)
+        sim.run()
+        stats = sim.network.inbox_stats(slow)
+        assert stats.max_depth == 50 and stats.lost_by_type.get("TX", 0) > 0
+        heights[policy] = len(sim.nodes[3].blockchain)
+        if policy == INBOX_PRIORITY:
+            assert set(stats.lost_by_type) == {"TX"} and stats.evicted > 0
+        else:
+            assert stats.lost_by_type.get("VOTE", 0) > 0
+
+    assert heights[INBOX_PRIORITY] >= 5 > heights["tail_drop"]
+
 def test_determinism_complex(tmp_path):
     """
     5. identical runs produce identical logs and final state.
@@ -270,4 +673,403 @@ def test_determinism_complex(tmp_path):
         sim2 = Simulator(config_path=str(config_path), output_file=f, seed=seed)
         sim2.run(max_steps=100)
         
-    assert filecmp.cmp(log1_path, log2_path), "Logs should be identical even with complex network conditions"
\ No newline at end of file
+    assert filecmp.cmp(log1_path, log2_path), "Logs should be identical even with complex network conditions"
+
+def _certify_chain(chain, signers, validators):
+    """Certificate precommit (round 0) do `signers` ký cho từng block của chain: height -> certificate."""
+    from consensus.certificate import build_certificate
+    from consensus.validator_set import ValidatorSet
+    from consensus.vote import PHASE_PRECOMMIT, build_vote
+
+    validator_set = ValidatorSet(validators)
+    return {
+        block.header.height: build_certificate(
+            [build_vote(block.header.height, 0, block.block_hash(), PHASE_PRECOMMIT, kp) for kp in signers],
+            validator_set,
+        )
+        for block in chain
+    }
+
+
+def test_batched_block_sync_catch_up():
+    """
+    6. a node 1,000 heights behind catches up in a few round trips
+    (GET_BLOCKS/BLOCKS theo lô, pipelined, từ nhiều peer).
+    """
+    import io
+    import random
+
+    keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(
+        logger=JsonLinesLogger(io.StringIO()),
+        rng=random.Random(0),
+        min_delay=0.05,
+        max_delay=0.05,
+    )
+    nodes = [
+        Node(v, net, kp, validators, sync_batch_size=128, sync_window=4)
+        for v, kp in zip(validators, keypairs)
+    ]
+
+    # 3 node đã có chain 1000 block (kèm certificate precommit), node cuối chưa có gì
+    chain = []
+    parent = None
+    for _ in range(1000):
+        parent = build_block(parent, State(), [], keypairs[0])
+        chain.append(parent)
+    certificates = _certify_chain(chain, keypairs[:3], validators)
+    for node in nodes[:3]:
+        node.blockchain = list(chain)
+        node.certificates = dict(certificates)
+
+    lagging = nodes[3]
+    lagging.sync.request_up_to(999, 0.0)
+
+    last_time = 0.0
+    while net.has_pending_events():
+        last_time = net.deliver_next()
+
+    assert len(lagging.blockchain) == 1000
+    assert lagging.blockchain[-1].block_hash() == chain[-1].block_hash()
+    assert lagging.consensus.current_height == 1000
+    # 1000 / 128 -> 8 request, window 4 -> khoảng 2 round trip (RTT = 0.1)
+    assert lagging.sync.requests_sent <= 10
+    assert last_time <= 0.5
+
+
+def test_block_sync_rejects_uncertified_chain():
+    """
+    Block sync không finalize block thiếu certificate, certificate sai phase / không đủ quorum,
+    hay chain do node ngoài tập validator tự ký; chain có certificate hợp lệ thì nhận.
+    """
+    import io
+    import random
+    from dataclasses import replace
+    from consensus.vote import PHASE_PREVOTE
+
+    keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    outsider = KeyPair(seed=b"x" * 32)
+
+    def sync_from(chain, certificates):
+        net = Network(logger=JsonLinesLogger(io.StringIO()), rng=random.Random(0), min_delay=0.05, max_delay=0.05)
+        nodes = [Node(v, net, kp, validators) for v, kp in zip(validators, keypairs)]
+        for node in nodes[:3]:
+            node.blockchain = list(chain)
+            node.certificates = dict(certificates)
+        lagging = nodes[3]
+        lagging.sync.request_up_to(len(chain) - 1, 0.0)
+        while net.has_pending_events() and net.deliver_next() < 10.0:
+            pass
+        return lagging
+
+    def make_chain(proposer, length=5):
+        chain, parent = [], None
+        for _ in range(length):
+            parent = build_block(parent, State(), [], proposer)
+            chain.append(parent)
+        return chain
+
+    chain = make_chain(keypairs[0])
+    certificates = _certify_chain(chain, keypairs[:3], validators)
+    assert len(sync_from(chain, certificates).blockchain) == 5
+
+    # Không có certificate
+    assert sync_from(chain, {}).blockchain == []
+    # Chỉ 2/4 chữ ký -> không đủ quorum
+    assert sync_from(chain, _certify_chain(chain, keypairs[:2], validators)).blockchain == []
+    # Certificate prevote không chốt được block ở chế độ thường
+    prevotes = {h: replace(cert, phase=PHASE_PREVOTE) for h, cert in certificates.items()}
+    assert sync_from(chain, prevotes).blockchain == []
+    # Chain do node ngoài tập validator tự ký
+    forged = make_chain(outsider)
+    assert sync_from(forged, _certify_chain(forged, keypairs[:3], validators)).blockchain == []
+
+
+def test_block_sync_from_fast_forwarded_peer():
+    """
+    Node finalize 1 height qua fast forward (không có certificate cho height đó) vẫn phục vụ sync
+    phần trước height đó; phần thiếu certificate được xin từ peer khác.
+    """
+    import random
+    from consensus.vote import PHASE_PRECOMMIT, build_vote
+
+    keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(logger=JsonLinesLogger(io.StringIO()), rng=random.Random(0), min_delay=0.05, max_delay=0.05)
+    nodes = [Node(v, net, kp, validators) for v, kp in zip(validators, keypairs)]
+    chain, parent = [], None
+    for _ in range(4):
+        parent = build_block(parent, State(), [], keypairs[0])
+        chain.append(parent)
+    certificates = _certify_chain(chain, keypairs[:3], validators)
+
+    # nodes[0]: height 0, 1 chốt bằng precommit; height 2 chốt qua fast forward khi height 3 đạt quorum
+    fast = nodes[0]
+    voters = [keypairs[1], keypairs[2], keypairs[3]]
+    for block in chain:
+        fast.consensus.on_receive_block(block)
+        if block.header.height != 2:
+            for kp in voters:
+                fast.consensus.on_receive_vote(build_vote(block.header.height, 0, block.block_hash(), PHASE_PRECOMMIT, kp))
+    assert len(fast.blockchain) == 4
+    assert sorted(fast.certificates) == [0, 1, 3]
+
+    # nodes[1] chỉ có certificate từ height 2 -> height 0, 1 chỉ lấy được từ node fast forward
+    nodes[1].blockchain = list(chain)
+    nodes[1].certificates = {h: certificates[h] for h in (2, 3)}
+
+    lagging = nodes[3]
+    lagging.sync.request_up_to(3, 0.0)
+    while net.has_pending_events() and net.deliver_next() < 10.0:
+        pass
+
+    assert [b.block_hash() for b in lagging.blockchain] == [b.block_hash() for b in chain]
+    assert sorted(lagging.certificates) == [0, 1, 2, 3]
+
+
+def test_header_first_compact_block_propagation():
+    """
+    7. proposals travel as signed header + compact body (tx ids);
+    receivers rebuild txs from their mempool and fetch only the missing ones.
+    """
+    import io
+    import json
+    import random
+
+    keypairs = [KeyPair(seed=bytes([i + 11]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    log = io.StringIO()
+    net = Network(logger=JsonLinesLogger(log), rng=random.Random(1), min_delay=0.01, max_delay=0.05)
+    # Tắt tx gossip để chỉ còn đường fetch tx của compact body
+    nodes = [Node(v, net, kp, validators, tx_gossip="off") for v, kp in zip(validators, keypairs)]
+
+    client = KeyPair()
+    tx = SignedTx.create(TxBody(sender_pubkey_hex=client.pubkey(), key="k", value="v"), client)
+    nodes[0].add_tx(tx)
+    nodes[1].add_tx(tx)
+
+    # validators[0] là proposer của (h=0, r=0)
+    nodes[0].propose_block(0.0)
+    while net.has_pending_events():
+        net.deliver_next()
+
+    for node in nodes:
+        assert len(node.blockchain) == 1
+        assert node.blockchain[0].txs == [tx]
+        assert not node.pending_headers and not node.missing_txs
+
+    events = [json.loads(line) for line in log.getvalue().splitlines()]
+    # Broadcast ghi 1 dòng cho mọi người nhận -> đếm theo số người nhận
+    sent = defaultdict(int)
+    for e in events:
+        if e["event"] == "SEND":
+            sent[e["msg_type"]] += 1
+        elif e["event"] == "BROADCAST":
+            sent[e["msg_type"]] += e["recipients"]
+    # Chỉ 2 node không có tx trong mempool phải xin lại
+    assert sent["GET_TXS"] == 2
+    assert sent["BLOCK_HEADER"] == 3
+    assert sent["BLOCK_BODY"] == 3
+
+
+def test_compact_block_tx_request_retry():
+    """
+    TXS reply không có tx (proposer tạm mất tx) -> node xin lại sau `tx_request_timeout`
+    thay vì kẹt block mãi; body không có header thì hết hạn.
+    """
+    import io
+    import random
+
+    keypairs = [KeyPair(seed=bytes([i + 11]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(logger=JsonLinesLogger(io.StringIO()), rng=random.Random(1), min_delay=0.01, max_delay=0.05)
+    nodes = [Node(v, net, kp, validators, tx_gossip="off", tx_request_timeout=1.0) for v, kp in zip(validators, keypairs)]
+
+    client = KeyPair()
+    tx = SignedTx.create(TxBody(sender_pubkey_hex=client.pubkey(), key="k", value="v"), client)
+    nodes[0].add_tx(tx)
+    nodes[1].add_tx(tx)
+
+    nodes[0].propose_block(0.0)
+    tx_index = dict(nodes[0].tx_index)
+    nodes[0].tx_index.clear()
+    while net.has_pending_events() and net.deliver_next() < 0.5:
+        pass
+    # GET_TXS đầu tiên nhận reply rỗng -> 2 node vẫn thiếu tx, chưa đủ quorum
+    assert all(len(node.blockchain) == 0 for node in nodes)
+    assert nodes[2].missing_txs and nodes[3].missing_txs
+
+    nodes[0].tx_index.update(tx_index)
+    while net.has_pending_events():
+        net.deliver_next()
+    for node in nodes:
+        assert len(node.blockchain) == 1
+        assert node.blockchain[0].txs == [tx]
+        assert not node.missing_txs
+
+    # Body mồ côi (không có header) bị dọn khi finalize sau `orphan_body_timeout`
+    node = nodes[1]
+    orphan = Message(msg_id=0, from_id=nodes[2].node_id, to_id=node.node_id, msg_type=MessageType.BLOCK_BODY,
+                     payload=CompactBody(block_hash="ab" * 32, tx_ids=[]))
+    net.send(orphan, 10.0)
+    while net.has_pending_events():
+        net.deliver_next()
+    assert "ab" * 32 in node.pending_bodies
+    node._now = 11.0 + node.orphan_body_timeout
+    node.on_finalize(build_block(node.blockchain[-1], node.state, [], keypairs[1]))
+    assert "ab" * 32 not in node.pending_bodies
+
+
+def test_compact_block_refetches_seen_tx():
+    """Tx đã thấy nhưng không còn trong mempool (seen_txs vẫn giữ) vẫn được xin lại để dựng compact body."""
+    import io
+    import random
+
+    keypairs = [KeyPair(seed=bytes([i + 11]) * 32) for i in range(4)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(logger=JsonLinesLogger(io.StringIO()), rng=random.Random(1), min_delay=0.01, max_delay=0.05)
+    nodes = [Node(v, net, kp, validators, tx_gossip="off") for v, kp in zip(validators, keypairs)]
+
+    client = KeyPair()
+    tx = SignedTx.create(TxBody(sender_pubkey_hex=client.pubkey(), key="k", value="v"), client)
+    for node in nodes:
+        node.add_tx(tx)
+    # 2 node đã bỏ tx khỏi mempool nhưng vẫn nhớ đã thấy
+    for node in nodes[2:]:
+        node.mempool.clear()
+        node.tx_index.clear()
+        assert tx.tx_id() in node.seen_txs
+
+    nodes[0].propose_block(0.0)
+    # GET_TXS xin lại theo timer -> giới hạn thời gian thay vì chờ hết event
+    while net.has_pending_events() and net.deliver_next() < 10.0:
+        pass
+
+    for node in nodes:
+        assert len(node.blockchain) == 1
+        assert node.blockchain[0].txs == [tx]
+        assert not node.missing_txs and not node._fetched_txs
+    # Tx xin về cho block không quay lại mempool
+    assert nodes[2].mempool == []
+
+
+def _run_tx_gossip(mode, num_nodes=6, num_txs=5):
+    import io
+    import random
+
+    keypairs = [KeyPair(seed=bytes([i + 21]) * 32) for i in range(num_nodes)]
+    validators = [kp.pubkey() for kp in keypairs]
+    net = Network(
+        logger=JsonLinesLogger(io.StringIO()),
+        rng=random.Random(2),
+        min_delay=0.01,
+        max_delay=0.05,
+        collect_stats=True,
+    )
+    nodes = [Node(v, net, kp, validators, tx_gossip=mode) for v, kp in zip(validators, keypairs)]
+
+    client = KeyPair(seed=b"c" * 32)
+    txs = [
+        SignedTx.create(TxBody(sender_pubkey_hex=client.pubkey(), key=f"k{i}", value="x" * 200), client)
+        for i in range(num_txs)
+    ]
+    for tx in txs:
+        net.send(Message(msg_id=0, from_id="CLIENT", to_id=nodes[0].node_id,
+                         msg_type=MessageType.TX, payload=tx), 0.0)
+    while net.has_pending_events():
+        net.deliver_next()
+    return net, nodes, txs
+
+
+def test_tx_gossip_reaches_all_mempools():
+    """
+    8. txs injected at one node reach every mempool, both with inventory
+    gossip and naive flooding; inventory sends fewer bytes per tx.
+    """
+    inv_net, inv_nodes, txs = _run_tx_gossip("inventory")
+    flood_net, flood_nodes, _ = _run_tx_gossip("flood")
+
+    expected = sorted(tx.tx_id() for tx in txs)
+    for node in inv_nodes + flood_nodes:
+        assert sorted(tx.tx_id() for tx in node.mempool) == expected
+
+    # Inventory: full tx chỉ đi qua TXS (trả lời GET_TXS), không relay nguyên TX
+    assert inv_net.stats["TX"]["messages"] == len(txs)
+    assert inv_net.stats["TXS"]["messages"] <= 5 * len(txs)
+    # Flood: client gửi 5 tx, node 0 relay tới 5 peer, 5 node còn lại relay tới 4 peer
+    assert flood_net.stats["TX"]["messages"] == 5 + 5 * 5 + 5 * 5 * 4
+
+    assert inv_net.total_stats()["bytes"] < flood_net.total_stats()["bytes"]
+
+
+def test_consensus_over_tcp_transport():
+    """
+    TcpTransport: Node chạy không đổi trên socket TCP thật (localhost, thời gian thực);
+    4 validator finalize cùng chain, message đi qua kết nối bền và được ghi theo lô.
+    """
+    import asyncio
+    from consensus.timeouts import TimeoutConfig
+    from network.tcp_transport import TcpTransport
+
+    async def run():
+        keypairs = [KeyPair(seed=bytes([i + 1]) * 32) for i in range(4)]
+        validators = [kp.pubkey() for kp in keypairs]
+        transport = TcpTransport()
+        nodes = [Node(v, transport, kp, validators, timeouts=TimeoutConfig(), auto_propose=True)
+                 for v, kp in zip(validators, keypairs)]
+        await transport.start()
+        done = await transport.run_until(lambda: min(len(node.blockchain) for node in nodes) >= 5, timeout=30)
+        await transport.close()
+        return transport, nodes, done
+
+    transport, nodes, done = asyncio.run(run())
+    assert done
+    hashes = [[block.block_hash() for block in node.blockchain[:5]] for node in nodes]
+    assert all(h == hashes[0] for h in hashes)
+    assert transport.frames_sent > transport.writes
+    assert len(transport.link_stats) == 4
+    assert all(stats.messages_sent > 0 and stats.messages_received > 0 for stats in transport.link_stats.values())
+
+
+def test_messages_without_id_are_not_deduplicated_over_tcp():
+    """
+    Khử trùng lặp theo (node gốc, msg_id) không được bỏ message gửi với msg_id=0:
+    qua TcpTransport mọi tx của cùng 1 node gốc đều tới nơi; message không có id
+    (transport không cấp) vẫn được xử lý, bản trùng có id thì bị bỏ.
+    """
+    import asyncio
+    from network.tcp_transport import TcpTransport
+
+    keypairs = [KeyPair(seed=bytes([i + 51]) * 32) for i in range(2)]
+    validators = [kp.pubkey() for kp in keypairs]
+    txs = [SignedTx.create(TxBody(sender_pubkey_hex=keypairs[0].pubkey(), key=f"k{i}", value=str(i)), keypairs[0])
+           for i in range(5)]
+
+    async def run():
+        transport = TcpTransport()
+        nodes = [Node(v, transport, kp, validators, tx_gossip="off") for v, kp in zip(validators, keypairs)]
+        await transport.start()
+        for tx in txs:
+            transport.send(Message(msg_id=0, from_id=validators[0], to_id=validators[1],
+                                   msg_type=MessageType.TX, payload=tx), transport.now())
+        done = await transport.run_until(lambda: len(nodes[1].mempool) == len(txs), timeout=10)
+        await transport.close()
+        return nodes, done
+
+    nodes, done = asyncio.run(run())
+    assert done
+    assert nodes[1].duplicates_dropped == 0
+
+    extra = [SignedTx.create(TxBody(sender_pubkey_hex=keypairs[0].pubkey(), key=f"x{i}", value=str(i)), keypairs[0])
+             for i in range(2)]
+    for tx in extra:
+        nodes[1].receive(Message(msg_id=0, from_id=validators[0], to_id=validators[1],
+                                 msg_type=MessageType.TX, payload=tx), 0.0)
+    assert len(nodes[1].mempool) == len(txs) + len(extra)
+    assert nodes[1].duplicates_dropped == 0
+    replay = Message(msg_id=99, from_id=validators[0], to_id=validators[1], msg_type=MessageType.TX, payload=txs[0])
+    nodes[1].receive(replay, 0.0)
+    nodes[1].receive(replay, 0.0)
+    assert nodes[1].duplicates_dropped == 1
@@ -1,6 +1,8 @@
 from io import StringIO
 import json
 
+import pytest
+
 # import đúng theo cấu trúc project:
 from network.messages import Message, MessageType
 from network.logging_utils import JsonLinesLogger
@@ -145,4 +147,519 @@ def test_block_and_unblock_peer():
     assert net.has_pending_events()
 
     net.deliver_next()
-    assert b.received == [2]
\ No newline at end of file
+    assert b.received == [2]
+
+def test_broadcast_shares_message_and_logs_once():
+    """
+    Test broadcast:
+    - 1 Message dùng chung cho mọi người nhận, node nhận đúng message đó
+    - peer bị block không nhận, 1 dòng log BROADCAST cho cả lần gửi
+    - cùng seed -> cùng kết quả drop/delay
+    """
+    import random
+
+    def run(seed):
+        buf = StringIO()
+        net = Network(logger=JsonLinesLogger(buf), rng=random.Random(seed),
+                      min_delay=0.01, max_delay=0.1, drop_prob=0.3, dup_prob=0.2)
+        nodes = [DummyNode(f"N{i}") for i in range(20)]
+        for node in nodes:
+            net.add_node(node)
+        msg = Message(msg_id=7, from_id="N0", to_id="BROADCAST",
+                      msg_type=MessageType.VOTE, payload={"v": 1}, height=3)
+        net.block_peer("N0", "N1", now=0.0)
+        net.broadcast(msg, [node.node_id for node in nodes[1:]], now=0.0)
+        times = []
+        while net.has_pending_events():
+            times.append(net.deliver_next())
+        records = [json.loads(line) for line in buf.getvalue().splitlines()]
+        return nodes, records, times
+
+    nodes, records, times = run(5)
+    broadcasts = [r for r in records if r["event"] == "BROADCAST"]
+    assert len(broadcasts) == 1
+    record = broadcasts[0]
+    assert record["recipients"] == 19 and record["blocked"] == ["N1"]
+    assert not any(r["event"] in ("SEND", "SCHEDULE_DELIVER") for r in records)
+
+    assert nodes[1].received == []
+    delivered = {node.node_id for node in nodes if node.received}
+    assert delivered == {f"N{i}" for i in range(2, 20)} - set(record.get("dropped", []))
+    duplicated = set(record.get("duplicated", []))
+    for node in nodes[2:]:
+        expected = 0 if node.node_id in record.get("dropped", []) else 1 + (node.node_id in duplicated)
+        assert node.received == [7] * expected
+    assert all(0.01 <= t <= 0.2 for t in times)
+
+    _, records_again, times_again = run(5)
+    assert records_again == records and times_again == times
+
+
+def test_topology_generators():
+    """
+    Test overlay: random regular đúng degree, small-world giữ số cạnh,
+    ring of clusters nối các cluster; tất cả đối xứng, liên thông và deterministic.
+    """
+    import random
+    from network.topology import random_regular, small_world, ring_of_clusters, build_topology, is_connected
+
+    ids = [f"n{i}" for i in range(200)]
+
+    def check(topology):
+        assert set(topology) == set(ids)
+        for node, peers in topology.items():
+            assert node not in peers and len(set(peers)) == len(peers)
+            assert all(node in topology[peer] for peer in peers)
+        assert is_connected(topology)
+
+    regular = random_regular(ids, 6, random.Random(1))
+    check(regular)
+    assert all(len(peers) == 6 for peers in regular.values())
+    assert regular == random_regular(ids, 6, random.Random(1))
+
+    world = small_world(ids, 4, 0.2, random.Random(2))
+    check(world)
+    assert sum(len(peers) for peers in world.values()) == 200 * 4
+
+    clusters = ring_of_clusters(ids, 10, bridges=2)
+    check(clusters)
+    assert len(clusters["n0"]) == 9 + 2 + 0 and "n10" in clusters["n0"] and "n190" in clusters["n0"]
+
+    assert build_topology({"kind": "random_regular", "degree": 4}, ids, random.Random(3)) == \
+        random_regular(ids, 4, random.Random(3))
+    try:
+        random_regular(ids[:5], 3, random.Random(0))
+        assert False, "n * degree lẻ phải báo lỗi"
+    except ValueError:
+        pass
+
+
+def test_latency_model_regions_and_jitter():
+    """
+    Test LatencyModel:
+    - delay cơ sở = RTT / 2 theo cặp region, không jitter -> đúng bằng giá trị cơ sở
+    - jitter lognormal / pareto >= 0, cùng seed -> cùng kết quả
+    - Network.broadcast dùng delay của model cho từng người nhận
+    """
+    import random
+    from network.latency import LatencyModel
+
+    ids = [f"n{i}" for i in range(6)]
+    config = {"regions": ["us", "eu", "asia"], "rtt_ms": [[10, 80, 200], [80, 10, 150], [200, 150, 10]]}
+    model = LatencyModel.from_config(config, ids)
+    assert [model.region_of(i) for i in ids] == [0, 1, 2, 0, 1, 2]
+    assert model.sample("n0", ["n3", "n1", "n2"]) == pytest.approx([0.005, 0.04, 0.1])
+    # Node ngoài bảng region coi như cùng region với phía còn lại
+    assert model.sample_one("CLIENT", "n2") == pytest.approx(0.005)
+    weighted = LatencyModel.from_config(dict(config, region_weights=[2, 1, 0]), ids)
+    assert [weighted.region_of(i) for i in ids] == [0, 0, 0, 0, 1, 1]
+
+    for jitter in ({"kind": "lognormal", "median_ms": 5, "sigma": 0.5}, {"kind": "pareto", "scale_ms": 5, "shape": 2.0}):
+        a = LatencyModel.from_config(dict(config, jitter=jitter), ids, seed=9)
+        b = LatencyModel.from_config(dict(config, jitter=jitter), ids, seed=9)
+        delays = a.sample("n0", ["n2"] * 1000)
+        assert delays == b.sample("n0", ["n2"] * 1000)
+        assert min(delays) >= 0.1 and max(delays) > 0.1 + 0.005
+
+    buf = StringIO()
+    net = Network(logger=JsonLinesLogger(buf), rng=random.Random(0), latency=model)
+    nodes = [DummyNode(i) for i in ids]
+    for node in nodes:
+        net.add_node(node)
+    msg = Message(msg_id=3, from_id="n0", to_id="BROADCAST", msg_type=MessageType.VOTE, payload={}, height=1)
+    net.broadcast(msg, ids[1:], now=1.0)
+    times = []
+    while net.has_pending_events():
+        times.append(net.deliver_next())
+    assert times == pytest.approx([1.005, 1.04, 1.04, 1.1, 1.1])
+
+
+def test_bandwidth_serializes_messages_fifo():
+    """
+    Test bandwidth model:
+    - kích thước message tính 1 lần, cache trên message
+    - uplink giới hạn: các bản broadcast truyền nối tiếp, người nhận sau trễ thêm size / bandwidth
+    - downlink giới hạn: 2 message tới cùng lúc được nhận lần lượt (FIFO)
+    - bộ đếm bytes / độ sâu hàng đợi theo node
+    """
+    import random
+    from network.messages import message_size
+
+    msg = Message(msg_id=1, from_id="A", to_id="BROADCAST", msg_type=MessageType.BLOCK_BODY,
+                  payload={"data": "x" * 968}, height=1)
+    size = message_size(msg)
+    assert msg.encoded_size == size and size > 968
+
+    # uplink 8 * size bit/s -> truyền 1 bản mất đúng 1 giây
+    net = Network(logger=JsonLinesLogger(StringIO()), rng=random.Random(0),
+                  min_delay=0.01, max_delay=0.01, uplink_bps=8 * size)
+    for node_id in ("A", "B", "C", "D"):
+        net.add_node(DummyNode(node_id))
+    net.broadcast(msg, ["B", "C", "D"], now=0.0)
+    assert net.queue_depth("A", 0.5) == (3, 0)
+    times = []
+    while net.has_pending_events():
+        times.append(net.deliver_next())
+    assert times == pytest.approx([1.01, 2.01, 3.01])
+    stats = net.link_stats["A"]
+    assert stats.bytes_sent == 3 * size and stats.messages_sent == 3 and stats.max_uplink_queue == 3
+    assert net.link_stats["B"].bytes_received == size
+
+    # downlink của C giới hạn, uplink không giới hạn: A và B gửi cùng lúc -> C nhận lần lượt
+    net = Network(logger=JsonLinesLogger(StringIO()), rng=random.Random(0), min_delay=0.01, max_delay=0.01)
+    nodes = {node_id: DummyNode(node_id) for node_id in ("A", "B", "C")}
+    for node in nodes.values():
+        net.add_node(node)
+    msgs = [Message(msg_id=msg_id, from_id=sender, to_id="C", msg_type=MessageType.BLOCK_BODY,
+                    payload={"data": "x" * 968}, height=1) for msg_id, sender in ((1, "A"), (2, "B"))]
+    size = message_size(msgs[0])
+    assert message_size(msgs[1]) == size
+    net.set_bandwidth("C", downlink_bps=8 * size)
+    for msg in msgs:
+        net.send(msg, 0.0)
+    times = [t for t in iter(net.deliver_next, None)]
+    assert nodes["C"].received == [1, 2]
+    # 2 event ARRIVE lúc 0.01, sau đó deliver lúc 1.01 và 2.01
+    assert times == pytest.approx([0.01, 0.01, 1.01, 2.01])
+    assert net.link_stats["C"].max_downlink_queue == 2
+
+
+def test_event_queue_orders_by_time_then_seq():
+    """
+    Test EventQueue:
+    - event sớm nhất ra trước, cùng thời điểm -> theo thứ tự xếp lịch (seq)
+    - push_deliveries cấp seq giống push lần lượt
+    """
+    from network.event_queue import EventQueue, NetworkEventType
+
+    msg = Message(msg_id=1, from_id="A", to_id="BROADCAST", msg_type=MessageType.VOTE, payload=None)
+    queue = EventQueue()
+    assert not queue and queue.peek_time() is None
+    queue.push(0.5, NetworkEventType.TIMER, None, "A", "t1")
+    queue.push_deliveries(msg, [(0.2, "B"), (0.5, "C"), (0.2, "D")])
+    queue.push(0.2, NetworkEventType.ARRIVE, msg, "E")
+    assert len(queue) == 5 and queue.peek_time() == 0.2
+
+    popped = [queue.pop() for _ in range(5)]
+    assert [(t, seq, node_id) for t, seq, _, _, node_id, _ in popped] == [
+        (0.2, 1, "B"), (0.2, 3, "D"), (0.2, 4, "E"), (0.5, 0, "A"), (0.5, 2, "C"),
+    ]
+    assert popped[3][2] is NetworkEventType.TIMER and popped[3][5] == "t1"
+    assert all(event[3] is msg for event in popped if event[2] is not NetworkEventType.TIMER)
+
+
+def test_coalescing_batches_messages_per_link():
+    """
+    Test coalescing:
+    - message cùng link rời sender trong cửa sổ -> 1 event, 1 dòng log DELIVER_BATCH, 1 lần receive_batch
+    - message sau hạn chót mở batch mới; node không có receive_batch nhận từng message
+    """
+    import random
+
+    class BatchNode(DummyNode):
+        def __init__(self, node_id):
+            super().__init__(node_id)
+            self.batches = []
+
+        def receive_batch(self, messages, sim_time):
+            self.batches.append(([m.msg_id for m in messages], sim_time))
+
+    buf = StringIO()
+    net = Network(logger=JsonLinesLogger(buf), rng=random.Random(0),
+                  min_delay=0.01, max_delay=0.01, coalesce_window=0.005)
+    b, c = BatchNode("B"), DummyNode("C")
+    net.add_node(DummyNode("A"))
+    net.add_node(b)
+    net.add_node(c)
+    for msg_id, now in ((1, 0.0), (2, 0.002), (3, 0.005), (4, 0.006)):
+        net.send(Message(msg_id=msg_id, from_id="A", to_id="B", msg_type=MessageType.VOTE, payload=None), now)
+    vote = Message(msg_id=5, from_id="A", to_id="BROADCAST", msg_type=MessageType.VOTE, payload=None)
+    net.broadcast(vote, ["B", "C"], 0.006)
+    times = []
+    while net.has_pending_events():
+        times.append(net.deliver_next())
+
+    assert b.batches == [([1, 2, 3], pytest.approx(0.015)), ([4, 5], pytest.approx(0.021))]
+    assert b.received == [] and c.received == [5]
+    assert times == pytest.approx([0.015, 0.021, 0.021])
+    records = [json.loads(line) for line in buf.getvalue().splitlines()]
+    batches = [r for r in records if r["event"] == "DELIVER_BATCH"]
+    assert [(r["to"], r["msg_ids"]) for r in batches] == [("B", [1, 2, 3]), ("B", [4, 5]), ("C", [5])]
+
+
+def test_inbox_drop_policies_and_backpressure():
+    """
+    Test inbox:
+    - node bận xử lý -> message chờ trong inbox, xử lý lần lượt mỗi processing_time
+    - tail_drop: inbox đầy thì bỏ message mới; priority: vote đẩy tx đang chờ ra, xử lý trước tx
+    - message bị bỏ -> node gửi nhận on_backpressure, network báo độ sâu / mức đầy inbox
+    """
+    import random
+
+    class SenderNode(DummyNode):
+        def __init__(self, node_id):
+            super().__init__(node_id)
+            self.backpressure = []
+
+        def on_backpressure(self, peer, sim_time):
+            self.backpressure.append((peer, sim_time))
+
+    def run(policy):
+        buf = StringIO()
+        net = Network(logger=JsonLinesLogger(buf), rng=random.Random(0), min_delay=0.0, max_delay=0.0,
+                      inbox_capacity=2, inbox_policy=policy, processing_time=1.0)
+        sender, slow = SenderNode("A"), DummyNode("B")
+        net.add_node(sender)
+        net.add_node(slow)
+        kinds = [MessageType.TX, MessageType.TX, MessageType.TX, MessageType.VOTE]
+        for msg_id, kind in enumerate(kinds, start=1):
+            net.send(Message(msg_id=msg_id, from_id="A", to_id="B", msg_type=kind, payload=None), 0.0)
+        # 4 message tới cùng lúc 0.0: message 1 xử lý ngay, 2 message chờ, inbox đầy
+        for _ in range(4):
+            net.deliver_next()
+        depth, pressure = net.inbox_depth("B"), net.backpressure("B")
+        times = []
+        while net.has_pending_events():
+            times.append(net.deliver_next())
+        records = [json.loads(line) for line in buf.getvalue().splitlines()]
+        drops = [(r["msg_id"], r["reason"]) for r in records if r["event"] == "INBOX_DROP"]
+        return net, sender, slow, depth, pressure, times, drops
+
+    net, sender, slow, depth, pressure, times, drops = run("tail_drop")
+    assert depth == 2 and pressure == 1.0
+    assert slow.received == [1, 2, 3] and times == [1.0, 2.0]
+    assert drops == [(4, "inbox_full")] and sender.backpressure == [("B", 0.0)]
+    stats = net.inbox_stats("B")
+    assert (stats.processed, stats.dropped, stats.evicted, stats.max_depth) == (3, 1, 0, 2)
+    assert stats.lost_by_type == {"VOTE": 1}
+
+    net, sender, slow, _, _, _, drops = run("priority")
+    # Vote đẩy tx mới nhất đang chờ (3) ra và được xử lý trước tx còn lại
+    assert slow.received == [1, 4, 2]
+    assert drops == [(3, "evicted")] and sender.backpressure == [("B", 0.0)]
+    assert net.inbox_stats("B").lost_by_type == {"TX": 1}
+
+
+def test_codec_round_trip_fuzz():
+    """
+    Test wire codec:
+    - fuzz: message ngẫu nhiên với mọi loại payload encode rồi decode ra đúng message ban đầu
+    - hex thường ghi dạng raw bytes, chuỗi không phải hex (hoa, lẻ, "NIL") vẫn giữ nguyên
+    - vote / block thật decode xong vẫn verify được chữ ký, kích thước nhỏ hơn JSON
+    - frame bị cắt / thừa byte / sai version -> ValueError
+    """
+    import random
+    from blocklayer.block import Block, BlockHeader, CompactBody, SignedHeader, build_block
+    from consensus.certificate import CommitCertificate
+    from consensus.vote import Vote, build_vote, verify_vote
+    from core.crypto_layer import KeyPair
+    from core.state import State
+    from core.types_tx import SignedTx, TxBody
+    from network.codec import WIRE_VERSION, decode_message, encode_message
+    from network.messages import (BlocksResponse, GetBlocks, GetTxs, TxInventory, TxsResponse,
+                                  estimate_size, message_size)
+
+    rng = random.Random(0)
+
+    def hex_str():
+        # chủ yếu hex thường (raw bytes), đôi khi chuỗi lạ phải ghi nguyên văn
+        return rng.choice([
+            rng.randbytes(rng.choice([0, 1, 32, 64])).hex(),
+            "NIL", "ABCD", "abc", "BROADCAST", "node-é",
+        ])
+
+    def text():
+        return "".join(rng.choice("ab xé✓\n") for _ in range(rng.randint(0, 8)))
+
+    def value(depth=0):
+        kinds = ["none", "bool", "int", "float", "str", "bytes"]
+        if depth < 3:
+            kinds += ["list", "tuple", "dict"]
+        kind = rng.choice(kinds)
+        if kind == "none":
+            return None
+        if kind == "bool":
+            return rng.random() < 0.5
+        if kind == "int":
+            return rng.randint(-2 ** 70, 2 ** 70) if rng.random() < 0.3 else rng.randint(-200, 200)
+        if kind == "float":
+            return rng.uniform(-1e6, 1e6)
+        if kind == "str":
+            return text()
+        if kind == "bytes":
+            return rng.randbytes(rng.randint(0, 5))
+        items = [value(depth + 1) for _ in range(rng.randint(0, 3))]
+        if kind == "list":
+            return items
+        if kind == "tuple":
+            return tuple(items)
+        return {text(): item for item in items}
+
+    def signed_tx():
+        return SignedTx(hex_str(), text(), value(), hex_str(), hex_str(), text())
+
+    def header():
+        return BlockHeader(rng.randint(0, 10 ** 6), hex_str(), hex_str(), hex_str(), hex_str())
+
+    def block():
+        return Block(header(), [signed_tx() for _ in range(rng.randint(0, 3))], hex_str(), hex_str(), text())
+
+    def certificate():
+        return CommitCertificate(rng.randint(0, 99), rng.randint(0, 9), hex_str(), rng.getrandbits(80),
+                                 [hex_str() for _ in range(rng.randint(0, 4))], text())
+
+    payloads = [
+        value,
+        signed_tx,
+        header,
+        block,
+        certificate,
+        lambda: SignedHeader(header(), hex_str(), hex_str(), text()),
+        lambda: CompactBody(hex_str(), [hex_str() for _ in range(rng.randint(0, 4))]),
+        lambda: Vote(rng.randint(0, 99), rng.randint(-1, 9), hex_str(), text(), hex_str(), hex_str(),
+                     hex_str(), text()),
+        lambda: GetBlocks(rng.randint(0, 99), rng.randint(0, 99)),
+        lambda: BlocksResponse(rng.randint(0, 99), [block() for _ in range(rng.randint(0, 2))],
+                               [rng.choice([None, certificate()]) for _ in range(rng.randint(0, 2))]),
+        lambda: GetTxs([hex_str() for _ in range(rng.randint(0, 3))], rng.choice([None, hex_str()])),
+        lambda: TxsResponse([signed_tx() for _ in range(rng.randint(0, 3))], rng.choice([None, hex_str()])),
+        lambda: TxInventory([hex_str() for _ in range(rng.randint(0, 3))]),
+    ]
+    for _ in range(2000):
+        msg = Message(
+            msg_id=rng.randint(0, 2 ** 40),
+            from_id=hex_str(),
+            to_id=hex_str(),
+            msg_type=rng.choice(list(MessageType)),
+            payload=rng.choice(payloads)(),
+            height=rng.choice([None, -1, 0, rng.randint(0, 10 ** 9)]),
+            gossip_id=rng.choice([None, (hex_str(), rng.randint(0, 10 ** 6))]),
+        )
+        frame = encode_message(msg)
+        decoded = decode_message(memoryview(frame))
+        assert decoded == msg
+        assert decoded.encoded_size == len(frame)
+        assert encode_message(decoded) == frame
+
+    # Payload thật: chữ ký verify được sau decode; hex ghi raw -> nhỏ hơn JSON
+    kp = KeyPair(seed=b"c" * 32)
+    txs = [SignedTx.create(TxBody(kp.pubkey(), f"k{i}", f"v{i}"), kp) for i in range(3)]
+    real_block = build_block(None, State(), txs, kp)
+    vote = build_vote(0, 0, real_block.block_hash(), "PREVOTE", kp)
+    for msg_type, payload in ((MessageType.VOTE, vote), (MessageType.BLOCKS, BlocksResponse(0, [real_block], [None]))):
+        msg = Message(msg_id=1, from_id=kp.pubkey(), to_id="BROADCAST", msg_type=msg_type, payload=payload, height=0)
+        frame = encode_message(msg)
+        assert message_size(msg) == len(frame) < estimate_size(msg) * 0.6
+        decoded = decode_message(bytearray(frame)).payload
+        if msg_type == MessageType.VOTE:
+            assert verify_vote(decoded)
+        else:
+            assert decoded.blocks[0].verify_signature() and all(tx.verify() for tx in decoded.blocks[0].txs)
+
+    # Payload codec không hỗ trợ -> message_size quay về estimate_size
+    odd = Message(msg_id=1, from_id="A", to_id="B", msg_type=MessageType.TX, payload=object())
+    with pytest.raises(TypeError):
+        encode_message(odd)
+    assert message_size(odd) == estimate_size(odd)
+
+    frame = encode_message(Message(msg_id=5, from_id=kp.pubkey(), to_id="B", msg_type=MessageType.VOTE,
+                                   payload=vote, height=0))
+    for cut in range(len(frame)):
+        with pytest.raises(ValueError):
+            decode_message(frame[:cut])
+    with pytest.raises(ValueError):
+        decode_message(frame + b"\x00")
+    with pytest.raises(ValueError):
+        decode_message(bytes([WIRE_VERSION + 1]) + frame[1:])
+    # Byte ngẫu nhiên bị hỏng: hoặc decode được, hoặc ValueError (không lỗi kiểu khác)
+    for _ in range(2000):
+        corrupted = bytearray(frame)
+        corrupted[rng.randrange(len(corrupted))] = rng.randrange(256)
+        try:
+            decode_message(corrupted)
+        except ValueError:
+            pass
+
+
+def test_codec_payload_registry():
+    """
+    Test registry payload của codec:
+    - network.codec không import core / blocklayer / consensus; các module đó tự đăng ký codec lúc import
+    - tag đã dùng cho kiểu khác, hoặc kiểu đã đăng ký với tag khác -> ValueError
+    """
+    import os
+    import subprocess
+    import sys
+    from dataclasses import dataclass
+    import network
+    from consensus.vote import Vote
+    from network.codec import T_TX_INV, T_VOTE, register_payload
+
+    src_dir = os.path.dirname(os.path.dirname(network.__file__))
+    check = (
+        "import sys, network.codec; "
+        "assert not [m for m in sys.modules if m.split('.')[0] in ('core', 'blocklayer', 'consensus')]"
+    )
+    subprocess.run([sys.executable, "-c", check], check=True, cwd=src_dir,
+                   env={**os.environ, "PYTHONPATH": src_dir})
+
+    @dataclass
+    class Other:
+        x: int
+
+    with pytest.raises(ValueError):
+        register_payload(Other, T_VOTE, lambda out, value: None, lambda r, depth: None)
+    with pytest.raises(ValueError):
+        register_payload(Vote, T_TX_INV, lambda out, value: None, lambda r, depth: None)
+
+
+def test_tcp_transport_delivers_over_sockets():
+    """
+    Test TcpTransport (socket localhost thật):
+    - message gửi trước start được giữ lại, gửi khi kết nối mở
+    - broadcast: 1 frame encode cho mọi người nhận, id message như Network
+    - frame cùng link trong 1 vòng event loop ghi chung 1 lần write, bên nhận nhận theo batch
+    - đếm bytes / message theo node
+    """
+    import asyncio
+    from network.tcp_transport import TcpTransport
+
+    class BatchNode(DummyNode):
+        def __init__(self, node_id):
+            super().__init__(node_id)
+            self.batches = 0
+            self.payloads = []
+
+        def receive(self, message, sim_time):
+            super().receive(message, sim_time)
+            self.payloads.append(message.payload)
+
+        def receive_batch(self, messages, sim_time):
+            self.batches += 1
+            for message in messages:
+                self.receive(message, sim_time)
+
+    async def run():
+        transport = TcpTransport()
+        nodes = {node_id: BatchNode(node_id) for node_id in ("A", "B", "C")}
+        for node in nodes.values():
+            transport.add_node(node)
+        transport.send(Message(msg_id=0, from_id="A", to_id="B", msg_type=MessageType.TX,
+                               payload={"k": "v"}), 0.0)
+        await transport.start()
+        for i in range(50):
+            transport.broadcast(Message(msg_id=0, from_id="A", to_id="BROADCAST", msg_type=MessageType.VOTE,
+                                        payload=("vote", i), height=i), ["B", "C"], transport.now())
+        done = await transport.run_until(lambda: len(nodes["C"].received) == 50, timeout=10)
+        await transport.close()
+        return transport, nodes, done
+
+    transport, nodes, done = asyncio.run(run())
+    assert done
+    assert nodes["B"].received == list(range(1, 52)) and nodes["C"].received == list(range(2, 52))
+    assert nodes["B"].payloads[0] == {"k": "v"} and nodes["C"].payloads[-1] == ("vote", 49)
+    assert transport.frames_sent == 101 and transport.writes < 10
+    assert nodes["C"].batches >= 1
+    sent, received = transport.link_stats["A"], transport.link_stats["C"]
+    assert sent.messages_sent == 101 and received.messages_received == 50
+    assert sent.bytes_sent == transport.link_stats["B"].bytes_received + received.bytes_received
@@ -112,3 +112,15 @@ def test_block_validation():
 
 if __name__ == "__main__":
     sys.exit(pytest.main(["-v", __file__]))
+
+def test_tx_id_cached():
+    kp = KeyPair()
+    tx = SignedTx.create(TxBody(kp.pubkey(), "k", "v"), kp)
+    tx_id = tx.tx_id()
+    # Cache không phải field: không đổi nội dung ký / so sánh
+    assert tx.tx_id() == tx_id
+    assert tx == SignedTx.create(TxBody(kp.pubkey(), "k", "v"), kp)
+    assert tx.verify()
+    # Sửa field -> id tính lại
+    tx.value = "w"
+    assert tx.tx_id() != tx_id